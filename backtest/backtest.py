@@ -1,8 +1,10 @@
 import numpy as np
 import pandas as pd
-import MetaTrader5 as mt5
 import math
 import datetime as dt
+from backtest.profit_engine import money_per_lot, lots_from_risk, round_profit
+from data.data_process import ask_column
+from data.resample import sub_bar_ranges
 
 
 def calculate_lot_size(pair, entry_price, stop_loss, capital, risk_pct, risk_mode, order_type):
@@ -16,6 +18,7 @@ def calculate_lot_size(pair, entry_price, stop_loss, capital, risk_pct, risk_mod
     else:
         risk_money = capital * risk_pct
 
+    import MetaTrader5 as mt5
     info = mt5.symbol_info(pair)
 
     vol_step = float(info.volume_step)
@@ -48,6 +51,7 @@ def backtest_donchian_trades(pair, df, capital, risk_pct, risk_mode, commission)
     Backtest donchian breakout strategy with given DataFrame and return a DataFrame of trade results 
     """
 
+    import MetaTrader5 as mt5
     trade_log = []
 
     for i, row in df.iterrows():
@@ -120,3 +124,351 @@ def backtest_donchian_trades(pair, df, capital, risk_pct, risk_mode, commission)
     trade_df = pd.DataFrame(trade_log)
     return trade_df
 
+
+
+# Exit reason codes used by the columnar engine
+EXIT_REASONS = np.array(["Reverse_signal", "SL", "End of Data"], dtype=object)
+EXIT_REVERSE, EXIT_SL, EXIT_END = 0, 1, 2
+
+
+def _next_index_of(mask):
+    """ 
+    For every bar j return the smallest k >= j where mask[k] is True (len(mask) if none). Result has one extra slot at the end
+    """
+    n = len(mask)
+    idx = np.where(mask, np.arange(n), n)
+    nxt = np.minimum.accumulate(idx[::-1])[::-1]
+    return np.append(nxt, n)
+
+
+def _first_hit_scan(hit_fn, start, stop, chunk=256):
+    """ 
+    Return the first index in [start, stop) where hit_fn(slice) is True, or stop if never hit.
+    The window is scanned in growing chunks so long-lived trades do not compare the whole tail at once.
+    """
+    pos = start
+    while pos < stop:
+        end = min(stop, pos + chunk)
+        hits = hit_fn(pos, end)
+        if hits.any():
+            return pos + int(np.argmax(hits))
+        pos = end
+        chunk *= 2
+    return stop
+
+
+def _first_stop_hits(entry_idx, is_buy, sl, stop, bid_l, ask_h):
+    """ 
+    First bar in (entry, stop) of every trade whose bid_l (BUY) / ask_h (SELL) crosses its stop loss, len(bid_l) if none
+    """
+    n = len(bid_l)
+    first_sl = np.full(len(entry_idx), n, dtype=np.int64)
+
+    if len(entry_idx) == 1 or np.all(stop[:-1] <= entry_idx[1:] + 1):
+        # Entries alternate -> every bar belongs to at most one open trade: one vectorized pass
+        bars = np.arange(entry_idx[0] + 1, n)
+        owner = np.searchsorted(entry_idx, bars, side='left') - 1
+        in_window = bars < stop[owner]
+        hit = np.where(is_buy[owner], bid_l[bars] <= sl[owner], ask_h[bars] >= sl[owner]) & in_window
+        hit_bars = bars[hit]
+        owners, first_pos = np.unique(owner[hit], return_index=True)
+        first_sl[owners] = hit_bars[first_pos]
+    else:
+        # Overlapping positions (v1 pyramiding): bounded scan per entry, comparisons stay in NumPy
+        for k in range(len(entry_idx)):
+            first_sl[k] = _next_stop_hit(is_buy[k], sl[k], entry_idx[k] + 1, min(stop[k], n), bid_l, ask_h, n)
+    return first_sl
+
+
+def _next_stop_hit(buy, level, start, stop, bid_l, ask_h, n):
+    """ 
+    First bar in [start, stop) crossing the stop level of one trade, n if none
+    """
+    if buy:
+        hit = _first_hit_scan(lambda a, b: bid_l[a:b] <= level, start, stop)
+    else:
+        hit = _first_hit_scan(lambda a, b: ask_h[a:b] >= level, start, stop)
+    return hit if hit < stop else n
+
+
+def _trade_windows(entry, sl_buy, sl_sell):
+    """ 
+    Entry bars, side (True for BUY), stop loss and next opposite entry (len(entry) when there is none) of every trade
+    """
+    n = len(entry)
+    entry_idx = np.flatnonzero(entry != 0)
+    is_buy = entry[entry_idx] == 1
+    sl = np.where(is_buy, np.asarray(sl_buy, dtype=float)[entry_idx], np.asarray(sl_sell, dtype=float)[entry_idx])
+
+    # Next opposite entry strictly after each entry (n when there is none)
+    next_buy = _next_index_of(entry == 1)
+    next_sell = _next_index_of(entry == -1)
+    rev = np.where(is_buy, next_sell[entry_idx + 1], next_buy[entry_idx + 1])
+    return entry_idx, is_buy, sl, rev
+
+
+def find_trade_exits(entry, sl_buy, sl_sell, bid_l, ask_h):
+    """ 
+    Find the exit bar of every entry of a signal frame using plain arrays.
+    Same rules as backtest_donchian_trades: an opposite entry closes the trade, otherwise the first bar whose bid_l (BUY) / ask_h (SELL) crosses the stop, otherwise the last bar.
+
+    Return (entry_idx, exit_idx, exit_code) arrays, exit_code is one of EXIT_REVERSE, EXIT_SL, EXIT_END
+    """
+    entry = np.asarray(entry)
+    n = len(entry)
+    if not np.any(entry != 0):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty.copy(), empty.copy()
+
+    entry_idx, is_buy, sl, rev = _trade_windows(entry, sl_buy, sl_sell)
+
+    # Stop loss is searched in (entry, reverse) - on the reverse bar the signal wins
+    first_sl = _first_stop_hits(entry_idx, is_buy, sl, rev, np.asarray(bid_l, dtype=float), np.asarray(ask_h, dtype=float))
+
+    exit_idx = np.where(first_sl < rev, first_sl, np.minimum(rev, n - 1))
+    exit_code = np.where(first_sl < rev, EXIT_SL, np.where(rev < n, EXIT_REVERSE, EXIT_END))
+
+    return entry_idx, exit_idx.astype(np.int64), exit_code.astype(np.int64)
+
+
+def build_sub_bars(times, sub_df, timeframe):
+    """ 
+    Lower timeframe bars (add_bid_ask_columns layout, full or compact, e.g. M1) of the bars at `times` for resolve_intrabar_exits.
+    timeframe: timeframe of the bars at `times`. Return dict of arrays: lo / hi (sub-bar range of every bar, see
+    data.resample.sub_bar_ranges), bid_o, bid_l, ask_o, ask_h of the sub-bars
+    """
+    lo, hi = sub_bar_ranges(times, sub_df['time'].to_numpy(), timeframe)
+    return {
+        "lo": lo,
+        "hi": hi,
+        "bid_o": sub_df['bid_o'].to_numpy(dtype=float),
+        "bid_l": sub_df['bid_l'].to_numpy(dtype=float),
+        "ask_o": ask_column(sub_df, 'o').to_numpy(dtype=float),
+        "ask_h": ask_column(sub_df, 'h').to_numpy(dtype=float),
+    }
+
+
+def _check_sub_bars(sub_bars, bars, is_buy, sl):
+    """ 
+    Check the stop of trades against the sub-bars of one candidate bar each.
+    Return (confirmed, fill): the stop is crossed by a sub-bar, fill price at the first crossing sub-bar -
+    the stop, or the sub-bar open when it opens beyond the stop (gap). Bars without sub-bars are confirmed at the stop
+    """
+    lo, hi = sub_bars["lo"][bars], sub_bars["hi"][bars]
+    counts = hi - lo
+    confirmed = counts == 0
+    fill = sl.copy()
+
+    has_sub = np.flatnonzero(counts > 0)
+    if len(has_sub) == 0:
+        return confirmed, fill
+
+    # flat index of every sub-bar of the candidate bars, grouped per candidate
+    c = counts[has_sub]
+    starts = np.concatenate([[0], np.cumsum(c)[:-1]])
+    owner = np.repeat(np.arange(len(has_sub)), c)
+    sub = lo[has_sub][owner] + np.arange(c.sum()) - starts[owner]
+
+    buy, level = is_buy[has_sub][owner], sl[has_sub][owner]
+    hit = np.where(buy, sub_bars["bid_l"][sub] <= level, sub_bars["ask_h"][sub] >= level)
+    first = np.minimum.reduceat(np.where(hit, np.arange(len(sub)), len(sub)), starts)
+
+    found = first < len(sub)
+    rows, first_sub = has_sub[found], sub[first[found]]
+    confirmed[rows] = True
+    fill[rows] = np.where(is_buy[rows], np.minimum(sl[rows], sub_bars["bid_o"][first_sub]),
+                          np.maximum(sl[rows], sub_bars["ask_o"][first_sub]))
+    return confirmed, fill
+
+
+def resolve_intrabar_exits(entry, sl_buy, sl_sell, bid_l, ask_h, sub_bars):
+    """ 
+    find_trade_exits with stop losses resolved on lower timeframe sub-bars (build_sub_bars).
+    Only the bars where the bar itself crosses the stop are checked against their sub-bars:
+    - a crossing not confirmed by the sub-bars is no stop, the search goes on with the next crossing bar
+    - on the bar of the opposite entry (filled at the close) a confirmed stop comes first and closes the trade
+    - a sub-bar opening beyond the stop fills at its open (gap) instead of the stop
+    Exit times stay on the bars of the signal frame.
+
+    Return (entry_idx, exit_idx, exit_code, exit_fill) arrays, exit_fill is the SL fill price (NaN for other exits)
+    """
+    entry = np.asarray(entry)
+    n = len(entry)
+    if not np.any(entry != 0):
+        empty = np.array([], dtype=np.int64)
+        return empty, empty.copy(), empty.copy(), np.array([], dtype=float)
+
+    bid_l = np.asarray(bid_l, dtype=float)
+    ask_h = np.asarray(ask_h, dtype=float)
+    entry_idx, is_buy, sl, rev = _trade_windows(entry, sl_buy, sl_sell)
+
+    # candidates are searched in (entry, reverse] - the reverse bar is ambiguous too
+    stop = np.minimum(rev + 1, n)
+    candidate = _first_stop_hits(entry_idx, is_buy, sl, stop, bid_l, ask_h)
+    exit_fill = np.full(len(entry_idx), np.nan)
+    sl_exit = np.zeros(len(entry_idx), dtype=bool)
+
+    pending = np.flatnonzero(candidate < n)
+    while len(pending):
+        confirmed, fill = _check_sub_bars(sub_bars, candidate[pending], is_buy[pending], sl[pending])
+
+        done = pending[confirmed]
+        # without sub-bars the reverse bar keeps the signal-wins rule of find_trade_exits
+        no_sub = sub_bars["lo"][candidate[done]] == sub_bars["hi"][candidate[done]]
+        keep = ~(no_sub & (candidate[done] == rev[done]))
+        sl_exit[done[keep]] = True
+        exit_fill[done[keep]] = fill[confirmed][keep]
+
+        # rejected crossings (sub-bars do not reach the stop): next crossing bar of the same trade
+        pending = pending[~confirmed]
+        for k in pending:
+            candidate[k] = _next_stop_hit(is_buy[k], sl[k], candidate[k] + 1, stop[k], bid_l, ask_h, n)
+        pending = pending[candidate[pending] < n]
+
+    exit_idx = np.where(sl_exit, candidate, np.minimum(rev, n - 1))
+    exit_code = np.where(sl_exit, EXIT_SL, np.where(rev < n, EXIT_REVERSE, EXIT_END))
+
+    return entry_idx, exit_idx.astype(np.int64), exit_code.astype(np.int64), exit_fill
+
+
+def backtest_donchian_trades_fast(pair, df, capital, risk_pct, risk_mode, commission, spec=None, sub_bars=None):
+    """ 
+    Columnar version of backtest_donchian_trades: exits of all entries are found on NumPy arrays,
+    only the capital dependent sizing / PnL runs as a sequential loop over trades (not bars).
+    Return the same trade log DataFrame as backtest_donchian_trades
+
+    spec: optional contract spec from backtest.profit_engine (get_symbol_spec / load_symbol_specs).
+          When given, lot sizes and PnL are computed offline for all trades at once - no MT5 terminal needed.
+    sub_bars: optional lower timeframe bars of df (build_sub_bars) to resolve stop losses intrabar, see resolve_intrabar_exits
+    """
+    cols = {col: df[col].to_numpy() for col in TRADE_COLUMNS}
+    return simulate_trades(pair, cols, capital, risk_pct, risk_mode, commission, spec=spec, sub_bars=sub_bars)
+
+
+# Columns of the signal frame used by the columnar engine
+TRADE_COLUMNS = ('time', 'entry', 'sl_buy', 'sl_sell', 'bid_l', 'ask_h', 'bid_c', 'ask_c')
+
+
+def simulate_trades(pair, cols, capital, risk_pct, risk_mode, commission, spec=None, sub_bars=None):
+    """ 
+    Array entry point of backtest_donchian_trades_fast. cols: dict of arrays keyed by TRADE_COLUMNS
+    """
+    entry = np.asarray(cols['entry'])
+    times = np.asarray(cols['time'])
+    bid_c = np.asarray(cols['bid_c'], dtype=float)
+    ask_c = np.asarray(cols['ask_c'], dtype=float)
+    sl_buy = np.asarray(cols['sl_buy'], dtype=float)
+    sl_sell = np.asarray(cols['sl_sell'], dtype=float)
+
+    if sub_bars is None:
+        entry_idx, exit_idx, exit_code = find_trade_exits(entry, sl_buy, sl_sell, cols['bid_l'], cols['ask_h'])
+        sl_fill = np.where(entry[entry_idx] == 1, sl_buy[entry_idx], sl_sell[entry_idx])
+    else:
+        entry_idx, exit_idx, exit_code, sl_fill = resolve_intrabar_exits(entry, sl_buy, sl_sell, cols['bid_l'], cols['ask_h'], sub_bars)
+
+    if spec is not None:
+        return _trades_from_spec(pair, spec, times, entry, bid_c, ask_c, sl_buy, sl_sell,
+                                 entry_idx, exit_idx, exit_code, capital, risk_pct, risk_mode, commission, sl_fill)
+
+    import MetaTrader5 as mt5
+    trade_log = []
+    for i, j, code, fill in zip(entry_idx, exit_idx, exit_code, sl_fill):
+        side = "BUY" if entry[i] == 1 else "SELL"
+        if side == "BUY":
+            entry_price, stop_loss = ask_c[i], sl_buy[i]
+        else:
+            entry_price, stop_loss = bid_c[i], sl_sell[i]
+
+        lot = calculate_lot_size(pair, entry_price, stop_loss, capital, risk_pct, risk_mode, side)
+        if lot == 0:
+            continue
+
+        if code == EXIT_SL:
+            exit_price = fill
+        else:
+            exit_price = bid_c[j] if side == 'BUY' else ask_c[j]
+
+        order_type_mt5 = mt5.ORDER_TYPE_BUY if side == "BUY" else mt5.ORDER_TYPE_SELL
+        profit_bc = mt5.order_calc_profit(order_type_mt5, pair, lot, entry_price, exit_price)
+        total_commission = commission * lot
+        profit_ac = profit_bc - total_commission
+
+        capital += profit_ac
+
+        trade_log.append({
+            "symbol": pair,
+            "entry_time": times[i],
+            "exit_time": times[j],
+            "exit_reason": EXIT_REASONS[code],
+            "side": side,
+            "lot": lot,
+            "entry_price": entry_price,
+            "exit_price": exit_price,
+            "profit_bc": profit_bc,
+            "commission": total_commission,
+            "profit_ac": profit_ac,
+            "acc_balance": capital
+        })
+
+    trade_df = pd.DataFrame(trade_log)
+    return trade_df
+
+
+def _trades_from_spec(pair, spec, times, entry, bid_c, ask_c, sl_buy, sl_sell,
+                      entry_idx, exit_idx, exit_code, capital, risk_pct, risk_mode, commission, sl_fill=None):
+    """ 
+    Offline sizing / PnL of all trade paths with a cached contract spec.
+    FIXED_AMOUNT is fully vectorized, PCT_BALANCE keeps a scalar loop over trades because lot depends on the running balance
+    sl_fill: optional fill price of SL exits (intrabar gaps), the stop loss otherwise
+    """
+    if len(entry_idx) == 0:
+        return pd.DataFrame([])
+
+    sides = entry[entry_idx]
+    is_buy = sides == 1
+    entry_price = np.where(is_buy, ask_c[entry_idx], bid_c[entry_idx])
+    stop_loss = np.where(is_buy, sl_buy[entry_idx], sl_sell[entry_idx])
+    exit_price = np.where(exit_code == EXIT_SL, stop_loss if sl_fill is None else sl_fill,
+                          np.where(is_buy, bid_c[exit_idx], ask_c[exit_idx]))
+
+    sl_mpl = money_per_lot(spec, sides, entry_price, stop_loss)
+    exit_mpl = money_per_lot(spec, sides, entry_price, exit_price)
+
+    if risk_mode == 'FIXED_AMOUNT':
+        lots = lots_from_risk(spec, sl_mpl, risk_pct)
+        profit_bc = round_profit(spec, exit_mpl * lots)
+    else:
+        lots = np.zeros(len(entry_idx))
+        profit_bc = np.zeros(len(entry_idx))
+        balance = capital
+        for k in range(len(entry_idx)):
+            lot = float(lots_from_risk(spec, sl_mpl[k], balance * risk_pct))
+            if lot == 0:
+                continue
+            lots[k] = lot
+            profit_bc[k] = round_profit(spec, exit_mpl[k] * lot)
+            balance += profit_bc[k] - commission * lot
+
+    keep = lots != 0
+    if not keep.any():
+        return pd.DataFrame([])
+
+    lots, profit_bc = lots[keep], profit_bc[keep]
+    total_commission = commission * lots
+    profit_ac = profit_bc - total_commission
+    acc_balance = np.cumsum(np.concatenate([[capital], profit_ac]))[1:]
+
+    return pd.DataFrame({
+        "symbol": pair,
+        "entry_time": times[entry_idx[keep]],
+        "exit_time": times[exit_idx[keep]],
+        "exit_reason": EXIT_REASONS[exit_code[keep]],
+        "side": np.where(is_buy[keep], "BUY", "SELL").astype(object),
+        "lot": lots,
+        "entry_price": entry_price[keep],
+        "exit_price": exit_price[keep],
+        "profit_bc": profit_bc,
+        "commission": total_commission,
+        "profit_ac": profit_ac,
+        "acc_balance": acc_balance,
+    })
@@ -0,0 +1,311 @@
+import os
+import sys
+import json
+import time
+import argparse
+import itertools
+import traceback
+import multiprocessing as mp
+from collections import deque
+from multiprocessing.connection import wait
+import pandas as pd
+from config import config
+from data.timeframes import timeframe_name, TIMEFRAME_CODES
+
+
+# Runner module of every strategy version. Any other version (e.g. "v3") is rejected when the spec is expanded
+STRATEGY_RUNNERS = {"v1": "backtest.runner_v1", "v2": "backtest.runner_v2"}
+
+RISK_MODES = (config.RISK_MODE_FIXED_AMOUNT, config.RISK_MODE_PCT_BALANCE)
+
+# Fields of a job and their default (config/config.py) when neither the job block nor [defaults] sets them
+JOB_DEFAULTS = {
+    "symbol": config.PAIR,
+    "timeframe": timeframe_name(config.TIMEFRAME),
+    "date_range": [config.START_DATE.date().isoformat(), config.END_DATE.date().isoformat()],
+    "strategy": "v2",
+    "lookback": config.DONCHIAN_LOOKBACK,
+    "initial_capital": config.INITIAL_CAPITAL,
+    "risk_per_trade": config.RISK_PER_TRADE,
+    "risk_mode": config.RISK_MODE,
+    "commission_per_lot": config.COMMISSION_PER_LOT,
+    "equity": "realized",
+    "sub_timeframe": None,
+}
+
+# Report columns copied into the summary table
+SUMMARY_METRICS = ("Trades", "Return (%)", "Sharpe ratio", "Profit factor", "Max DD (%)", "Win rate (%)")
+
+# Top level keys of a spec file
+SPEC_KEYS = ("out_dir", "n_workers", "timeout", "bar_store", "symbol_specs", "result_cache", "defaults", "jobs")
+
+
+def load_spec(file_path):
+    """
+    Read a batch spec from a .json or .toml file
+    """
+    ext = os.path.splitext(file_path)[1].lower()
+    if ext == ".json":
+        with open(file_path) as f:
+            return json.load(f)
+    if ext == ".toml":
+        try:
+            import tomllib
+        except ImportError as exc:
+            raise ImportError("TOML specs need Python 3.11+ (tomllib), use a .json spec otherwise") from exc
+        with open(file_path, "rb") as f:
+            return tomllib.load(f)
+    raise ValueError(f"Unknown spec extension {ext!r}, expected .json or .toml")
+
+
+def _axis(field, value):
+    """
+    Values of one job field: a list is a grid axis, a scalar a single value. date_range is one [start, end] pair
+    or a list of pairs (ISO strings, or TOML dates)
+    """
+    if field == "date_range":
+        return [value] if value and not isinstance(value[0], (list, tuple)) else list(value)
+    return list(value) if isinstance(value, (list, tuple)) else [value]
+
+
+def _check_job(job):
+    if job["strategy"] not in STRATEGY_RUNNERS:
+        raise ValueError(f"strategy {job['strategy']!r} is not implemented, expected one of {tuple(STRATEGY_RUNNERS)}")
+    if job["risk_mode"] not in RISK_MODES:
+        raise ValueError(f"risk_mode must be one of {RISK_MODES}, got {job['risk_mode']!r}")
+    for field in ("timeframe", "sub_timeframe"):
+        if job[field] is not None and timeframe_name(job[field]) not in TIMEFRAME_CODES:
+            raise ValueError(f"Unknown {field} {job[field]!r}")
+    if len(job["date_range"]) != 2:
+        raise ValueError(f"date_range must be [start, end], got {job['date_range']!r}")
+
+
+def expand_jobs(spec):
+    """
+    Job queue of a spec: every [[jobs]] block is merged over [defaults] and JOB_DEFAULTS, then expanded into the
+    cartesian product of its list valued fields (symbol = ["BTCUSD", "XAUUSD"], lookback = [50, 100], ...).
+    Return list of job dicts in spec order, each with a unique job_id
+    """
+    unknown = set(spec) - set(SPEC_KEYS)
+    if unknown:
+        raise ValueError(f"Unknown spec keys {sorted(unknown)}, expected {SPEC_KEYS}")
+    defaults = dict(JOB_DEFAULTS, **spec.get("defaults", {}))
+
+    if "jobs" in spec and not spec["jobs"]:
+        raise ValueError("The spec has an empty job list, remove the jobs key to run one job from [defaults]")
+
+    jobs = []
+    for block in spec.get("jobs", [{}]):
+        fields = dict(defaults, **block)
+        unknown = set(fields) - set(JOB_DEFAULTS)
+        if unknown:
+            raise ValueError(f"Unknown job fields {sorted(unknown)}, expected {tuple(JOB_DEFAULTS)}")
+        names = list(fields)
+        for values in itertools.product(*(_axis(name, fields[name]) for name in names)):
+            job = dict(zip(names, values))
+            _check_job(job)
+            job["timeframe"] = timeframe_name(job["timeframe"])
+            job["job_id"] = f"{len(jobs):04d}_{job['symbol']}_{job['timeframe']}_{job['strategy']}_lb{job['lookback']}"
+            jobs.append(job)
+    return jobs
+
+
+def _job_row(job):
+    row = {key: job[key] for key in ("job_id", "symbol", "timeframe", "strategy", "lookback",
+                                     "risk_per_trade", "risk_mode")}
+    row["start_date"], row["end_date"] = (str(date) for date in job["date_range"])
+    return row
+
+
+def _connect_terminal():
+    import MetaTrader5 as mt5
+    if not mt5.initialize():
+        raise RuntimeError("MT5 is not initialized.")
+
+
+def _job_dates(job):
+    return tuple(pd.Timestamp(date).to_pydatetime() for date in job["date_range"])
+
+
+def warm_bar_store(jobs, root):
+    """
+    Fetch the bars of every job into the bar store at root before the job processes start: one fetch per
+    symbol and (sub) timeframe over the union of its jobs' date ranges. The jobs then read the store offline
+    (BarStore.offline), so no two processes fetch the same bars or replace the same file.
+    Connects to MT5 only when some bars are missing. Return the {(symbol, timeframe): (start, end)} ranges
+    """
+    from data.bar_store import BarStore
+    spans = {}
+    for job in jobs:
+        start, end = _job_dates(job)
+        for tf in (job["timeframe"], job["sub_timeframe"]):
+            if tf is None:
+                continue
+            key = (job["symbol"], timeframe_name(tf))
+            lo, hi = spans.get(key, (start, end))
+            spans[key] = (min(lo, start), max(hi, end))
+
+    store = BarStore(root)
+    coverage = {key: store.coverage(key[0], TIMEFRAME_CODES[key[1]]) for key in spans}
+    if any(cov is None or cov[0] > start or cov[1] < end for cov, (start, end) in zip(coverage.values(), spans.values())):
+        _connect_terminal()
+    for (symbol, tf), (start, end) in spans.items():
+        store.get_rates(symbol, TIMEFRAME_CODES[tf], start, end)
+    return spans
+
+
+def run_job(job, options):
+    """
+    Backtest one job with the runner of its strategy version and write trades.csv, report.csv and balance_daily.csv
+    to out_dir/jobs/<job_id>. Return its summary row
+    """
+    import importlib
+    runner = importlib.import_module(STRATEGY_RUNNERS[job["strategy"]])
+    start = time.perf_counter()
+
+    kwargs = {}
+    if options["bar_store"] is not None:
+        from data.bar_store import BarStore
+        kwargs["bar_store"] = BarStore(options["bar_store"]).offline()
+    if options["result_cache"] is not None:
+        from backtest.result_cache import ResultCache
+        kwargs["result_cache"] = ResultCache(options["result_cache"])
+    if options["symbol_specs"] is not None:
+        kwargs["symbol_spec"] = options["symbol_specs"][job["symbol"]]
+    if job["sub_timeframe"] is not None:
+        kwargs["sub_timeframe"] = TIMEFRAME_CODES[timeframe_name(job["sub_timeframe"])]
+
+    res = runner.run_backtest_for_symbol(
+        job["symbol"], TIMEFRAME_CODES[job["timeframe"]], *_job_dates(job),
+        job["initial_capital"], job["risk_per_trade"], job["risk_mode"], job["commission_per_lot"], job["lookback"],
+        equity=job["equity"], compact=True, **kwargs,
+    )
+
+    job_dir = os.path.join(options["out_dir"], "jobs", job["job_id"])
+    os.makedirs(job_dir, exist_ok=True)
+    res["trades"].to_csv(os.path.join(job_dir, "trades.csv"), index=False)
+    res["report_df"].to_csv(os.path.join(job_dir, "report.csv"), index=False)
+    res["balance_daily"].to_csv(os.path.join(job_dir, "balance_daily.csv"))
+
+    row = dict(_job_row(job), status="ok", error=None, seconds=time.perf_counter() - start,
+               cached=res.get("cached", False))
+    for col in SUMMARY_METRICS:
+        row[col] = res["report_df"][col].iloc[0] if col in res["report_df"] else None
+    return row
+
+
+def _job_process(job, options, conn):
+    """
+    Body of a job process: connect to MT5 when bars or specs come from the terminal, run the job, send back its row
+    """
+    try:
+        if options["needs_terminal"]:
+            _connect_terminal()
+        conn.send(run_job(job, options))
+    except Exception:
+        conn.send(dict(_job_row(job), status="error", error=traceback.format_exc(limit=5)))
+    finally:
+        conn.close()
+
+
+def run_batch(spec, out_dir=None, n_workers=None, timeout=None):
+    """
+    Run every job of a spec (dict or spec file path) and write out_dir/summary.csv, one row per job.
+
+    Each job runs in its own process, at most n_workers at a time, so a job exceeding timeout (seconds) is killed
+    without touching the others and recorded with status "timeout". A job raising an error is recorded with
+    status "error" and its traceback. Arguments left to None come from the spec (n_workers defaults to the CPU count).
+    With a bar_store, the bars of all jobs are fetched first in this process (warm_bar_store) and jobs read them offline.
+    Return the summary DataFrame in job order
+    """
+    if isinstance(spec, str):
+        spec = load_spec(spec)
+    jobs = expand_jobs(spec)
+    out_dir = out_dir or spec.get("out_dir", "batch_results")
+    n_workers = n_workers or spec.get("n_workers") or os.cpu_count()
+    timeout = timeout or spec.get("timeout")
+    os.makedirs(out_dir, exist_ok=True)
+
+    symbol_specs = spec.get("symbol_specs")
+    if isinstance(symbol_specs, str):
+        from backtest.profit_engine import load_symbol_specs
+        symbol_specs = load_symbol_specs(symbol_specs)
+    options = {
+        "out_dir": out_dir,
+        "bar_store": spec.get("bar_store"),
+        "result_cache": spec.get("result_cache"),
+        "symbol_specs": symbol_specs,
+        "needs_terminal": spec.get("bar_store") is None or symbol_specs is None,
+    }
+    if options["bar_store"] is not None:
+        warm_bar_store(jobs, options["bar_store"])
+        options["needs_terminal"] = symbol_specs is None
+    with open(os.path.join(out_dir, "jobs.json"), "w") as f:
+        json.dump(jobs, f, indent=2, default=str)
+
+    pending, running, rows = deque(jobs), {}, []
+    while pending or running:
+        while pending and len(running) < n_workers:
+            job = pending.popleft()
+            recv, send = mp.Pipe(duplex=False)
+            proc = mp.Process(target=_job_process, args=(job, options, send), daemon=True)
+            proc.start()
+            send.close()
+            running[recv] = (job, proc, time.monotonic() + timeout if timeout else None)
+
+        deadlines = [deadline for _, _, deadline in running.values() if deadline is not None]
+        wait_s = max(0.0, min(deadlines) - time.monotonic()) if deadlines else None
+        done = []
+        for conn in wait(list(running), timeout=wait_s):
+            job, proc, _ = running.pop(conn)
+            try:
+                row = conn.recv()
+            except EOFError:
+                row = dict(_job_row(job), status="error", error=f"job process exited with code {proc.exitcode}")
+            conn.close()
+            proc.join()
+            done.append(row)
+
+        now = time.monotonic()
+        for conn, (job, proc, deadline) in list(running.items()):
+            if deadline is not None and now >= deadline:
+                proc.terminate()
+                proc.join()
+                conn.close()
+                del running[conn]
+                done.append(dict(_job_row(job), status="timeout", error=f"no result after {timeout}s"))
+
+        for row in done:
+            rows.append(row)
+            print(f"[{len(rows)}/{len(jobs)}] {row['job_id']} {row['status']}")
+
+    order = {job["job_id"]: k for k, job in enumerate(jobs)}
+    summary = pd.DataFrame(rows).sort_values("job_id", key=lambda ids: ids.map(order)).reset_index(drop=True)
+    summary.to_csv(os.path.join(out_dir, "summary.csv"), index=False)
+    return summary
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run a batch of Donchian backtests from a JSON / TOML job spec")
+    parser.add_argument("spec", help="job spec file (.json or .toml)")
+    parser.add_argument("--out", help="output directory (default: out_dir of the spec, else batch_results)")
+    parser.add_argument("--workers", type=int, help="job processes running at once (default: spec n_workers, else CPU count)")
+    parser.add_argument("--timeout", type=float, help="seconds per job (default: spec timeout, else none)")
+    parser.add_argument("--dry-run", action="store_true", help="print the expanded job queue and exit")
+    args = parser.parse_args(argv)
+
+    spec = load_spec(args.spec)
+    if args.dry_run:
+        for job in expand_jobs(spec):
+            print(job["job_id"], job["date_range"][0], job["date_range"][1], job["risk_per_trade"], job["risk_mode"])
+        return 0
+
+    summary = run_batch(spec, args.out, args.workers, args.timeout)
+    failed = summary[summary["status"] != "ok"]
+    print(f"{len(summary) - len(failed)}/{len(summary)} jobs ok, summary saved in "
+          f"{os.path.join(args.out or spec.get('out_dir', 'batch_results'), 'summary.csv')}")
+    return 1 if len(failed) else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
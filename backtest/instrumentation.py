@@ -0,0 +1,172 @@
+import json
+import time
+import logging
+import tracemalloc
+import pandas as pd
+
+logger = logging.getLogger(__name__)
+
+
+class _Stage:
+    """
+    Context manager measuring one stage of a StageTimer. The yielded dict takes the stage row count: st["rows"] = len(df)
+    """
+
+    def __init__(self, timer, name):
+        self.timer = timer
+        self.record = {"stage": name, "rows": None, "trace_memory": timer.trace_memory}
+
+    def __enter__(self):
+        if self.timer.trace_memory:
+            if not tracemalloc.is_tracing():
+                tracemalloc.start()
+                self.timer._started_tracing = True
+            tracemalloc.reset_peak()
+            self._mem_start = tracemalloc.get_traced_memory()[0]
+        self._cpu = time.process_time()
+        self._wall = time.perf_counter()
+        return self.record
+
+    def __exit__(self, exc_type, exc, tb):
+        self.record["wall_s"] = time.perf_counter() - self._wall
+        self.record["cpu_s"] = time.process_time() - self._cpu
+        if self.timer.trace_memory:
+            self.record["peak_mb"] = (tracemalloc.get_traced_memory()[1] - self._mem_start) / 2 ** 20
+        else:
+            self.record["peak_mb"] = None
+        self.timer.records.append(self.record)
+        return False
+
+
+class StageTimer:
+    """
+    Per-stage wall time, CPU time, row count and, with trace_memory=True, peak allocated memory (tracemalloc, above
+    the memory in use when the stage starts) of a pipeline run.
+
+        timer = StageTimer(sink=JsonSink("timings.jsonl"))
+        with timer.stage("signal") as st:
+            signal = donchian_breakout_channel_v2(data, lookback)
+            st["rows"] = len(signal)
+        timer.flush(pair="BTCUSD")
+
+    tracemalloc slows down allocation heavy stages several times while it is tracing, so it is off by default and
+    the times of a traced run (trace_memory=True in every record, peak_mb set) are not comparable with untraced ones.
+    Trace memory in a separate run when both are needed
+    """
+
+    def __init__(self, sink=None, trace_memory=False):
+        self.sink = sink
+        self.trace_memory = trace_memory
+        self.records = []
+        self._started_tracing = False
+
+    def stage(self, name):
+        return _Stage(self, name)
+
+    def flush(self, **context):
+        """
+        Stop tracing memory if this timer started it, send the records (with context keys added) to the sink and return them
+        """
+        if self._started_tracing:
+            tracemalloc.stop()
+            self._started_tracing = False
+
+        records = [dict(context, **record) for record in self.records]
+        self.records = []
+        if self.sink is not None and records:
+            self.sink(records)
+        return records
+
+
+class _NullStage:
+    def __enter__(self):
+        return {}
+
+    def __exit__(self, exc_type, exc, tb):
+        return False
+
+
+class NullTimer:
+    """
+    Disabled timer with the StageTimer interface: no clock read, no tracing, nothing recorded
+    """
+    _stage = _NullStage()
+    records = []
+
+    def stage(self, name):
+        return self._stage
+
+    def flush(self, **context):
+        return []
+
+
+NULL_TIMER = NullTimer()
+
+
+def log_sink(log=None, level=logging.INFO):
+    """
+    Sink writing one log line per record
+    """
+    log = log or logger
+
+    def sink(records):
+        for record in records:
+            log.log(level, "stage timing %s", record)
+    return sink
+
+
+class JsonSink:
+    """
+    Sink appending records to a JSON lines file
+    """
+
+    def __init__(self, file_path):
+        self.file_path = file_path
+
+    def __call__(self, records):
+        with open(self.file_path, "a") as f:
+            for record in records:
+                f.write(json.dumps(record, default=str) + "\n")
+
+
+def make_timer(instrument=None):
+    """
+    Timer from the `instrument` argument of the runners / grind search:
+    None or False -> NULL_TIMER, True -> StageTimer without sink, "log" -> log_sink(), other str -> JsonSink(path),
+    callable -> StageTimer(sink=callable), StageTimer / NullTimer -> used as is.
+    Memory is only traced by a StageTimer(trace_memory=True) passed as is, timings of the other values are untraced
+    """
+    if not instrument:
+        return NULL_TIMER
+    if isinstance(instrument, (StageTimer, NullTimer)):
+        return instrument
+    if instrument is True:
+        return StageTimer()
+    if instrument == "log":
+        return StageTimer(sink=log_sink())
+    if isinstance(instrument, str):
+        return StageTimer(sink=JsonSink(instrument))
+    if callable(instrument):
+        return StageTimer(sink=instrument)
+    raise ValueError(f"Unsupported instrument value: {instrument!r}")
+
+
+def aggregate_timings(records):
+    """
+    Aggregate stage records of many runs: calls, total / mean / max wall time, total CPU time, max peak memory and total rows per stage
+    """
+    df = pd.DataFrame(records)
+    if df.empty:
+        return pd.DataFrame()
+
+    df["rows"] = pd.to_numeric(df["rows"])
+    df["peak_mb"] = pd.to_numeric(df["peak_mb"])
+    return df.groupby("stage", sort=False).agg(
+        calls=("wall_s", "size"),
+        wall_s=("wall_s", "sum"),
+        wall_mean_s=("wall_s", "mean"),
+        wall_max_s=("wall_s", "max"),
+        cpu_s=("cpu_s", "sum"),
+        peak_mb=("peak_mb", "max"),
+        rows=("rows", "sum"),
+    )
@@ -0,0 +1,263 @@
+import heapq
+import itertools
+import numpy as np
+import pandas as pd
+from data.data_process import get_data_from_mt5, add_bid_ask_columns
+from strategies.donchian_strat import donchian_channels, breakout_signal, ENTRY_FUNCTIONS
+from backtest.backtest import find_trade_exits, EXIT_REASONS, EXIT_SL
+from backtest.profit_engine import get_symbol_spec, money_per_lot, lots_from_risk, lot_from_risk_scalar, round_profit_scalar
+from metrics.metrics import performance_report_fast, drawdown_stats
+
+
+# Event kinds of the portfolio queue. At equal times exits come first, so a reverse frees its slot before the new entry.
+# A trade exiting at its own entry time (entry on the last bar) exits after the entries, once it has been opened
+EVENT_EXIT, EVENT_ENTRY, EVENT_SAME_TIME_EXIT = 0, 1, 2
+
+
+def trade_paths(bars, lookback, strategy_version="v2", close_col_name='bid_c', spread_col='real_spread', sl_spread_mult=1.0):
+    """
+    Capital independent part of the trades of one symbol on bid/ask bars: entry / exit times, side and prices of every entry.
+    Sizing needs the account balance, so it is left to simulate_portfolio.
+    Return dict of arrays: entry_time, exit_time, exit_code, is_buy, entry_price, stop_loss, exit_price
+    """
+    close = bars[close_col_name].to_numpy(dtype=float)
+    spread = bars[spread_col].to_numpy(dtype=float)
+    bid_c = bars['bid_c'].to_numpy(dtype=float)
+    ask_c = bars['ask_c'].to_numpy(dtype=float)
+    times = bars['time'].to_numpy()
+
+    donchian_high, donchian_low = donchian_channels(close, [lookback])[lookback]
+    entry, _ = ENTRY_FUNCTIONS[strategy_version](breakout_signal(close, donchian_high, donchian_low))
+    sl_buy = donchian_low - sl_spread_mult * spread
+    sl_sell = donchian_high + sl_spread_mult * spread
+
+    entry_idx, exit_idx, exit_code = find_trade_exits(entry, sl_buy, sl_sell, bars['bid_l'], bars['ask_h'])
+    is_buy = entry[entry_idx] == 1
+    stop_loss = np.where(is_buy, sl_buy[entry_idx], sl_sell[entry_idx])
+    return {
+        "entry_time": times[entry_idx],
+        "exit_time": times[exit_idx],
+        "exit_code": exit_code,
+        "is_buy": is_buy,
+        "entry_price": np.where(is_buy, ask_c[entry_idx], bid_c[entry_idx]),
+        "stop_loss": stop_loss,
+        "exit_price": np.where(exit_code == EXIT_SL, stop_loss, np.where(is_buy, bid_c[exit_idx], ask_c[exit_idx])),
+    }
+
+
+def _symbol_events(rank, paths):
+    """
+    Entry and exit events of one symbol as (time, kind, rank, trade) tuples sorted like the portfolio queue
+    """
+    n = len(paths["entry_time"])
+    times = np.concatenate([paths["exit_time"], paths["entry_time"]]).astype('datetime64[ns]').view(np.int64)
+    kinds = np.repeat([EVENT_EXIT, EVENT_ENTRY], n)
+    kinds[:n][times[:n] == times[n:]] = EVENT_SAME_TIME_EXIT
+    trades = np.tile(np.arange(n), 2)
+    order = np.lexsort((trades, kinds, times))
+    return zip(times[order].tolist(), kinds[order].tolist(), itertools.repeat(rank), trades[order].tolist())
+
+
+def _per_symbol(value, pairs):
+    """
+    Scalar or {pair: value} argument as a list in pairs order
+    """
+    if isinstance(value, dict):
+        return [value[pair] for pair in pairs]
+    return [value] * len(pairs)
+
+
+def simulate_portfolio(paths, initial_capital, risk_per_trade, risk_mode, commission_per_lot=0.0, symbol_specs=None,
+                       max_positions=None, max_risk_pct=None):
+    """
+    Run the trades of many symbols as one account.
+    Entry and exit events of all symbols are merged in time order with a heap (heapq.merge of the per-symbol sorted streams),
+    so the loop runs over events (2 per trade), never over bars. Lots are sized on the shared balance at entry time
+    (PCT_BALANCE uses the balance realized so far), PnL comes from the offline profit engine.
+
+    Arguments:
+    - paths: {pair: trade_paths(...)}
+    - commission_per_lot: scalar or {pair: commission}
+    - symbol_specs: optional {pair: contract spec}, missing pairs use get_symbol_spec (MT5, cached)
+    - max_positions: optional cap on positions open at the same time over the whole portfolio
+    - max_risk_pct: optional cap on the summed stop loss risk of open positions, as a fraction of the balance
+    An entry that would break a limit (or sizes to 0 lot) is skipped and its exit ignored.
+
+    Return dict:
+    - "trades": combined trade log (backtest_donchian_trades_fast columns) in exit order, acc_balance is the shared balance
+    - "rejected": entries skipped by a limit with the reason
+    """
+    pairs = list(paths)
+    symbol_specs = symbol_specs or {}
+    specs = [symbol_specs[pair] if pair in symbol_specs else get_symbol_spec(pair) for pair in pairs]
+    commissions = _per_symbol(commission_per_lot, pairs)
+    fixed = risk_mode == 'FIXED_AMOUNT'
+
+    # per lot money of every trade, computed once per symbol on arrays
+    sl_mpl, exit_mpl, fixed_lots = [], [], []
+    for pair, spec in zip(pairs, specs):
+        p = paths[pair]
+        sides = np.where(p["is_buy"], 1, -1)
+        sl_mpl.append(money_per_lot(spec, sides, p["entry_price"], p["stop_loss"]))
+        exit_mpl.append(money_per_lot(spec, sides, p["entry_price"], p["exit_price"]))
+        fixed_lots.append(lots_from_risk(spec, sl_mpl[-1], risk_per_trade) if fixed else None)
+
+    lots = [np.zeros(len(paths[pair]["entry_time"])) for pair in pairs]
+    risks = [np.zeros(len(paths[pair]["entry_time"])) for pair in pairs]
+    balance = float(initial_capital)
+    open_count, open_risk = 0, 0.0
+    closed, rejected = [], []
+
+    events = heapq.merge(*(_symbol_events(rank, paths[pair]) for rank, pair in enumerate(pairs)))
+    for _, kind, rank, k in events:
+        if kind != EVENT_ENTRY:
+            lot = lots[rank][k]
+            if lot == 0:
+                continue
+            profit_bc = round_profit_scalar(specs[rank], exit_mpl[rank][k] * lot)
+            commission = commissions[rank] * lot
+            balance += profit_bc - commission
+            open_count -= 1
+            open_risk -= risks[rank][k]
+            closed.append((rank, k, lot, profit_bc, commission, balance))
+            continue
+
+        if fixed:
+            lot = float(fixed_lots[rank][k])
+        else:
+            lot = lot_from_risk_scalar(specs[rank], sl_mpl[rank][k], balance * risk_per_trade)
+        if lot == 0:
+            continue
+
+        trade_risk = abs(sl_mpl[rank][k]) * lot
+        if max_positions is not None and open_count >= max_positions:
+            rejected.append((rank, k, "max_positions"))
+            continue
+        if max_risk_pct is not None and open_risk + trade_risk > max_risk_pct * balance:
+            rejected.append((rank, k, "max_risk"))
+            continue
+
+        lots[rank][k] = lot
+        risks[rank][k] = trade_risk
+        open_count += 1
+        open_risk += trade_risk
+
+    return {
+        "trades": _trade_log(pairs, paths, closed),
+        "rejected": _rejected_log(pairs, paths, rejected),
+    }
+
+
+def _gather(pairs, paths, ranks, trades, key):
+    """
+    paths[pair][key][trade] of every (rank, trade) row
+    """
+    out = np.empty(len(ranks), dtype=paths[pairs[0]][key].dtype)
+    for rank, pair in enumerate(pairs):
+        rows = ranks == rank
+        out[rows] = paths[pair][key][trades[rows]]
+    return out
+
+
+def _trade_log(pairs, paths, closed):
+    if not closed:
+        return pd.DataFrame([])
+
+    ranks, trades, lots, profit_bc, commission, acc_balance = (np.array(col) for col in zip(*closed))
+    is_buy = _gather(pairs, paths, ranks, trades, "is_buy")
+    return pd.DataFrame({
+        "symbol": np.array(pairs, dtype=object)[ranks],
+        "entry_time": _gather(pairs, paths, ranks, trades, "entry_time"),
+        "exit_time": _gather(pairs, paths, ranks, trades, "exit_time"),
+        "exit_reason": EXIT_REASONS[_gather(pairs, paths, ranks, trades, "exit_code")],
+        "side": np.where(is_buy, "BUY", "SELL").astype(object),
+        "lot": lots.astype(float),
+        "entry_price": _gather(pairs, paths, ranks, trades, "entry_price"),
+        "exit_price": _gather(pairs, paths, ranks, trades, "exit_price"),
+        "profit_bc": profit_bc.astype(float),
+        "commission": commission.astype(float),
+        "profit_ac": profit_bc.astype(float) - commission.astype(float),
+        "acc_balance": acc_balance.astype(float),
+    })
+
+
+def _rejected_log(pairs, paths, rejected):
+    if not rejected:
+        return pd.DataFrame(columns=["symbol", "entry_time", "side", "reason"])
+
+    ranks, trades, reasons = (np.array(col) for col in zip(*rejected))
+    is_buy = _gather(pairs, paths, ranks, trades, "is_buy")
+    return pd.DataFrame({
+        "symbol": np.array(pairs, dtype=object)[ranks],
+        "entry_time": _gather(pairs, paths, ranks, trades, "entry_time"),
+        "side": np.where(is_buy, "BUY", "SELL").astype(object),
+        "reason": reasons.astype(object),
+    })
+
+
+def run_portfolio_backtest(pairs, timeframe, start_date, end_date, initial_capital, risk_per_trade, risk_mode,
+                           commission_per_lot, lookback, strategy_version="v2", max_positions=None, max_risk_pct=None,
+                           bar_store=None, symbol_specs=None):
+    """
+    Backtest the Donchian strategy on many symbols sharing one account (see simulate_portfolio).
+
+    Arguments:
+    - pairs: list of symbols, e.g. ["XAUUSD", "BTCUSD", "USTEC", "EURUSD", "USDJPY"]
+    - lookback, commission_per_lot: scalar or {pair: value}
+    - strategy_version: "v1" or "v2" signal logic
+    - max_positions, max_risk_pct: portfolio exposure limits (None = no limit)
+    - bar_store: BarStore, optional local bar cache used instead of fetching the full range from MT5
+    - symbol_specs: optional {pair: contract spec}, missing pairs are fetched once from MT5
+
+    Return dict with the combined trade log, rejected entries, per symbol summary, and the performance report,
+    balance series and drawdown stats of the account. The balance is sampled on the union of the bar times of all symbols
+    """
+    pairs = list(pairs)
+    symbol_specs = dict(symbol_specs or {})
+    lookbacks = _per_symbol(lookback, pairs)
+
+    paths, times = {}, []
+    for pair, lb in zip(pairs, lookbacks):
+        if pair not in symbol_specs:
+            symbol_specs[pair] = get_symbol_spec(pair)
+        if bar_store is not None:
+            raw = bar_store.get(pair, timeframe, start_date, end_date)
+        else:
+            raw = get_data_from_mt5(pair, timeframe, start_date, end_date)
+        bars = add_bid_ask_columns(pair, raw, digits=symbol_specs[pair]["digits"], compact=True)
+        paths[pair] = trade_paths(bars, lb, strategy_version)
+        times.append(bars['time'].to_numpy())
+
+    sim = simulate_portfolio(paths, initial_capital, risk_per_trade, risk_mode, commission_per_lot, symbol_specs,
+                             max_positions=max_positions, max_risk_pct=max_risk_pct)
+    trades = sim["trades"]
+
+    timeline = pd.DataFrame({"time": np.unique(np.concatenate(times))})
+    report_df, balance_series, balance_daily = performance_report_fast(
+        signals_df=timeline,
+        trade_df=trades,
+        initial_capital=initial_capital,
+        start_date=start_date,
+        end_date=end_date,
+        time_col='time',
+    )
+    dd_stats, dd_pct = drawdown_stats(balance_daily, return_dd_series=True)
+
+    if len(trades):
+        per_symbol = trades.groupby("symbol", sort=False).agg(trades=("profit_ac", "size"), profit=("profit_ac", "sum"),
+                                                              win_rate=("profit_ac", lambda p: (p > 0).mean()))
+    else:
+        per_symbol = pd.DataFrame(columns=["trades", "profit", "win_rate"])
+
+    return {
+        "pairs": pairs,
+        "trades": trades,
+        "rejected": sim["rejected"],
+        "per_symbol": per_symbol,
+        "timeline": timeline,
+        "report_df": report_df,
+        "balance_series": balance_series,
+        "balance_daily": balance_daily,
+        "dd_stats": dd_stats,
+        "dd_pct": dd_pct,
+    }
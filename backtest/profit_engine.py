@@ -0,0 +1,210 @@
+import json
+import math
+import numpy as np
+import pandas as pd
+
+
+# Cached contract specs, key = symbol name
+_SPEC_CACHE = {}
+
+
+def _import_mt5():
+    """
+    MetaTrader5 module, imported at first use: the offline engine itself never needs the terminal package
+    """
+    try:
+        import MetaTrader5 as mt5
+    except ImportError as exc:
+        raise ImportError("MetaTrader5 is needed to fetch contract specs from the terminal, "
+                          "pass a spec or load saved specs with load_symbol_specs() instead") from exc
+    return mt5
+
+
+def get_symbol_spec(pair, refresh=False):
+    """
+    Return contract spec of pair (dict) fetched from MT5 once and cached in memory.
+    Spec keys: symbol, digits, contract_size, tick_size, tick_value, tick_value_profit, tick_value_loss,
+    volume_min, volume_step, volume_max, currency_profit, account_currency, account_digits
+    """
+    if not refresh and pair in _SPEC_CACHE:
+        return _SPEC_CACHE[pair]
+
+    mt5 = _import_mt5()
+    info = mt5.symbol_info(pair)
+    if info is None:
+        raise ValueError(f"Could not retrieve symbol info for pair: {pair}")
+    account = mt5.account_info()
+
+    spec = {
+        "symbol": pair,
+        "digits": int(info.digits),
+        "contract_size": float(info.trade_contract_size),
+        "tick_size": float(info.trade_tick_size),
+        "tick_value": float(info.trade_tick_value),
+        "tick_value_profit": float(info.trade_tick_value_profit),
+        "tick_value_loss": float(info.trade_tick_value_loss),
+        "volume_min": float(info.volume_min),
+        "volume_step": float(info.volume_step),
+        "volume_max": float(info.volume_max),
+        "currency_profit": info.currency_profit,
+        "account_currency": account.currency if account is not None else None,
+        "account_digits": int(getattr(account, "currency_digits", 2)) if account is not None else 2,
+    }
+    _SPEC_CACHE[pair] = spec
+    return spec
+
+
+def save_symbol_specs(pairs, file_path):
+    """
+    Fetch specs of given pairs from MT5 and save them in a JSON file so backtests can run without a terminal
+    """
+    specs = {pair: get_symbol_spec(pair) for pair in pairs}
+    with open(file_path, "w") as f:
+        json.dump(specs, f, indent=2)
+    return specs
+
+
+def load_symbol_specs(file_path):
+    """
+    Load specs saved by save_symbol_specs() and register them in the in-memory cache
+    """
+    with open(file_path) as f:
+        specs = json.load(f)
+    _SPEC_CACHE.update(specs)
+    return specs
+
+
+def _direction(sides):
+    """
+    Map sides ("BUY"/"SELL" or 1/-1) to +1/-1 floats
+    """
+    sides = np.asarray(sides)
+    if sides.dtype.kind in "OUS":
+        return np.where(sides == "BUY", 1.0, -1.0)
+    return np.where(sides > 0, 1.0, -1.0)
+
+
+def money_per_lot(spec, sides, entry_prices, exit_prices):
+    """
+    Unrounded profit (account currency) of 1 lot moved from entry to exit price.
+    Profit currency == account currency: price move * contract size (MT5 CFD/Forex formula).
+    Otherwise price move is converted with tick value (profit or loss tick value depending on the sign), like MT5 does with the current rate.
+    """
+    move = (np.asarray(exit_prices, dtype=float) - np.asarray(entry_prices, dtype=float)) * _direction(sides)
+
+    if spec.get("account_currency") in (None, spec["currency_profit"]):
+        return move * spec["contract_size"]
+
+    value_profit = spec["tick_value_profit"] / spec["tick_size"]
+    value_loss = spec["tick_value_loss"] / spec["tick_size"]
+    return move * np.where(move >= 0, value_profit, value_loss)
+
+
+def round_profit(spec, profit):
+    """
+    Round profit to account currency digits as order_calc_profit does
+    """
+    return np.round(profit, spec.get("account_digits", 2))
+
+
+def calc_profit(spec, sides, lots, entry_prices, exit_prices):
+    """
+    Offline equivalent of mt5.order_calc_profit for arrays of trades
+    """
+    return round_profit(spec, money_per_lot(spec, sides, entry_prices, exit_prices) * np.asarray(lots, dtype=float))
+
+
+def lots_from_risk(spec, sl_money_per_lot, risk_money):
+    """
+    Lot sizes for arrays of trades with the same rules as calculate_lot_size:
+    clip to volume min/max, floor to volume step and return 0 when min volume already risks more than risk_money.
+
+    sl_money_per_lot: output of money_per_lot() from entry to stop loss
+    risk_money: money at risk per trade (scalar or array)
+    """
+    vol_step = spec["volume_step"]
+    min_vol = spec["volume_min"]
+    max_vol = spec["volume_max"]
+
+    sl_money_per_lot = np.asarray(sl_money_per_lot, dtype=float)
+    risk_money = np.asarray(risk_money, dtype=float)
+
+    loss_per_1lot = np.abs(round_profit(spec, sl_money_per_lot))
+    valid = loss_per_1lot > 0
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_lot = np.where(valid, risk_money / np.where(valid, loss_per_1lot, 1.0), 0.0)
+    raw_lot = np.maximum(min_vol, np.minimum(max_vol, raw_lot))
+
+    steps_floor = np.floor((raw_lot - min_vol) / vol_step)
+    lot = np.round(min_vol + steps_floor * vol_step, 2)
+
+    potential_loss = np.abs(round_profit(spec, sl_money_per_lot * lot))
+    return np.where(valid & (potential_loss <= risk_money), lot, 0.0)
+
+
+def _round_scalar(value, digits):
+    """
+    np.round of one float without the array overhead: same multiply, round half to even and divide steps
+    """
+    scale = 10.0 ** digits
+    return round(value * scale) / scale
+
+
+def round_profit_scalar(spec, profit):
+    """
+    round_profit of one float, for loops over events (same result as the array version)
+    """
+    return _round_scalar(float(profit), spec.get("account_digits", 2))
+
+
+def lot_from_risk_scalar(spec, sl_money_per_lot, risk_money):
+    """
+    lots_from_risk of one trade with plain floats, for loops where the risk money changes between trades (same result)
+    """
+    digits = spec.get("account_digits", 2)
+    sl_money_per_lot = float(sl_money_per_lot)
+    loss_per_1lot = abs(_round_scalar(sl_money_per_lot, digits))
+    if not loss_per_1lot > 0:
+        return 0.0
+
+    min_vol = spec["volume_min"]
+    raw_lot = max(min_vol, min(spec["volume_max"], risk_money / loss_per_1lot))
+    lot = _round_scalar(min_vol + math.floor((raw_lot - min_vol) / spec["volume_step"]) * spec["volume_step"], 2)
+
+    potential_loss = abs(_round_scalar(sl_money_per_lot * lot, digits))
+    return lot if potential_loss <= risk_money else 0.0
+
+
+def calculate_lot_size_offline(spec, entry_price, stop_loss, capital, risk_pct, risk_mode, order_type):
+    """
+    Same as calculate_lot_size but computed from a cached contract spec instead of MT5 calls
+    """
+    risk_money = risk_pct if risk_mode == 'FIXED_AMOUNT' else capital * risk_pct
+    sl_mpl = money_per_lot(spec, order_type, entry_price, stop_loss)
+    return float(lots_from_risk(spec, sl_mpl, risk_money))
+
+
+def validate_against_mt5(pair, trade_df, spec=None):
+    """
+    Recompute profit_bc of a trade log with MT5 (terminal needed) and with the offline engine.
+    Return a DataFrame with both values and their absolute difference per trade
+    """
+    mt5 = _import_mt5()
+    if spec is None:
+        spec = get_symbol_spec(pair)
+
+    mt5_profit = []
+    for side, lot, entry_price, exit_price in trade_df[['side', 'lot', 'entry_price', 'exit_price']].itertuples(index=False):
+        order_type_mt5 = mt5.ORDER_TYPE_BUY if side == "BUY" else mt5.ORDER_TYPE_SELL
+        mt5_profit.append(mt5.order_calc_profit(order_type_mt5, pair, lot, entry_price, exit_price))
+
+    offline_profit = calc_profit(spec, trade_df['side'].to_numpy(), trade_df['lot'].to_numpy(),
+                                 trade_df['entry_price'].to_numpy(), trade_df['exit_price'].to_numpy())
+
+    out = pd.DataFrame({
+        "mt5_profit": np.asarray(mt5_profit, dtype=float),
+        "offline_profit": offline_profit,
+    }, index=trade_df.index)
+    out["abs_diff"] = (out["mt5_profit"] - out["offline_profit"]).abs()
+    return out
@@ -0,0 +1,232 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+import inspect
+import importlib
+import numpy as np
+import pandas as pd
+
+
+# Modules whose source defines what a backtest returns. Their fingerprint is part of every key,
+# so editing the strategy, engine or metrics code never serves results computed by the old code
+CODE_MODULES = (
+    "strategies.donchian_strat",
+    "backtest.backtest",
+    "backtest.profit_engine",
+    "backtest.runner_v1",
+    "backtest.runner_v2",
+    "metrics.metrics",
+    "optimization.sweep",
+    "data.data_process",
+    "data.resample",
+    "strategies.channel_index",
+)
+
+# A cache writer rescans the directory (other processes may write too) after this many puts even below max_bytes
+RESYNC_WRITES = 64
+# Going over max_bytes evicts down to this fraction of it, so a full cache is not rescanned on every write
+EVICT_TO = 0.9
+
+
+def source_fingerprint(modules=CODE_MODULES):
+    """
+    Fingerprint (hex) of the source code of modules
+    """
+    h = hashlib.blake2b(digest_size=16)
+    for name in modules:
+        h.update(name.encode())
+        h.update(inspect.getsource(importlib.import_module(name)).encode())
+    return h.hexdigest()
+
+
+def function_fingerprint(func):
+    """
+    Name and source hash of a function, so a custom backtest_func edited outside CODE_MODULES gets new keys.
+    Functions without retrievable source (builtins, interactive sessions) fall back to their name
+    """
+    name = f"{func.__module__}.{func.__qualname__}"
+    try:
+        source = inspect.getsource(func)
+    except (OSError, TypeError):
+        return name
+    return f"{name}:{hashlib.blake2b(source.encode(), digest_size=16).hexdigest()}"
+
+
+def hash_frame(df):
+    """
+    Fingerprint (hex) of the content of a DataFrame: column names, dtypes and values
+    """
+    h = hashlib.blake2b(digest_size=16)
+    h.update(str(len(df)).encode())
+    for col in df.columns:
+        values = np.ascontiguousarray(df[col].to_numpy())
+        h.update(f"{col}:{values.dtype.str}".encode())
+        h.update(values.view(np.uint8) if values.dtype.kind != "O" else repr(values.tolist()).encode())
+    return h.hexdigest()
+
+
+# Runner outputs stored by the cache. signal and balance_series (one row per bar) are not stored and are None on a hit
+RUNNER_CACHED_KEYS = ("trades", "report_df", "balance_daily", "dd_stats", "dd_pct")
+
+
+def runner_key(cache, raw, params, sub_raw=None):
+    """
+    Key of a run_backtest_for_symbol call from its raw bars (and sub-bars) and its parameters
+    """
+    data_hash = hash_frame(raw) if sub_raw is None else [hash_frame(raw), hash_frame(sub_raw)]
+    return cache.key("run_backtest_for_symbol", data_hash, params)
+
+
+def _entry_size(path):
+    return sum(entry.stat().st_size for entry in os.scandir(path) if entry.is_file())
+
+
+class ResultCache:
+    """
+    Persistent memoization of backtest results, content addressed: the key of an entry hashes the input bars,
+    every parameter and the code version (source_fingerprint), so an identical run is read back instead of recomputed
+    and anything that changes the result gives a new key.
+
+        cache = ResultCache("result_cache", max_bytes=2 * 2**30)
+        res = run_backtest_for_symbol(..., result_cache=cache)            # second call is read from disk
+        grind_search_parameters(..., result_cache=cache)                   # a killed grid resumes at the first missing cell
+
+    One directory per entry (meta.json + result.pkl), written to a temp directory then renamed, so a killed run never
+    leaves a partial entry and pool workers can share the cache.
+    max_bytes: optional size cap. Writers keep a running total of the cache size (rescanned every RESYNC_WRITES puts)
+    and evict the least recently used entries down to EVICT_TO * max_bytes once it goes over the cap.
+    code_version: override of the code fingerprint (e.g. a release tag)
+    """
+
+    def __init__(self, root, max_bytes=None, code_version=None):
+        self.root = root
+        self.max_bytes = max_bytes
+        self._code_version = code_version
+        self._size = None       # running size total of the cache directory, None until the first capped put
+        self._puts = 0
+        os.makedirs(root, exist_ok=True)
+
+    @property
+    def code_version(self):
+        if self._code_version is None:
+            self._code_version = source_fingerprint()
+        return self._code_version
+
+    def __getstate__(self):
+        # pool workers get the fingerprint computed once by the parent
+        return dict(self.__dict__, _code_version=self.code_version, _size=None, _puts=0)
+
+    def key(self, kind, data_hash, params):
+        """
+        Entry key of a `kind` of result ("run_backtest_for_symbol", "sweep_lookback", ...) computed from data_hash and params
+        """
+        payload = json.dumps({"kind": kind, "data": data_hash, "params": params, "code": self.code_version},
+                             sort_keys=True, default=str)
+        return hashlib.blake2b(payload.encode(), digest_size=20).hexdigest()
+
+    def _path(self, key):
+        return os.path.join(self.root, key[:2], key)
+
+    def get(self, key):
+        """
+        Stored value of key or None. A hit refreshes the entry for LRU eviction
+        """
+        path = self._path(key)
+        try:
+            value = pd.read_pickle(os.path.join(path, "result.pkl"))
+            os.utime(os.path.join(path, "meta.json"))
+        except (FileNotFoundError, NotADirectoryError):
+            return None
+        return value
+
+    def put(self, key, value, kind=None):
+        """
+        Store value (any picklable object, e.g. a dict of DataFrames) under key, then evict least recently used
+        entries when the running size total goes over max_bytes
+        """
+        path = self._path(key)
+        if os.path.exists(path):
+            return
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        os.makedirs(tmp_path, exist_ok=True)
+        pd.to_pickle(value, os.path.join(tmp_path, "result.pkl"))
+        with open(os.path.join(tmp_path, "meta.json"), "w") as f:
+            json.dump({"kind": kind, "code_version": self.code_version, "created": time.time()}, f)
+        try:
+            os.rename(tmp_path, path)
+        except OSError:
+            # another process stored the same key first
+            shutil.rmtree(tmp_path, ignore_errors=True)
+
+        if self.max_bytes is None:
+            return
+        self._puts += 1
+        if self._size is None or self._puts % RESYNC_WRITES == 0:
+            self._size = self.size_bytes()
+        else:
+            self._size += _entry_size(path)
+        if self._size > self.max_bytes:
+            self.evict(EVICT_TO * self.max_bytes)
+
+    def entries(self):
+        """
+        DataFrame of stored entries: key, kind, code_version, bytes, last_used (epoch seconds)
+        """
+        rows = []
+        for shard in os.scandir(self.root):
+            if not shard.is_dir():
+                continue
+            for entry in os.scandir(shard.path):
+                if entry.name.endswith(".tmp") or not entry.is_dir():
+                    continue
+                try:
+                    meta_path = os.path.join(entry.path, "meta.json")
+                    with open(meta_path) as f:
+                        meta = json.load(f)
+                    rows.append({"key": entry.name, "kind": meta["kind"], "code_version": meta["code_version"],
+                                 "bytes": _entry_size(entry.path), "last_used": os.stat(meta_path).st_mtime})
+                except FileNotFoundError:
+                    continue
+        return pd.DataFrame(rows, columns=["key", "kind", "code_version", "bytes", "last_used"])
+
+    def size_bytes(self):
+        return int(self.entries()["bytes"].sum())
+
+    def _remove(self, keys):
+        for key in keys:
+            shutil.rmtree(self._path(key), ignore_errors=True)
+        self._size = None
+        return len(keys)
+
+    def evict(self, max_bytes):
+        """
+        Remove least recently used entries until the cache holds at most max_bytes. Return the number of removed entries
+        """
+        entries = self.entries().sort_values("last_used", ascending=False)
+        over = entries["bytes"].cumsum() > max_bytes
+        removed = self._remove(list(entries.loc[over, "key"]))
+        self._size = int(entries.loc[~over, "bytes"].sum())
+        return removed
+
+    def invalidate(self, code_version=None, kind=None):
+        """
+        Remove entries computed by another code version than the current one (after editing the strategy code),
+        or, when code_version is given, the entries of that version. kind limits it to one kind of result.
+        Return the number of removed entries
+        """
+        entries = self.entries()
+        if code_version is None:
+            stale = entries["code_version"] != self.code_version
+        else:
+            stale = entries["code_version"] == code_version
+        if kind is not None:
+            stale &= entries["kind"] == kind
+        return self._remove(list(entries.loc[stale, "key"]))
+
+    def clear(self):
+        """
+        Remove every entry
+        """
+        return self._remove(list(self.entries()["key"]))
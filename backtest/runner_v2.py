@@ -1,12 +1,16 @@
-from metrics.metrics import performance_report, drawdown_stats
+from metrics.metrics import performance_report_fast, drawdown_stats
 from data.data_process import get_data_from_mt5, add_bid_ask_columns
+from backtest.profit_engine import get_symbol_spec
+from backtest.instrumentation import make_timer
+from data.timeframes import timeframe_name
 from strategies.donchian_strat import donchian_breakout_channel_v2
 
 def run_backtest_for_symbol(
     pair, timeframe, start_date, end_date,
     initial_capital, risk_per_trade, risk_mode, commission_per_lot,
     lookback, close_col_name='bid_c', spread_col='real_spread',
-    backtest_func=None
+    backtest_func=None, bar_store=None, symbol_spec=None, equity="realized", instrument=None,
+    compact=False, sub_timeframe=None, result_cache=None
 ):
     """
     Run backtest of Donchian breakout VERSION 2 for given symbol and return results including signals, trades, performance report, balance series, drawdown stats.
@@ -24,31 +28,96 @@ def run_backtest_for_symbol(
     - close_col_name: str, name of the close price column in DataFrame
     - spread_col: str, name of the spread column in DataFrame
     - backtest_func: function, optional custom backtest function to use
+    - bar_store: BarStore, optional local bar cache used instead of fetching the full range from MT5
+    - symbol_spec: dict, optional cached contract spec (backtest.profit_engine) for terminal-free digits, lot sizes and PnL.
+                   backtest_func must accept a spec keyword when it is given
+    - equity: "realized" (balance moves on trade exits) or "mark_to_market" (open trades valued on every bar)
+    - instrument: per-stage timing (backtest.instrumentation.make_timer): None/False disabled, True, "log", a JSON lines path,
+                  a callback or a StageTimer. Records are returned in result["timings"] (empty list when disabled)
+    - compact: compact bar layout (data.data_process.COMPACT_COLUMNS, int8 signals), same trades and report with less memory
+    - sub_timeframe: lower timeframe (e.g. mt5.TIMEFRAME_M1) used to resolve stop losses intrabar
+                     (backtest.backtest.resolve_intrabar_exits), only the ambiguous bars are checked against it.
+                     backtest_func must accept a sub_bars keyword when it is given
+    - result_cache: backtest.result_cache.ResultCache, optional. The key hashes the loaded bars and every argument,
+                    a hit skips the signal, backtest and report stages and returns the stored trades, report and
+                    drawdown with signal and balance_series set to None (result["cached"] tells which)
     """
     
     if backtest_func is None:
-        from backtest.backtest import backtest_donchian_trades as backtest_func
+        from backtest.backtest import backtest_donchian_trades_fast as backtest_func
 
-    raw = get_data_from_mt5(pair, timeframe, start_date, end_date)
-    data = add_bid_ask_columns(pair, raw)
+    timer = make_timer(instrument)
 
-    signal = donchian_breakout_channel_v2(data, lookback=lookback,
-                                          close_col_name=close_col_name, spread_col=spread_col)
+    with timer.stage("load_bars") as st:
+        if bar_store is not None:
+            raw = bar_store.get(pair, timeframe, start_date, end_date)
+        else:
+            raw = get_data_from_mt5(pair, timeframe, start_date, end_date)
+        sub_raw = None
+        if sub_timeframe is not None:
+            if bar_store is not None:
+                sub_raw = bar_store.get(pair, sub_timeframe, start_date, end_date)
+            else:
+                sub_raw = get_data_from_mt5(pair, sub_timeframe, start_date, end_date)
+        st["rows"] = len(raw)
 
-    trades = backtest_func(pair, signal, initial_capital, risk_per_trade, risk_mode, commission_per_lot)
+    if result_cache is not None:
+        from backtest.result_cache import runner_key, function_fingerprint, RUNNER_CACHED_KEYS
+        cache_key = runner_key(result_cache, raw, {
+            "strategy": "v2", "backtest_func": function_fingerprint(backtest_func),
+            "pair": pair, "timeframe": timeframe_name(timeframe), "start_date": start_date, "end_date": end_date,
+            "initial_capital": initial_capital, "risk_per_trade": risk_per_trade, "risk_mode": risk_mode,
+            "commission_per_lot": commission_per_lot, "lookback": lookback, "close_col_name": close_col_name,
+            "spread_col": spread_col, "symbol_spec": symbol_spec, "equity": equity,
+            "sub_timeframe": timeframe_name(sub_timeframe) if sub_timeframe is not None else None,
+        }, sub_raw=sub_raw)
+        cached = result_cache.get(cache_key)
+        if cached is not None:
+            return dict(cached, pair=pair, signal=None, balance_series=None, cached=True,
+                        timings=timer.flush(pair=pair, lookback=lookback))
 
-    report_df, balance_series, balance_daily = performance_report(
-        signals_df=signal,
-        trade_df=trades,
-        initial_capital=initial_capital,
-        start_date=start_date,
-        end_date=end_date,
-        time_col='time',
-    )
+    with timer.stage("bid_ask") as st:
+        digits = symbol_spec["digits"] if symbol_spec is not None else None
+        data = add_bid_ask_columns(pair, raw, digits=digits, compact=compact)
+        st["rows"] = len(data)
 
-    dd_stats, dd_pct = drawdown_stats(balance_daily, return_dd_series=True)
+    with timer.stage("signal") as st:
+        signal = donchian_breakout_channel_v2(data, lookback=lookback,
+                                              close_col_name=close_col_name, spread_col=spread_col, compact=compact)
+        st["rows"] = len(signal)
 
-    return {
+    extra_kwargs = {}
+    if sub_timeframe is not None:
+        from backtest.backtest import build_sub_bars
+        with timer.stage("sub_bars") as st:
+            sub_data = add_bid_ask_columns(pair, sub_raw, digits=digits, compact=True)
+            extra_kwargs["sub_bars"] = build_sub_bars(signal['time'].to_numpy(), sub_data, timeframe)
+            st["rows"] = len(sub_data)
+
+    with timer.stage("backtest") as st:
+        if symbol_spec is not None:
+            extra_kwargs["spec"] = symbol_spec
+        trades = backtest_func(pair, signal, initial_capital, risk_per_trade, risk_mode, commission_per_lot, **extra_kwargs)
+        st["rows"] = len(trades)
+
+    with timer.stage("report") as st:
+        report_df, balance_series, balance_daily = performance_report_fast(
+            signals_df=signal,
+            trade_df=trades,
+            initial_capital=initial_capital,
+            start_date=start_date,
+            end_date=end_date,
+            time_col='time',
+            equity=equity,
+            spec=symbol_spec if symbol_spec is not None or equity == "realized" else get_symbol_spec(pair),
+        )
+        st["rows"] = len(balance_series)
+
+    with timer.stage("drawdown") as st:
+        dd_stats, dd_pct = drawdown_stats(balance_daily, return_dd_series=True)
+        st["rows"] = len(balance_daily)
+
+    result = {
         "pair": pair,
         "signal": signal,
         "trades": trades,
@@ -57,4 +126,9 @@ def run_backtest_for_symbol(
         "balance_daily": balance_daily,
         "dd_stats": dd_stats,
         "dd_pct": dd_pct,
-    }
\ No newline at end of file
+        "timings": timer.flush(pair=pair, lookback=lookback),
+    }
+    if result_cache is not None:
+        result_cache.put(cache_key, {key: result[key] for key in RUNNER_CACHED_KEYS}, kind="run_backtest_for_symbol")
+        result["cached"] = False
+    return result
\ No newline at end of file
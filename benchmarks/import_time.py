@@ -0,0 +1,105 @@
+import os
+import sys
+import json
+import argparse
+import subprocess
+
+
+# Import time budget (seconds) of every analysis module once numpy + pandas are loaded, best of --repeat fresh interpreters
+IMPORT_BUDGETS = {
+    "config.config": 0.02,
+    "strategies.donchian_strat": 0.03,
+    "data.data_process": 0.03,
+    "data.bar_store": 0.05,
+    "data.bar_io": 0.05,
+    "backtest.backtest": 0.05,
+    "backtest.profit_engine": 0.03,
+    "backtest.runner_v1": 0.06,
+    "backtest.runner_v2": 0.06,
+    "backtest.portfolio": 0.06,
+    "backtest.result_cache": 0.05,
+    "metrics.metrics": 0.05,
+    "metrics.monte_carlo": 0.05,
+    "optimization.sweep": 0.06,
+    "optimization.parallel": 0.08,
+    "optimization.grind_search": 0.08,
+    "optimization.search": 0.10,
+    "optimization.walk_forward": 0.10,
+}
+
+# Packages the analysis modules must only load at first use (terminal, credentials, charts)
+LAZY_PACKAGES = ("MetaTrader5", "dotenv", "plotly")
+
+BASELINE = "numpy, pandas"
+
+# numpy and pandas are imported first (every module needs them), the timed part is the module's own cost
+_PROBE = """
+import sys, time, json
+start = time.perf_counter()
+import {baseline}
+base = time.perf_counter()
+import {module}
+end = time.perf_counter()
+print(json.dumps({{"baseline": base - start, "seconds": end - base,
+                  "loaded": [name for name in {lazy!r} if name in sys.modules]}}))
+"""
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+
+def probe(module, repeat=5):
+    """
+    Best import time (seconds) of module after numpy + pandas, best numpy + pandas time,
+    over `repeat` fresh interpreters, and the LAZY_PACKAGES the module loaded
+    """
+    best, baseline, loaded = float("inf"), float("inf"), []
+    for _ in range(repeat):
+        code = _PROBE.format(baseline=BASELINE, module=module, lazy=LAZY_PACKAGES)
+        out = subprocess.run([sys.executable, "-c", code], cwd=ROOT, capture_output=True, text=True)
+        if out.returncode != 0:
+            raise RuntimeError(f"import {module} failed:\n{out.stderr}")
+        res = json.loads(out.stdout.strip().splitlines()[-1])
+        best, baseline, loaded = min(best, res["seconds"]), min(baseline, res["baseline"]), res["loaded"]
+    return best, baseline, loaded
+
+
+def check_imports(modules=None, repeat=5, scale=1.0):
+    """
+    Import every module in fresh interpreters. A module fails when its import time once numpy + pandas are loaded
+    exceeds scale * IMPORT_BUDGETS[module] or when it loads one of LAZY_PACKAGES. Return list of result dicts
+    """
+    modules = list(IMPORT_BUDGETS) if modules is None else modules
+    results = []
+    for module in modules:
+        seconds, baseline, loaded = probe(module, repeat)
+        budget = scale * IMPORT_BUDGETS.get(module, max(IMPORT_BUDGETS.values()))
+        results.append({"module": module, "seconds": seconds, "numpy_pandas_seconds": baseline, "budget": budget,
+                        "loaded": loaded, "ok": seconds <= budget and not loaded})
+        status = "ok" if results[-1]["ok"] else f"LOADS {', '.join(loaded)}" if loaded else "OVER BUDGET"
+        print(f"{module:<28} {seconds:8.3f}s / {budget:.3f}s  (numpy + pandas {baseline:.3f}s)  {status}")
+    return results
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Check import time and lazy imports of the analysis modules")
+    parser.add_argument("--modules", nargs="+", help="modules to check (default: every module of IMPORT_BUDGETS)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--scale", type=float, default=1.0, help="multiplier of every budget (slow machines)")
+    parser.add_argument("--out", help="optional JSON file of the results")
+    args = parser.parse_args(argv)
+
+    results = check_imports(args.modules, args.repeat, args.scale)
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(results, f, indent=2)
+
+    failed = [r["module"] for r in results if not r["ok"]]
+    if failed:
+        print(f"Import budget failed: {', '.join(failed)}")
+        return 1
+    print("All imports within budget")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,165 @@
+import os
+import sys
+import json
+import time
+import argparse
+import platform
+import tempfile
+import tracemalloc
+from datetime import datetime
+import numpy as np
+import pandas as pd
+from benchmarks.synthetic import SIZES, synthetic_rates, synthetic_spec, SyntheticSource
+from data.bar_store import BarStore, rates_to_frame
+from data.data_process import add_bid_ask_columns
+from strategies.donchian_strat import donchian_breakout_channel_v1, donchian_breakout_channel_v2
+from backtest.backtest import backtest_donchian_trades_fast
+from metrics.metrics import performance_report, performance_report_fast
+from optimization.grind_search import grind_search_parameters
+
+
+STAGES = ("signals_v1", "signals_v2", "backtest", "performance_report", "performance_report_fast",
+          "grind_search", "grind_search_fast")
+
+PAIR = "SYNTH"
+CAPITAL, RISK, RISK_MODE, COMMISSION = 5000.0, 150.0, "FIXED_AMOUNT", 2.0
+
+
+def measure(fn, setup=None, repeat=3):
+    """
+    Best wall time of `repeat` runs of fn(*setup()) and peak traced memory (bytes) of one extra run.
+    setup runs outside the timed section (e.g. copy of an input modified in place)
+    """
+    times = []
+    for _ in range(repeat):
+        args = setup() if setup is not None else ()
+        start = time.perf_counter()
+        fn(*args)
+        times.append(time.perf_counter() - start)
+
+    # tracemalloc slows allocations down, so memory is measured on its own run
+    args = setup() if setup is not None else ()
+    tracemalloc.start()
+    try:
+        fn(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return min(times), peak
+
+
+def run_case(case, timeframe, n_bars, stages, lookback=100, grid_lookbacks=(20, 50, 100, 200), repeat=3, seed=0):
+    """
+    Time every stage on n_bars synthetic bars, return one result dict per stage
+    """
+    spec = synthetic_spec(PAIR)
+    rates = synthetic_rates(n_bars, timeframe, seed=seed, digits=spec["digits"])
+    bars = add_bid_ask_columns(PAIR, rates_to_frame(rates), digits=spec["digits"])
+    signals = donchian_breakout_channel_v2(bars, lookback)
+    trades = backtest_donchian_trades_fast(PAIR, signals, CAPITAL, RISK, RISK_MODE, COMMISSION, spec=spec)
+
+    start, end = rates_to_frame(rates[[0, -1]])["time"]
+    results = []
+    with tempfile.TemporaryDirectory(prefix="bench_store_", ignore_cleanup_errors=True) as store_dir:
+        store = BarStore(store_dir, fetch_fn=SyntheticSource(rates))
+        store.update(PAIR, timeframe, start, end)
+        grid_kwargs = dict(pairs=PAIR, timeframe=timeframe, start_date=start, end_date=end, lookbacks=list(grid_lookbacks),
+                           initial_capital=CAPITAL, risk_per_trade=RISK, risk_mode=RISK_MODE, commission_per_lot=COMMISSION,
+                           plot_charts=False, bar_store=store, symbol_specs={PAIR: spec})
+
+        jobs = {
+            "signals_v1": (lambda df: donchian_breakout_channel_v1(df, lookback), lambda: (bars.copy(deep=False),), 1),
+            "signals_v2": (lambda: donchian_breakout_channel_v2(bars, lookback), None, 1),
+            "backtest": (lambda: backtest_donchian_trades_fast(PAIR, signals, CAPITAL, RISK, RISK_MODE, COMMISSION, spec=spec), None, 1),
+            "performance_report": (lambda: performance_report(signals, trades, CAPITAL), None, 1),
+            "performance_report_fast": (lambda: performance_report_fast(signals, trades, CAPITAL), None, 1),
+            "grind_search": (lambda: grind_search_parameters(**grid_kwargs), None, len(grid_lookbacks)),
+            "grind_search_fast": (lambda: grind_search_parameters(**grid_kwargs, fast_sweep=True), None, len(grid_lookbacks)),
+        }
+
+        for stage in stages:
+            fn, setup, passes = jobs[stage]
+            seconds, peak = measure(fn, setup, repeat)
+            results.append({
+                "case": case, "timeframe": timeframe, "bars": n_bars, "stage": stage,
+                "seconds": seconds,
+                "bars_per_sec": n_bars * passes / seconds if seconds > 0 else float("inf"),
+                "peak_mb": peak / 2 ** 20,
+                "trades": len(trades),
+            })
+            print(f"{case:>8} {stage:<24} {seconds:9.4f}s {results[-1]['bars_per_sec']:14,.0f} bars/s {results[-1]['peak_mb']:9.1f} MB")
+
+        store.clear(PAIR, timeframe)
+    return results
+
+
+def compare(results, baseline, time_threshold=0.25, memory_threshold=0.25):
+    """
+    Compare results with a baseline run (same JSON layout). A stage regresses when its time or peak memory
+    grows by more than the threshold (fraction). Return list of regression dicts, stages missing from baseline are skipped
+    """
+    base = {(r["case"], r["stage"]): r for r in baseline["results"]}
+    regressions = []
+    for r in results["results"]:
+        ref = base.get((r["case"], r["stage"]))
+        if ref is None:
+            continue
+        for key, threshold in (("seconds", time_threshold), ("peak_mb", memory_threshold)):
+            ratio = r[key] / ref[key] if ref[key] > 0 else 1.0
+            if ratio > 1 + threshold:
+                regressions.append({"case": r["case"], "stage": r["stage"], "metric": key,
+                                    "baseline": ref[key], "current": r[key], "ratio": ratio})
+    return regressions
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmark the Donchian pipeline on synthetic bars")
+    parser.add_argument("--sizes", nargs="+", default=["H1", "M5"], choices=sorted(SIZES),
+                        help="named bar counts to run (see benchmarks.synthetic.SIZES)")
+    parser.add_argument("--bars", type=int, help="custom bar count, replaces --sizes")
+    parser.add_argument("--timeframe", default="H1", help="timeframe of --bars")
+    parser.add_argument("--stages", nargs="+", default=list(STAGES), choices=STAGES)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--out", default="benchmark_results.json")
+    parser.add_argument("--baseline", help="baseline JSON to compare against")
+    parser.add_argument("--time-threshold", type=float, default=0.25)
+    parser.add_argument("--memory-threshold", type=float, default=0.25)
+    args = parser.parse_args(argv)
+
+    cases = [("custom", args.timeframe, args.bars)] if args.bars else [(name,) + SIZES[name] for name in args.sizes]
+
+    rows = []
+    for case, timeframe, n_bars in cases:
+        rows.extend(run_case(case, timeframe, n_bars, args.stages, repeat=args.repeat))
+
+    results = {
+        "meta": {
+            "created": datetime.now().isoformat(timespec="seconds"),
+            "python": platform.python_version(),
+            "numpy": np.__version__,
+            "pandas": pd.__version__,
+            "machine": platform.platform(),
+            "cpu_count": os.cpu_count(),
+            "repeat": args.repeat,
+        },
+        "results": rows,
+    }
+    with open(args.out, "w") as f:
+        json.dump(results, f, indent=2)
+    print(f"Results saved in {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(results, baseline, args.time_threshold, args.memory_threshold)
+        for reg in regressions:
+            print(f"REGRESSION {reg['case']} {reg['stage']} {reg['metric']}: "
+                  f"{reg['baseline']:.4f} -> {reg['current']:.4f} (x{reg['ratio']:.2f})")
+        if regressions:
+            return 1
+        print("No regression against baseline")
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,102 @@
+import math
+import numpy as np
+from data.bar_store import RATES_DTYPE, _to_epoch, rates_to_frame
+from data.timeframes import timeframe_seconds
+from data.data_process import add_bid_ask_columns
+
+
+# Bars generated per random draw block. Part of the generator definition: changing it changes the series
+_BLOCK = 1_000_000
+
+# Named sizes used by the benchmark suite, about 5 years of 24/7 bars per timeframe and a long M1 history
+SIZES = {
+    "H1": ("H1", 43_800),
+    "M5": ("M5", 525_600),
+    "M1": ("M1", 2_628_000),
+    "M1_20y": ("M1", 10_512_000),
+}
+
+
+def synthetic_rate_blocks(n_bars, timeframe="H1", seed=0, start="2015-01-01", price=30000.0, digits=2,
+                          spread_points=(500, 3000), hourly_vol=0.006):
+    """
+    Deterministic random-walk bars in the mt5.copy_rates_range layout, yielded as structured RATES_DTYPE arrays
+    of at most _BLOCK bars (60 MB), so a consumer writing them out (e.g. to a BarStore or bar_io file) never holds
+    the whole series. Same arguments always give the same bars
+    - hourly_vol: log-return std of one hour, scaled by sqrt(bar duration) for other timeframes
+    - spread_points: [min, max) spread in points (10**-digits)
+    """
+    step = timeframe_seconds(timeframe)
+    vol = hourly_vol * math.sqrt(step / 3600)
+    rng = np.random.default_rng(seed)
+    t0 = _to_epoch(start)
+
+    last = float(price)
+    for lo in range(0, n_bars, _BLOCK):
+        hi = min(n_bars, lo + _BLOCK)
+        m = hi - lo
+        close = last * np.exp(np.cumsum(rng.normal(0.0, vol, m)))
+        open_ = np.empty(m)
+        open_[0], open_[1:] = last, close[:-1]
+        wicks = rng.uniform(0.0, vol / 2, (2, m))
+
+        block = np.zeros(m, dtype=RATES_DTYPE)
+        block["time"] = t0 + np.arange(lo, hi, dtype=np.int64) * step
+        block["open"] = np.round(open_, digits)
+        block["close"] = np.round(close, digits)
+        block["high"] = np.round(np.maximum(open_, close) * (1 + wicks[0]), digits)
+        block["low"] = np.round(np.minimum(open_, close) * (1 - wicks[1]), digits)
+        block["tick_volume"] = rng.integers(1, 1000, m)
+        block["spread"] = rng.integers(spread_points[0], spread_points[1], m)
+        last = float(close[-1])
+        yield block
+
+
+def synthetic_rates(n_bars, timeframe="H1", seed=0, **kwargs):
+    """
+    The bars of synthetic_rate_blocks in one structured RATES_DTYPE array (mt5.copy_rates_range layout).
+    The whole output is allocated up front: n_bars * 60 bytes, about 630 MB for M1_20y (10.5M bars), plus one
+    block of random draws at a time. Use synthetic_rate_blocks to stream bars that do not fit in memory
+    """
+    rates = np.empty(n_bars, dtype=RATES_DTYPE)
+    lo = 0
+    for block in synthetic_rate_blocks(n_bars, timeframe, seed=seed, **kwargs):
+        rates[lo:lo + len(block)] = block
+        lo += len(block)
+    return rates
+
+
+def synthetic_bars(n_bars, timeframe="H1", seed=0, digits=2, **kwargs):
+    """
+    Synthetic bars in the add_bid_ask_columns layout (time, volumes, spread, real_spread, bid_*/ask_* OHLC)
+    """
+    rates = synthetic_rates(n_bars, timeframe, seed=seed, digits=digits, **kwargs)
+    return add_bid_ask_columns("SYNTH", rates_to_frame(rates), digits=digits)
+
+
+def synthetic_spec(symbol="SYNTH", digits=2):
+    """
+    Contract spec (backtest.profit_engine layout) of a 1-unit CFD quoted in the account currency
+    """
+    tick = 10 ** -digits
+    return {
+        "symbol": symbol, "digits": digits, "contract_size": 1.0,
+        "tick_size": tick, "tick_value": tick, "tick_value_profit": tick, "tick_value_loss": tick,
+        "volume_min": 0.01, "volume_step": 0.01, "volume_max": 1000.0,
+        "currency_profit": "USD", "account_currency": "USD", "account_digits": 2,
+    }
+
+
+class SyntheticSource:
+    """
+    BarStore fetch_fn serving slices of a pre-generated rates array, so cached-bar code paths run without a terminal
+    """
+
+    def __init__(self, rates):
+        self.rates = rates
+
+    def __call__(self, pair, timeframe, start_date, end_date):
+        times = self.rates["time"]
+        lo = np.searchsorted(times, _to_epoch(start_date), side="left")
+        hi = np.searchsorted(times, _to_epoch(end_date), side="right")
+        return self.rates[lo:hi]
@@ -1,20 +1,27 @@
 import os
 from datetime import datetime as dt
-import MetaTrader5 as mt5
-from dotenv import load_dotenv
-
-load_dotenv()
+from data.timeframes import TIMEFRAME_CODES
 
 # --- MT5 Credentials ---
-MT5_LOGIN = int(os.getenv("MT5_LOGIN") or 0)
-MT5_PASSWORD = os.getenv("MT5_PASSWORD")
-MT5_SERVER = os.getenv("MT5_SERVER")
+# MT5_LOGIN, MT5_PASSWORD and MT5_SERVER are read from .env on first access (module __getattr__ below),
+# so importing the constants needs neither dotenv nor the MT5 package
+_CREDENTIALS = ("MT5_LOGIN", "MT5_PASSWORD", "MT5_SERVER")
+
+
+def __getattr__(name):
+    if name not in _CREDENTIALS:
+        raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
+    from dotenv import load_dotenv
+    load_dotenv()
+    value = os.getenv(name)
+    return int(value or 0) if name == "MT5_LOGIN" else value
+
 
 # --- Pair & Risk management ---
 RISK_FREE_RATE = 0.0
 
 PAIR = "BTCUSD"
-TIMEFRAME = mt5.TIMEFRAME_H1           
+TIMEFRAME = TIMEFRAME_CODES["H1"]     # mt5.TIMEFRAME_H1           
 START_DATE = dt(2018,3,1)
 END_DATE   = dt(2023,12,1)
 
@@ -0,0 +1,219 @@
+import os
+import json
+import zipfile
+from datetime import timedelta
+import numpy as np
+from data.timeframes import timeframe_name
+from data.bar_store import RATES_DTYPE, fetch_rates_mt5, rates_to_frame, _to_epoch
+
+
+EXPORT_FORMATS = ("npz", "parquet")
+
+# Bars per chunk of an export file: one .npy member of the npz archive / one Parquet row group
+CHUNK_BARS = 1_000_000
+
+# Days requested from the source per call while exporting (bounded by chunk_bars in memory, not by the whole range)
+FETCH_DAYS = 30
+
+_META_KEY = "bar_io"
+
+
+def _import_pyarrow():
+    try:
+        import pyarrow
+        import pyarrow.parquet
+    except ImportError as exc:
+        raise ImportError("Parquet export needs pyarrow (pip install pyarrow), use fmt='npz' otherwise") from exc
+    return pyarrow
+
+
+def _format_of(file_path):
+    ext = os.path.splitext(file_path)[1].lstrip(".").lower()
+    if ext not in EXPORT_FORMATS:
+        raise ValueError(f"Unknown bar file extension {ext!r}, expected one of {EXPORT_FORMATS}")
+    return ext
+
+
+def _rechunk(parts, chunk_bars):
+    """
+    Regroup an iterable of rates arrays into chunks of chunk_bars rows (last one shorter), times strictly increasing
+    """
+    buffer, size, last_time = [], 0, None
+    for part in parts:
+        part = np.asarray(part).astype(RATES_DTYPE, copy=False)
+        if last_time is not None:
+            # consecutive source windows share their boundary bar
+            part = part[np.searchsorted(part["time"], last_time, side="right"):]
+        if len(part) == 0:
+            continue
+        last_time = part["time"][-1]
+
+        pos = 0
+        while pos < len(part):
+            take = min(chunk_bars - size, len(part) - pos)
+            buffer.append(part[pos:pos + take])
+            size, pos = size + take, pos + take
+            if size == chunk_bars:
+                yield np.concatenate(buffer)
+                buffer, size = [], 0
+    if size:
+        yield np.concatenate(buffer)
+
+
+class _NpzWriter:
+    """
+    Chunks as one .npy member per column (chunk_00000/time.npy, ...), columns compress better than records
+    """
+
+    def __init__(self, file_path, meta, compresslevel):
+        compression = zipfile.ZIP_DEFLATED if compresslevel else zipfile.ZIP_STORED
+        self.zf = zipfile.ZipFile(file_path, "w", compression=compression, compresslevel=compresslevel or None)
+        self.meta = meta
+        self.count = 0
+
+    def write(self, chunk):
+        for name in RATES_DTYPE.names:
+            with self.zf.open(f"chunk_{self.count:05d}/{name}.npy", "w", force_zip64=True) as f:
+                np.lib.format.write_array(f, np.ascontiguousarray(chunk[name]), allow_pickle=False)
+        self.count += 1
+
+    def close(self, chunks):
+        self.zf.writestr(f"{_META_KEY}.json", json.dumps(dict(self.meta, chunks=chunks)))
+        self.zf.close()
+
+
+class _ParquetWriter:
+    """
+    Chunks as row groups, the time range of every chunk is read back from the row group statistics
+    """
+
+    def __init__(self, file_path, meta, compresslevel):
+        self.pa = _import_pyarrow()
+        schema = self.pa.schema([(name, self.pa.from_numpy_dtype(RATES_DTYPE[name])) for name in RATES_DTYPE.names])
+        self.schema = schema.with_metadata({_META_KEY: json.dumps(meta)})
+        self.writer = self.pa.parquet.ParquetWriter(file_path, self.schema, compression="zstd" if compresslevel else "none",
+                                                    compression_level=compresslevel or None)
+
+    def write(self, chunk):
+        table = self.pa.Table.from_arrays([self.pa.array(chunk[name]) for name in RATES_DTYPE.names], schema=self.schema)
+        self.writer.write_table(table, row_group_size=len(chunk))
+
+    def close(self, chunks):
+        self.writer.close()
+
+
+def save_bars(rates, file_path, chunk_bars=CHUNK_BARS, compresslevel=1, **meta):
+    """
+    Write rates (structured array in the mt5.copy_rates_range layout, or an iterable of such arrays sorted by time)
+    to a .npz or .parquet file (format from the extension) chunk by chunk. Only one chunk is in memory at a time.
+    compresslevel: deflate (npz) / zstd (parquet) level, 0 stores raw columns (bigger file, fastest load).
+    meta: extra keys stored with the file (e.g. pair, timeframe). Return the file metadata (read_bar_meta)
+    """
+    fmt = _format_of(file_path)
+    parts = [rates] if isinstance(rates, np.ndarray) else rates
+    meta = dict(meta, format=fmt, dtype=RATES_DTYPE.descr)
+
+    tmp_path = file_path + ".tmp"
+    writer = (_NpzWriter if fmt == "npz" else _ParquetWriter)(tmp_path, meta, compresslevel)
+    chunks = []
+    try:
+        for chunk in _rechunk(parts, chunk_bars):
+            writer.write(chunk)
+            chunks.append({"rows": int(len(chunk)), "start": int(chunk["time"][0]), "end": int(chunk["time"][-1])})
+        writer.close(chunks)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    # like the bar store, a killed export never leaves a half written file under the final name
+    os.replace(tmp_path, file_path)
+    return dict(meta, rows=sum(c["rows"] for c in chunks), chunks=chunks)
+
+
+def export_bars(pair, timeframe, start_date, end_date, file_path, fmt="npz", chunk_bars=CHUNK_BARS,
+                compresslevel=1, fetch_days=FETCH_DAYS, fetch_fn=fetch_rates_mt5):
+    """
+    Stream bars of pair from MT5 (or fetch_fn, same signature as data.bar_store.fetch_rates_mt5) into one file.
+    The range is requested fetch_days at a time, so years of M1 bars never sit in memory at once.
+    file_path: directory (file named {pair}_{timeframe}_{start year}_{end year}.{fmt}) or full file path.
+    Return the path of the written file
+    """
+    if fmt not in EXPORT_FORMATS:
+        raise ValueError(f"fmt must be one of {EXPORT_FORMATS}, got {fmt!r}")
+    timeframe_str = timeframe_name(timeframe)
+    if os.path.isdir(file_path):
+        file_path = os.path.join(file_path, f"{pair}_{timeframe_str}_{start_date.year}_{end_date.year}.{fmt}")
+
+    def windows():
+        lo = start_date
+        while lo <= end_date:
+            hi = min(end_date, lo + timedelta(days=fetch_days))
+            yield fetch_fn(pair, timeframe, lo, hi)
+            lo = hi + timedelta(seconds=1)
+
+    meta = save_bars(windows(), file_path, chunk_bars, compresslevel, pair=pair, timeframe=timeframe_str)
+    print(f"{meta['rows']} bars of {pair} {timeframe_str} saved in {file_path}")
+    return file_path
+
+
+def read_bar_meta(file_path):
+    """
+    Metadata written by save_bars: pair, timeframe, format, rows and the rows / time range of every chunk
+    """
+    if _format_of(file_path) == "npz":
+        with zipfile.ZipFile(file_path) as zf:
+            meta = json.loads(zf.read(f"{_META_KEY}.json"))
+    else:
+        pa = _import_pyarrow()
+        file_meta = pa.parquet.ParquetFile(file_path).metadata
+        meta = json.loads(file_meta.metadata[_META_KEY.encode()])
+        time_col = RATES_DTYPE.names.index("time")
+        meta["chunks"] = []
+        for k in range(file_meta.num_row_groups):
+            group = file_meta.row_group(k)
+            stats = group.column(time_col).statistics
+            meta["chunks"].append({"rows": group.num_rows, "start": int(stats.min), "end": int(stats.max)})
+    meta["rows"] = sum(c["rows"] for c in meta["chunks"])
+    return meta
+
+
+def load_rates(file_path, start_date=None, end_date=None):
+    """
+    Read a save_bars file back as a RATES_DTYPE structured array, optionally limited to [start_date, end_date].
+    Chunks entirely outside the range are not read, the others are decoded column by column into one preallocated array
+    """
+    meta = read_bar_meta(file_path)
+    start = _to_epoch(start_date) if start_date is not None else None
+    end = _to_epoch(end_date) if end_date is not None else None
+    wanted = [k for k, c in enumerate(meta["chunks"])
+              if (start is None or c["end"] >= start) and (end is None or c["start"] <= end)]
+
+    rates = np.empty(sum(meta["chunks"][k]["rows"] for k in wanted), dtype=RATES_DTYPE)
+    offsets = np.cumsum([0] + [meta["chunks"][k]["rows"] for k in wanted])
+    if meta["format"] == "npz":
+        with zipfile.ZipFile(file_path) as zf:
+            for k, lo, hi in zip(wanted, offsets[:-1], offsets[1:]):
+                for name in RATES_DTYPE.names:
+                    with zf.open(f"chunk_{k:05d}/{name}.npy") as f:
+                        rates[name][lo:hi] = np.lib.format.read_array(f, allow_pickle=False)
+    else:
+        pa = _import_pyarrow()
+        pf = pa.parquet.ParquetFile(file_path)
+        for k, lo, hi in zip(wanted, offsets[:-1], offsets[1:]):
+            table = pf.read_row_group(k)
+            for name in RATES_DTYPE.names:
+                rates[name][lo:hi] = table.column(name).to_numpy()
+
+    times = rates["time"]
+    lo = np.searchsorted(times, start, side="left") if start is not None else 0
+    hi = np.searchsorted(times, end, side="right") if end is not None else len(rates)
+    return rates[lo:hi]
+
+
+def load_bars(file_path, start_date=None, end_date=None):
+    """
+    Offline replacement of get_data_from_mt5: bars of a save_bars / export_bars file in the same DataFrame layout
+    and dtypes (time datetime64, prices float64, volumes uint64, spread int32), ready for add_bid_ask_columns
+    """
+    return rates_to_frame(load_rates(file_path, start_date, end_date))
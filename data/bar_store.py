@@ -0,0 +1,247 @@
+import os
+import json
+import glob
+import numpy as np
+import pandas as pd
+from data.timeframes import timeframe_name, TIMEFRAME_CODES
+from data.resample import resample_rates, bucket_starts, bucket_ends, SPREAD_AGGREGATIONS
+from strategies.channel_index import DonchianIndex
+
+
+# Record layout returned by mt5.copy_rates_range
+RATES_DTYPE = np.dtype([
+    ("time", "<i8"), ("open", "<f8"), ("high", "<f8"), ("low", "<f8"), ("close", "<f8"),
+    ("tick_volume", "<u8"), ("spread", "<i4"), ("real_volume", "<u8"),
+])
+
+
+def _to_epoch(date):
+    """
+    Convert datetime/Timestamp to epoch seconds (naive datetimes are read as UTC like MT5 does)
+    """
+    return int(pd.Timestamp(date).timestamp())
+
+
+def _from_epoch(seconds):
+    return pd.Timestamp(int(seconds), unit="s").to_pydatetime()
+
+
+def fetch_rates_mt5(pair, timeframe, start_date, end_date):
+    """
+    Default source of BarStore: raw rates from MT5 terminal as a structured array
+    """
+    import MetaTrader5 as mt5
+    rates = mt5.copy_rates_range(pair, timeframe, start_date, end_date)
+    if rates is None:
+        raise RuntimeError(f"copy_rates_range failed for {pair}: {mt5.last_error()}")
+    return rates
+
+
+def rates_to_frame(rates):
+    """
+    Convert structured rates array to the DataFrame layout of get_data_from_mt5
+    """
+    df = pd.DataFrame(np.asarray(rates))
+    df.time = pd.to_datetime(df.time, unit="s")
+    return df
+
+
+def _covered_end(rates, end):
+    """
+    End (epoch seconds) of a fetched range known to be complete: the open time of its last bar when that is before end
+    (later bars may not exist yet and the last one may still be forming), end when nothing was returned
+    """
+    if len(rates) == 0:
+        return end
+    return min(end, int(rates["time"][-1]))
+
+
+class BarStore:
+    """
+    Local cache of MT5 bars, one memory-mappable .npy file per pair & timeframe plus a JSON file recording the covered range.
+    Requests are served from disk, only the missing head / tail of the range is fetched from the source.
+
+    resample_from: optional source timeframe (e.g. mt5.TIMEFRAME_M1). get() / get_rates() of any other timeframe then
+                   build it from the cached source bars (see get_resampled_rates) instead of fetching it
+    spread_agg: spread rule of resampled bars (data.resample.SPREAD_AGGREGATIONS), required with resample_from
+    fetch_fn=None: offline store, only cached bars are served (see offline())
+    """
+
+    def __init__(self, root, fetch_fn=fetch_rates_mt5, resample_from=None, spread_agg=None):
+        if resample_from is not None and spread_agg not in SPREAD_AGGREGATIONS:
+            raise ValueError(f"resample_from needs spread_agg, one of {SPREAD_AGGREGATIONS}")
+        self.root = root
+        self.fetch_fn = fetch_fn
+        self.resample_from = resample_from
+        self.spread_agg = spread_agg
+        os.makedirs(root, exist_ok=True)
+
+    def offline(self):
+        """
+        Store on the same directory that never fetches nor rewrites cached bars, e.g. for pool workers once the parent
+        has filled the store (optimization.parallel.warm_bar_store)
+        """
+        return BarStore(self.root, fetch_fn=None, resample_from=self.resample_from, spread_agg=self.spread_agg)
+
+    def _paths(self, pair, timeframe):
+        base = os.path.join(self.root, pair, timeframe_name(timeframe))
+        return base + ".npy", base + ".json"
+
+    def coverage(self, pair, timeframe):
+        """
+        Return (start, end) datetimes covered by the cache or None if nothing is stored
+        """
+        meta = self._read_meta(pair, timeframe)
+        if meta is None:
+            return None
+        return _from_epoch(meta["start"]), _from_epoch(meta["end"])
+
+    def _read_meta(self, pair, timeframe):
+        _, meta_path = self._paths(pair, timeframe)
+        if not os.path.exists(meta_path):
+            return None
+        with open(meta_path) as f:
+            return json.load(f)
+
+    def _load(self, pair, timeframe):
+        data_path, _ = self._paths(pair, timeframe)
+        return np.load(data_path, mmap_mode="r")
+
+    def _write(self, pair, timeframe, rates, start, end, extra=None):
+        data_path, meta_path = self._paths(pair, timeframe)
+        os.makedirs(os.path.dirname(data_path), exist_ok=True)
+
+        # write to temp files then replace, a killed run never leaves a half written cache. Temp names are per process
+        # so concurrent writers never share one; data goes first, a reader of the old meta only sees more bars
+        tmp_data = f"{data_path}.{os.getpid()}.tmp.npy"
+        np.save(tmp_data, rates)
+        os.replace(tmp_data, data_path)
+        meta = {"pair": pair, "timeframe": timeframe_name(timeframe), "start": int(start), "end": int(end), "rows": int(len(rates))}
+        meta.update(extra or {})
+        tmp_meta = f"{meta_path}.{os.getpid()}.tmp"
+        with open(tmp_meta, "w") as f:
+            json.dump(meta, f)
+        os.replace(tmp_meta, meta_path)
+
+    def _fetch(self, pair, timeframe, start, end):
+        if start > end or self.fetch_fn is None:
+            return np.empty(0, dtype=RATES_DTYPE)
+        rates = self.fetch_fn(pair, timeframe, _from_epoch(start), _from_epoch(end))
+        return np.asarray(rates).astype(RATES_DTYPE, copy=False)
+
+    def update(self, pair, timeframe, start_date, end_date):
+        """
+        Make sure [start_date, end_date] is covered, fetching only the missing head / tail. Return the full cached array.
+        The covered end is the open time of the last bar returned (see _covered_end), so a range ending in the future
+        or on a bar still forming is topped up by the next call, starting again from that last bar
+        """
+        start, end = _to_epoch(start_date), _to_epoch(end_date)
+        meta = self._read_meta(pair, timeframe)
+
+        if meta is None:
+            if self.fetch_fn is None:
+                raise KeyError(f"{pair} {timeframe_name(timeframe)} is not in the offline bar store {self.root}")
+            rates = self._fetch(pair, timeframe, start, end)
+            self._write(pair, timeframe, rates, start, _covered_end(rates, end))
+            return self._load(pair, timeframe)
+
+        if start >= meta["start"] and end <= meta["end"]:
+            return self._load(pair, timeframe)
+
+        cached = self._load(pair, timeframe)
+        head = self._fetch(pair, timeframe, start, meta["start"] - 1)
+        tail = self._fetch(pair, timeframe, meta["end"], end) if end > meta["end"] else head[:0]
+        if len(head) == 0 and len(tail) <= 1 and np.array_equal(tail, np.asarray(cached[len(cached) - len(tail):])):
+            # nothing new (only the last cached bar came back unchanged), the file is not rewritten
+            return cached
+
+        # refetched bars come first so they replace their cached copy (a bar stored while it was forming)
+        merged = np.concatenate([head, tail, np.asarray(cached)])
+        _, keep = np.unique(merged["time"], return_index=True)
+        merged = merged[keep]
+        del cached
+
+        new_end = max(meta["end"], _covered_end(tail, end)) if len(tail) else meta["end"]
+        self._write(pair, timeframe, merged, min(start, meta["start"]), new_end)
+        return self._load(pair, timeframe)
+
+    def get_rates(self, pair, timeframe, start_date, end_date):
+        """
+        Return structured rates array for [start_date, end_date] (a view on the memory-mapped file)
+        """
+        if self.resample_from is not None and timeframe_name(timeframe) != timeframe_name(self.resample_from):
+            return self.get_resampled_rates(pair, timeframe, start_date, end_date, self.spread_agg, self.resample_from)
+
+        rates = self.update(pair, timeframe, start_date, end_date)
+        times = rates["time"]
+        lo = np.searchsorted(times, _to_epoch(start_date), side="left")
+        hi = np.searchsorted(times, _to_epoch(end_date), side="right")
+        return rates[lo:hi]
+
+    def get(self, pair, timeframe, start_date, end_date):
+        """
+        Cached replacement of get_data_from_mt5: same DataFrame layout
+        """
+        return rates_to_frame(self.get_rates(pair, timeframe, start_date, end_date))
+
+    def get_resampled_rates(self, pair, timeframe, start_date, end_date, spread_agg, source_timeframe=TIMEFRAME_CODES["M1"]):
+        """
+        Bars of `timeframe` opening in [start_date, end_date], built from the cached source_timeframe bars
+        (data.resample.resample_rates, chunked) and cached as their own file per timeframe & spread rule.
+        The source range is extended to whole bars; the cache is rebuilt whenever the source coverage changes
+        """
+        first = bucket_starts([_to_epoch(start_date)], timeframe)[0]
+        last = bucket_starts([_to_epoch(end_date)], timeframe)[0]
+        after = bucket_ends([_to_epoch(end_date)], timeframe)[0]
+        source = self.update(pair, source_timeframe, _from_epoch(first), _from_epoch(after - 1))
+        source_meta = self._read_meta(pair, source_timeframe)
+
+        key = f"{timeframe_name(timeframe)}_from_{timeframe_name(source_timeframe)}_spread_{spread_agg}"
+        meta = self._read_meta(pair, key)
+        if meta is None or (meta.get("source_start"), meta.get("source_end")) != (source_meta["start"], source_meta["end"]):
+            resampled = resample_rates(source, timeframe, spread_agg)
+            del source
+            self._write(pair, key, resampled, source_meta["start"], source_meta["end"],
+                        extra={"source_start": source_meta["start"], "source_end": source_meta["end"]})
+
+        rates = self._load(pair, key)
+        times = rates["time"]
+        lo = np.searchsorted(times, first, side="left")
+        hi = np.searchsorted(times, last, side="right")
+        return rates[lo:hi]
+
+    def get_channel_index(self, pair, timeframe, start_date, end_date, max_window, price_col="close"):
+        """
+        DonchianIndex of price_col over the bars of get_rates(pair, timeframe, start_date, end_date), cached next to the
+        bar file. The file records the bars it was built on (count, last bar time and price) and is rebuilt when
+        get_rates returns other bars, e.g. once the covered end of the store is topped up
+        """
+        rates = self.get_rates(pair, timeframe, start_date, end_date)
+        built_on = {"bars": len(rates), "last_time": int(rates["time"][-1]) if len(rates) else -1,
+                    "last_price": float(rates[price_col][-1]) if len(rates) else np.nan}
+
+        base, _ = self._paths(pair, timeframe)
+        index_path = f"{base[:-4]}_index_{price_col}_{_to_epoch(start_date)}_{_to_epoch(end_date)}_{int(max_window)}.npz"
+        if os.path.exists(index_path):
+            with np.load(index_path) as data:
+                stored = {key: data[key].item() for key in built_on if key in data.files}
+            if stored == built_on:
+                return DonchianIndex.load(index_path)
+
+        index = DonchianIndex(rates[price_col], max_window=max_window)
+        tmp_path = f"{index_path[:-4]}.{os.getpid()}.tmp.npz"
+        index.save(tmp_path, **built_on)
+        os.replace(tmp_path, index_path)
+        return index
+
+    def clear(self, pair, timeframe):
+        """
+        Delete cached bars of pair & timeframe
+        """
+        base, meta_path = self._paths(pair, timeframe)
+        index_paths = glob.glob(f"{glob.escape(base[:-4])}_index_*.npz")
+        # timeframes resampled from this one are stale once it is gone
+        derived = glob.glob(os.path.join(glob.escape(os.path.dirname(base)), f"*_FROM_{timeframe_name(timeframe)}_SPREAD_*"))
+        for path in [base, meta_path] + index_paths + derived:
+            if os.path.exists(path):
+                os.remove(path)
@@ -1,10 +1,11 @@
 import pandas as pd
-import MetaTrader5 as mt5
 import os
 from datetime import datetime as dt
+from data.timeframes import timeframe_name
 
 
 def get_data_from_mt5(pair, timeframe, start_date, end_date):
+    import MetaTrader5 as mt5
     avai_symbol_names = [symbol.name for symbol in mt5.symbols_get()]
     if pair not in avai_symbol_names:
         print(f'{pair} is not available in MT5 terminal')
@@ -14,14 +15,24 @@ def get_data_from_mt5(pair, timeframe, start_date, end_date):
         print(f"Getting data of {pair}_{timeframe} successfully ")
     return df
 
+# Rows of an Excel sheet, header included
+EXCEL_MAX_ROWS = 1_048_576
+
+
 def create_excel_from_mt5(pair, timeframe, start_date, end_date, file_path):
+    """ 
+    Save bars to an Excel sheet for inspection. Excel stops at EXCEL_MAX_ROWS rows and is slow to write,
+    use data.bar_io.export_bars (chunked .npz / .parquet) and load_bars for datasets
+    """
     df = get_data_from_mt5(pair, timeframe, start_date, end_date)
+    if len(df) >= EXCEL_MAX_ROWS:
+        raise ValueError(f"{len(df)} bars do not fit in an Excel sheet, use data.bar_io.export_bars instead")
     
     start_year = start_date.year
     end_year = end_date.year
-    timeframe_str = {mt5.TIMEFRAME_M1: "M1", mt5.TIMEFRAME_M5: "M5", mt5.TIMEFRAME_M15: "M15", mt5.TIMEFRAME_M30: "M30", mt5.TIMEFRAME_H1: "H1", mt5.TIMEFRAME_H4: "H4"}[timeframe]
+    timeframe_str = timeframe_name(timeframe)
     filename = f"{pair}_{timeframe_str}_{start_year}_{end_year}.xlsx"
-    file_full_path = f"{file_path}\\{filename}"
+    file_full_path = os.path.join(file_path, filename)
     
     df.to_excel(file_full_path, index=False)
     print(f"Data saved in {file_full_path}")
@@ -30,6 +41,7 @@ def create_excel_from_mt5(pair, timeframe, start_date, end_date, file_path):
 
 
 def get_digits_number(pair: str):
+    import MetaTrader5 as mt5
     if not mt5.initialize():
         raise RuntimeError("MT5 is not initialized.")
     
@@ -38,12 +50,30 @@ def get_digits_number(pair: str):
         digits_dict = {symbol.name: symbol.digits for symbol in symbols}
         return digits_dict.get(pair, None)
 
-def add_bid_ask_columns(pair : str, df: pd.DataFrame):
-    bid_ask_df = df.copy()
-    
-    digit = get_digits_number(pair)
+# Columns kept by add_bid_ask_columns(compact=True): everything signals, backtests and plots read
+COMPACT_COLUMNS = ('time', 'real_spread', 'bid_o', 'bid_h', 'bid_l', 'bid_c', 'ask_h', 'ask_c')
+
+
+def add_bid_ask_columns(pair : str, df: pd.DataFrame, digits=None, compact=False):
+    """ 
+    Add bid/ask OHLC and real_spread columns. digits: optional symbol digits (e.g. from a cached symbol spec) to skip the MT5 lookup
+    compact: return only COMPACT_COLUMNS without copying df (bid columns share its price arrays), volumes / raw spread
+             and the unused ask_o / ask_l are dropped (see ask_column). Values are the same float64 numbers as the full layout
+    """
+    digit = get_digits_number(pair) if digits is None else digits
     if digit is None:
         raise ValueError(f"Could not retrieve digits for pair: {pair}")
+
+    if compact:
+        real_spread = df['spread'].to_numpy() * (10 ** -digit)
+        cols = {'time': df['time'].to_numpy(), 'real_spread': real_spread}
+        for col in ["open", "high", "low", "close"]:
+            cols[f"bid_{col[0]}"] = df[col].to_numpy()
+        cols['ask_h'] = cols['bid_h'] + real_spread
+        cols['ask_c'] = cols['bid_c'] + real_spread
+        return pd.DataFrame(cols, index=df.index, copy=False)
+
+    bid_ask_df = df.copy()
      
     bid_ask_df['real_spread'] = bid_ask_df['spread'] * (10 ** -digit)
 
@@ -53,4 +83,13 @@ def add_bid_ask_columns(pair : str, df: pd.DataFrame):
     
     bid_ask_df.drop(columns=["open", "high", "low", "close"], inplace=True)
 
-    return bid_ask_df
\ No newline at end of file
+    return bid_ask_df
+
+
+def ask_column(df: pd.DataFrame, col: str):
+    """ 
+    Ask price column ('o', 'h', 'l', 'c') of a full or compact bid/ask frame, derived from bid + real_spread when not stored
+    """
+    if f"ask_{col}" in df.columns:
+        return df[f"ask_{col}"]
+    return (df[f"bid_{col}"] + df['real_spread']).rename(f"ask_{col}")
@@ -0,0 +1,143 @@
+import numpy as np
+import pandas as pd
+from data.timeframes import timeframe_name, timeframe_seconds
+
+
+# How the integer spread (points) of a resampled bar is built from its source bars
+SPREAD_AGGREGATIONS = ("open", "close", "min", "max", "mean")
+
+# Source bars aggregated per chunk, bounds the working memory of resample_rates
+CHUNK_BARS = 1_000_000
+
+_DAY = 86400
+# 1970-01-04 is a Sunday: weekly bars start on Sunday 00:00 like MT5
+_WEEK_ORIGIN = 3 * _DAY
+
+
+def bucket_starts(times, timeframe):
+    """
+    Open time (epoch seconds) of the `timeframe` bar containing every epoch time.
+    Intraday timeframes are anchored at midnight (M45 -> 00:00, 00:45, ..., H5 -> 00:00, 05:00, ..., 20:00),
+    W1 starts on Sunday, MN1 on the first day of the month, other multi-day timeframes are anchored at 1970-01-01
+    """
+    times = np.asarray(times, dtype=np.int64)
+    name = timeframe_name(timeframe)
+    if name == "MN1":
+        months = times.astype("datetime64[s]").astype("datetime64[M]")
+        return months.astype("datetime64[s]").astype(np.int64)
+
+    step = timeframe_seconds(name)
+    if step <= _DAY:
+        day = times - times % _DAY
+        return day + (times - day) // step * step
+    origin = _WEEK_ORIGIN if name.startswith("W") else 0
+    return times - (times - origin) % step
+
+
+def bucket_ends(times, timeframe):
+    """
+    Open time (epoch seconds) of the bar following the `timeframe` bar of every epoch time
+    """
+    starts = bucket_starts(times, timeframe)
+    name = timeframe_name(timeframe)
+    if name == "MN1":
+        months = starts.astype("datetime64[s]").astype("datetime64[M]") + 1
+        return months.astype("datetime64[s]").astype(np.int64)
+
+    step = timeframe_seconds(name)
+    if step <= _DAY:
+        # the last intraday bar stops at midnight when step does not divide a day (H5: 20:00 -> 00:00)
+        return np.minimum(starts + step, starts - starts % _DAY + _DAY)
+    return starts + step
+
+
+def sub_bar_ranges(times, sub_times, timeframe):
+    """
+    Index from every `timeframe` bar to its lower timeframe sub-bars: sub-bars of bar i are sub_times[lo[i]:hi[i]].
+    times / sub_times: sorted datetime64 or epoch seconds. Return (lo, hi) int64 arrays, lo == hi when no sub-bar is there
+    """
+    times = np.asarray(times).astype("datetime64[s]").astype(np.int64)
+    sub_times = np.asarray(sub_times).astype("datetime64[s]").astype(np.int64)
+    lo = np.searchsorted(sub_times, times, side="left")
+    hi = np.searchsorted(sub_times, bucket_ends(times, timeframe), side="left")
+    return lo.astype(np.int64), np.maximum(lo, hi).astype(np.int64)
+
+
+def _aggregate(chunk, buckets, spread_agg):
+    """
+    Aggregate consecutive rows of chunk sharing a bucket into one bar (chunk sorted by time)
+    """
+    starts = np.flatnonzero(np.r_[True, buckets[1:] != buckets[:-1]])
+    ends = np.r_[starts[1:], len(buckets)] - 1
+
+    out = np.zeros(len(starts), dtype=chunk.dtype)
+    out["time"] = buckets[starts]
+    out["open"] = chunk["open"][starts]
+    out["high"] = np.maximum.reduceat(chunk["high"], starts)
+    out["low"] = np.minimum.reduceat(chunk["low"], starts)
+    out["close"] = chunk["close"][ends]
+    out["tick_volume"] = np.add.reduceat(chunk["tick_volume"], starts)
+    out["real_volume"] = np.add.reduceat(chunk["real_volume"], starts)
+
+    spread = chunk["spread"]
+    if spread_agg == "open":
+        out["spread"] = spread[starts]
+    elif spread_agg == "close":
+        out["spread"] = spread[ends]
+    elif spread_agg == "min":
+        out["spread"] = np.minimum.reduceat(spread, starts)
+    elif spread_agg == "max":
+        out["spread"] = np.maximum.reduceat(spread, starts)
+    else:
+        total = np.add.reduceat(spread.astype(np.int64), starts)
+        out["spread"] = np.rint(total / (ends - starts + 1))
+    return out
+
+
+def resample_rates(rates, timeframe, spread_agg, chunk_bars=CHUNK_BARS):
+    """
+    Build `timeframe` bars from lower timeframe rates (structured array in the mt5.copy_rates_range layout, sorted by time).
+    Works chunk by chunk: a bar cut by a chunk boundary is carried over to the next chunk, so memory stays bounded by
+    chunk_bars whatever the length of rates (a memory-mapped BarStore array is only paged in chunk by chunk).
+
+    spread_agg: one of SPREAD_AGGREGATIONS, there is no default on purpose.
+                "open" / "close": spread of the first / last source bar, "min" / "max": over the bar,
+                "mean": average rounded to whole points
+    A bar whose source bars are not all available (e.g. the edges of the range) is built from what is there.
+    """
+    if spread_agg not in SPREAD_AGGREGATIONS:
+        raise ValueError(f"spread_agg must be one of {SPREAD_AGGREGATIONS}, got {spread_agg!r}")
+
+    parts = []
+    carry = rates[:0]
+    for lo in range(0, len(rates), chunk_bars):
+        chunk = np.concatenate([carry, np.asarray(rates[lo:lo + chunk_bars])])
+        buckets = bucket_starts(chunk["time"], timeframe)
+
+        # the last bar may continue in the next chunk, keep its rows for later
+        last = np.searchsorted(buckets, buckets[-1], side="left")
+        if lo + chunk_bars < len(rates):
+            chunk, carry, buckets = chunk[:last], chunk[last:], buckets[:last]
+        else:
+            carry = rates[:0]
+        if len(chunk):
+            parts.append(_aggregate(chunk, buckets, spread_agg))
+
+    if not parts:
+        return np.zeros(0, dtype=rates.dtype)
+    return np.concatenate(parts)
+
+
+def resample_frame(df, timeframe, spread_agg, chunk_bars=CHUNK_BARS):
+    """
+    resample_rates on a DataFrame in the get_data_from_mt5 layout, returns the same layout
+    """
+    cols = ("open", "high", "low", "close", "tick_volume", "spread", "real_volume")
+    rates = np.zeros(len(df), dtype=[("time", np.int64)] + [(col, df[col].to_numpy().dtype) for col in cols])
+    rates["time"] = df["time"].to_numpy(dtype="datetime64[s]").astype(np.int64)
+    for col in cols:
+        rates[col] = df[col].to_numpy()
+
+    out = pd.DataFrame(resample_rates(rates, timeframe, spread_agg, chunk_bars))
+    out.time = pd.to_datetime(out.time, unit="s")
+    return out
@@ -0,0 +1,42 @@
+import re
+
+
+# MT5 timeframe constants (values of mt5.TIMEFRAME_*) -> name
+TIMEFRAME_NAMES = {
+    1: "M1", 2: "M2", 3: "M3", 4: "M4", 5: "M5", 6: "M6", 10: "M10", 12: "M12", 15: "M15", 20: "M20", 30: "M30",
+    16385: "H1", 16386: "H2", 16387: "H3", 16388: "H4", 16390: "H6", 16392: "H8", 16396: "H12",
+    16408: "D1", 32769: "W1", 49153: "MN1",
+}
+TIMEFRAME_CODES = {name: code for code, name in TIMEFRAME_NAMES.items()}
+
+_UNIT_MINUTES = {"M": 1, "H": 60, "D": 1440, "W": 10080}
+
+
+def timeframe_name(timeframe):
+    """
+    Return name of a timeframe given as MT5 constant (mt5.TIMEFRAME_H1) or string ("H1")
+    """
+    if isinstance(timeframe, str):
+        return timeframe.upper()
+    if timeframe not in TIMEFRAME_NAMES:
+        raise ValueError(f"Unknown MT5 timeframe: {timeframe}")
+    return TIMEFRAME_NAMES[timeframe]
+
+
+def timeframe_minutes(timeframe):
+    """
+    Return length of a timeframe in minutes. Accept MT5 constants and names like "M1", "M45", "H2", "D1"
+    """
+    name = timeframe_name(timeframe)
+    match = re.fullmatch(r"([MHDW])(\d+)", name)
+    if match is None:
+        raise ValueError(f"Timeframe {name} has no fixed length")
+    unit, count = match.groups()
+    return _UNIT_MINUTES[unit] * int(count)
+
+
+def timeframe_seconds(timeframe):
+    """
+    Return length of a timeframe in seconds
+    """
+    return timeframe_minutes(timeframe) * 60
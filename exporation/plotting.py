@@ -1,14 +1,109 @@
 import datetime as dt
+import numpy as np
 import plotly.graph_objects as go
 import pandas as pd
 
+
+def ohlc_buckets(open_, high, low, close, n_buckets):
+    """ 
+    Aggregate bars into at most n_buckets consecutive buckets of equal size: first open, highest high, lowest low, last close.
+    Return (starts, open, high, low, close), starts = index of the first bar of every bucket
+    """
+    n = len(open_)
+    starts = np.unique(np.linspace(0, n, min(n, n_buckets), endpoint=False).astype(np.int64))
+    if n == 0:
+        return starts, open_[:0], high[:0], low[:0], close[:0]
+    ends = np.r_[starts[1:], n] - 1
+    return starts, open_[starts], np.maximum.reduceat(high, starts), np.minimum.reduceat(low, starts), close[ends]
+
+
+def lttb(x, y, n_out):
+    """ 
+    Largest-Triangle-Three-Buckets downsampling of a line to n_out points: in every bucket keep the point forming
+    the largest triangle with the previous kept point and the mean of the next bucket (peaks and channel steps survive).
+    x: float array (e.g. int64 times). Return indices of the kept points, first and last always kept
+    """
+    n = len(y)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    keep = np.empty(n_out, dtype=np.int64)
+    keep[0], keep[-1] = 0, n - 1
+    a = 0
+    # one iteration per output point, the bucket itself is handled with NumPy
+    for k in range(n_out - 2):
+        lo, hi = edges[k], edges[k + 1]
+        next_hi = edges[k + 2] if k + 2 < len(edges) else n
+        cx, cy = x[hi:next_hi].mean(), y[hi:next_hi].mean()
+        area = np.abs((x[a] - cx) * (y[lo:hi] - y[a]) - (x[a] - x[lo:hi]) * (cy - y[a]))
+        a = lo + int(np.argmax(area))
+        keep[k + 1] = a
+    return keep
+
+
+def downsample_line(times, values, n_out):
+    """ 
+    lttb of a line with NaN (e.g. Donchian warm-up) on its finite points. Return the kept indices
+    """
+    finite = np.flatnonzero(np.isfinite(values))
+    kept = lttb(times[finite].astype(np.int64).astype(float), values[finite], n_out)
+    return finite[kept]
+
+
 class CandlePlot:
 
-    def __init__(self, df, candles=True) -> None:
+    def __init__(self, df, candles=True, max_points=None) -> None:
+        """ 
+        max_points: optional pixel budget. When df has more bars, candles are aggregated into max_points OHLC buckets,
+                    lines are reduced with LTTB and drawn with WebGL (Scattergl), see widget() to re-aggregate on zoom.
+                    Trade markers always use the exact trade times and prices
+        """
         self.df_plot = df.copy()
         self.candles = candles
+        self.max_points = max_points
+        self.line_traces = []
+        self._times = self.df_plot['time'].to_numpy(dtype='datetime64[ns]')
         self.create_candle_fig()
 
+    @property
+    def downsampled(self):
+        return self.max_points is not None and len(self.df_plot) > self.max_points
+
+    @property
+    def _scatter(self):
+        return go.Scattergl if self.downsampled else go.Scatter
+
+    def _window(self, x0=None, x1=None):
+        """ 
+        Row range [lo, hi) of df_plot inside the x axis range, one bar of margin on each side
+        """
+        lo = 0 if x0 is None else max(0, int(np.searchsorted(self._times, np.datetime64(pd.Timestamp(x0)), side='left')) - 1)
+        hi = len(self._times) if x1 is None else min(len(self._times), int(np.searchsorted(self._times, np.datetime64(pd.Timestamp(x1)), side='right')) + 1)
+        return lo, hi
+
+    def _candle_data(self, lo=0, hi=None):
+        """ 
+        x / OHLC of the candle trace for rows [lo, hi), aggregated to max_points buckets in downsampled mode
+        """
+        hi = len(self.df_plot) if hi is None else hi
+        cols = [self.df_plot[col].to_numpy()[lo:hi] for col in ('bid_o', 'bid_h', 'bid_l', 'bid_c')]
+        if not self.downsampled:
+            return dict(x=self.df_plot['time'].iloc[lo:hi], open=cols[0], high=cols[1], low=cols[2], close=cols[3])
+        starts, o, h, l, c = ohlc_buckets(*cols, self.max_points)
+        return dict(x=self._times[lo:hi][starts], open=o, high=h, low=l, close=c)
+
+    def _line_data(self, line, lo=0, hi=None):
+        """ 
+        x / y of a line trace for rows [lo, hi), LTTB-reduced to max_points in downsampled mode
+        """
+        hi = len(self.df_plot) if hi is None else hi
+        if not self.downsampled:
+            return dict(x=self.df_plot['time'].iloc[lo:hi], y=self.df_plot[line].iloc[lo:hi])
+        times, values = self._times[lo:hi], self.df_plot[line].to_numpy(dtype=float)[lo:hi]
+        keep = downsample_line(times, values, self.max_points)
+        return dict(x=times[keep], y=values[keep])
+
     def create_candle_fig(self):
         """ 
         Creat candle chart from price data
@@ -16,11 +111,8 @@ class CandlePlot:
         self.fig = go.Figure()
         if self.candles == True:
             self.fig.add_trace(go.Candlestick(
-                            x=self.df_plot['time'],
-                            open=self.df_plot['bid_o'],
-                            high=self.df_plot['bid_h'],
-                            low=self.df_plot['bid_l'],
-                            close=self.df_plot['bid_c'],
+                            **self._candle_data(),
+                            name='candles',
                             line= dict(width = 1), opacity = 1,
                             increasing_line_color= '#24A06B',
                             decreasing_line_color= '#CC2E3C',
@@ -62,6 +154,11 @@ class CandlePlot:
         Add line traces to chart (EMA, SMA, Donchian high/low, .etc)
         """
         for line in line_traces:
+            self.line_traces.append(line)
+            if self.downsampled:
+                # WebGL lines have no spline shape
+                self.fig.add_trace(go.Scattergl(**self._line_data(line), mode='lines', line=dict(width=2), name=line))
+                continue
             self.fig.add_trace(go.Scatter(
                 x=self.df_plot['time'],
                 y=self.df_plot[line],
@@ -70,6 +167,35 @@ class CandlePlot:
                 name=line
             ))
 
+    def render_window(self, x0=None, x1=None, fig=None):
+        """ 
+        Re-aggregate candles and lines of fig (default self.fig) for the bars between x0 and x1 (None = data edge),
+        so a zoomed window gets max_points buckets of its own. No-op unless downsampled
+        """
+        if not self.downsampled:
+            return
+        fig = self.fig if fig is None else fig
+        lo, hi = self._window(x0, x1)
+        with fig.batch_update():
+            for trace in fig.data:
+                if trace.type == 'candlestick':
+                    trace.update(**self._candle_data(lo, hi))
+                elif trace.name in self.line_traces:
+                    trace.update(**self._line_data(trace.name, lo, hi))
+
+    def widget(self):
+        """ 
+        FigureWidget (Jupyter, needs ipywidgets) that calls render_window on every zoom / pan of the x axis
+        """
+        fig = go.FigureWidget(self.fig)
+
+        def on_range(layout, x_range):
+            x0, x1 = x_range if x_range is not None else (None, None)
+            self.render_window(x0, x1, fig=fig)
+
+        fig.layout.on_change(on_range, 'xaxis.range')
+        return fig
+
     def add_trade_markers(self, trades_df, show_entry=True, show_exit=True):
         """
         Add trade entry/exit markers on top of the candlestick chart.
@@ -90,7 +216,7 @@ class CandlePlot:
             # BUY entry:
             if not buy_trades.empty:
                 self.fig.add_trace(
-                    go.Scatter(
+                    self._scatter(
                         x=buy_trades['entry_time'],
                         y=buy_trades['entry_price'],
                         mode='markers',
@@ -111,7 +237,7 @@ class CandlePlot:
             # SELL entry:
             if not sell_trades.empty:
                 self.fig.add_trace(
-                    go.Scatter(
+                    self._scatter(
                         x=sell_trades['entry_time'],
                         y=sell_trades['entry_price'],
                         mode='markers',
@@ -134,7 +260,7 @@ class CandlePlot:
         if show_exit:
             if not buy_trades.empty:
                 self.fig.add_trace(
-                    go.Scatter(
+                    self._scatter(
                         x=buy_trades['exit_time'],
                         y=buy_trades['exit_price'],
                         mode='markers',
@@ -156,7 +282,7 @@ class CandlePlot:
                 )
             if not sell_trades.empty:
                 self.fig.add_trace(
-                    go.Scatter(
+                    self._scatter(
                         x=sell_trades['exit_time'],
                         y=sell_trades['exit_price'],
                         mode='markers',
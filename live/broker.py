@@ -0,0 +1,113 @@
+from backtest.profit_engine import calc_profit
+
+
+class Broker:
+    """
+    Interface used by the live trader. Positions are dicts: ticket, symbol, side, lot, price, sl
+    """
+
+    def get_symbol_spec(self, symbol):
+        raise NotImplementedError
+
+    def get_closed_bars(self, symbol, timeframe, count):
+        """ Return the last `count` closed bars as a DataFrame with the get_data_from_mt5 layout """
+        raise NotImplementedError
+
+    def account_balance(self):
+        raise NotImplementedError
+
+    def positions(self, symbol):
+        raise NotImplementedError
+
+    def open_position(self, symbol, side, lot, sl):
+        raise NotImplementedError
+
+    def modify_position(self, ticket, sl):
+        raise NotImplementedError
+
+    def close_position(self, ticket):
+        raise NotImplementedError
+
+
+class FakeBroker(Broker):
+    """
+    In-memory broker for testing / replay. Bars are revealed one by one with advance(), orders fill at the
+    last closed bar (ask for BUY, bid for SELL) and stop losses are checked on every new bar like the backtest
+    """
+
+    def __init__(self, specs, balance=10000.0):
+        self.specs = specs
+        self.balance = float(balance)
+        self.orders = []
+        self._bars = {}
+        self._cursor = {}
+        self._positions = {}
+        self._next_ticket = 1
+
+    def load_history(self, symbol, raw_df, visible_bars):
+        """
+        Register bars of symbol (get_data_from_mt5 layout), the first `visible_bars` are already closed
+        """
+        self._bars[symbol] = raw_df.reset_index(drop=True)
+        self._cursor[symbol] = int(visible_bars)
+
+    def has_next(self, symbol):
+        return self._cursor[symbol] < len(self._bars[symbol])
+
+    def advance(self, symbol):
+        """
+        Close the next bar of symbol and trigger stop losses hit by it
+        """
+        bar = self._bars[symbol].iloc[self._cursor[symbol]]
+        self._cursor[symbol] += 1
+
+        spread = bar['spread'] * 10 ** -self.specs[symbol]['digits']
+        for pos in [p for p in self._positions.values() if p['symbol'] == symbol]:
+            if pos['side'] == "BUY" and bar['low'] <= pos['sl']:
+                self._close(pos, pos['sl'], "SL")
+            elif pos['side'] == "SELL" and bar['high'] + spread >= pos['sl']:
+                self._close(pos, pos['sl'], "SL")
+
+    def _last_prices(self, symbol):
+        bar = self._bars[symbol].iloc[self._cursor[symbol] - 1]
+        bid = float(bar['close'])
+        return bid, bid + bar['spread'] * 10 ** -self.specs[symbol]['digits']
+
+    def _close(self, pos, price, reason):
+        profit = float(calc_profit(self.specs[pos['symbol']], pos['side'], pos['lot'], pos['price'], price))
+        self.balance += profit
+        del self._positions[pos['ticket']]
+        self.orders.append({"action": "close", "ticket": pos['ticket'], "symbol": pos['symbol'], "side": pos['side'],
+                            "lot": pos['lot'], "price": price, "profit": profit, "reason": reason})
+        return {"ticket": pos['ticket'], "price": price, "profit": profit}
+
+    def get_symbol_spec(self, symbol):
+        return self.specs[symbol]
+
+    def get_closed_bars(self, symbol, timeframe, count):
+        cursor = self._cursor[symbol]
+        return self._bars[symbol].iloc[max(0, cursor - count):cursor].reset_index(drop=True)
+
+    def account_balance(self):
+        return self.balance
+
+    def positions(self, symbol):
+        return [dict(p) for p in self._positions.values() if p['symbol'] == symbol]
+
+    def open_position(self, symbol, side, lot, sl):
+        bid, ask = self._last_prices(symbol)
+        pos = {"ticket": self._next_ticket, "symbol": symbol, "side": side, "lot": lot,
+               "price": ask if side == "BUY" else bid, "sl": sl}
+        self._next_ticket += 1
+        self._positions[pos['ticket']] = pos
+        self.orders.append(dict(pos, action="open"))
+        return dict(pos)
+
+    def modify_position(self, ticket, sl):
+        self._positions[ticket]['sl'] = sl
+        self.orders.append({"action": "modify", "ticket": ticket, "sl": sl})
+
+    def close_position(self, ticket):
+        pos = self._positions[ticket]
+        bid, ask = self._last_prices(pos['symbol'])
+        return self._close(pos, bid if pos['side'] == "BUY" else ask, "Reverse_signal")
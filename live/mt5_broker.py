@@ -0,0 +1,89 @@
+import pandas as pd
+import MetaTrader5 as mt5
+from live.broker import Broker
+from backtest.profit_engine import get_symbol_spec
+
+
+class MT5Broker(Broker):
+    """
+    Broker implementation on the MT5 terminal (market orders with broker-side stop loss)
+    """
+
+    def __init__(self, magic=20250101, deviation=20, comment="donchian-bot"):
+        if not mt5.initialize():
+            raise RuntimeError("MT5 is not initialized.")
+        self.magic = magic
+        self.deviation = deviation
+        self.comment = comment
+
+    def get_symbol_spec(self, symbol):
+        return get_symbol_spec(symbol)
+
+    def get_closed_bars(self, symbol, timeframe, count):
+        # position 0 is the bar still forming, closed bars start at 1
+        rates = mt5.copy_rates_from_pos(symbol, timeframe, 1, count)
+        if rates is None:
+            raise RuntimeError(f"copy_rates_from_pos failed for {symbol}: {mt5.last_error()}")
+        df = pd.DataFrame(rates)
+        df.time = pd.to_datetime(df.time, unit="s")
+        return df
+
+    def account_balance(self):
+        return float(mt5.account_info().balance)
+
+    def positions(self, symbol):
+        out = []
+        for p in mt5.positions_get(symbol=symbol) or []:
+            if p.magic != self.magic:
+                continue
+            out.append({"ticket": p.ticket, "symbol": p.symbol, "side": "BUY" if p.type == mt5.POSITION_TYPE_BUY else "SELL",
+                        "lot": p.volume, "price": p.price_open, "sl": p.sl})
+        return out
+
+    def _send(self, request):
+        result = mt5.order_send(request)
+        if result is None or result.retcode != mt5.TRADE_RETCODE_DONE:
+            raise RuntimeError(f"order_send failed: {result.comment if result is not None else mt5.last_error()}")
+        return result
+
+    def open_position(self, symbol, side, lot, sl):
+        tick = mt5.symbol_info_tick(symbol)
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "symbol": symbol,
+            "volume": float(lot),
+            "type": mt5.ORDER_TYPE_BUY if side == "BUY" else mt5.ORDER_TYPE_SELL,
+            "price": tick.ask if side == "BUY" else tick.bid,
+            "sl": float(sl),
+            "deviation": self.deviation,
+            "magic": self.magic,
+            "comment": self.comment,
+            "type_time": mt5.ORDER_TIME_GTC,
+            "type_filling": mt5.ORDER_FILLING_IOC,
+        }
+        result = self._send(request)
+        return {"ticket": result.order, "symbol": symbol, "side": side, "lot": result.volume, "price": result.price, "sl": sl}
+
+    def modify_position(self, ticket, sl):
+        pos = mt5.positions_get(ticket=ticket)[0]
+        self._send({"action": mt5.TRADE_ACTION_SLTP, "position": ticket, "symbol": pos.symbol, "sl": float(sl), "tp": pos.tp})
+
+    def close_position(self, ticket):
+        pos = mt5.positions_get(ticket=ticket)[0]
+        tick = mt5.symbol_info_tick(pos.symbol)
+        is_buy = pos.type == mt5.POSITION_TYPE_BUY
+        request = {
+            "action": mt5.TRADE_ACTION_DEAL,
+            "position": ticket,
+            "symbol": pos.symbol,
+            "volume": pos.volume,
+            "type": mt5.ORDER_TYPE_SELL if is_buy else mt5.ORDER_TYPE_BUY,
+            "price": tick.bid if is_buy else tick.ask,
+            "deviation": self.deviation,
+            "magic": self.magic,
+            "comment": self.comment,
+            "type_time": mt5.ORDER_TIME_GTC,
+            "type_filling": mt5.ORDER_FILLING_IOC,
+        }
+        result = self._send(request)
+        return {"ticket": ticket, "price": result.price}
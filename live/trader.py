@@ -0,0 +1,237 @@
+import math
+import time
+import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
+import pandas as pd
+from data.data_process import add_bid_ask_columns
+from data.timeframes import timeframe_seconds
+from strategies.streaming import StreamingDonchian
+from backtest.profit_engine import calculate_lot_size_offline
+
+logger = logging.getLogger(__name__)
+
+# Pipeline stages timed for every processed bar, in order
+STAGES = ("detect", "signal", "size", "order")
+
+
+class LatencyRecorder:
+    """
+    Per-stage latency of the live loop: bar close -> detected -> signal updated -> order sized -> order sent (seconds)
+    """
+
+    def __init__(self):
+        self.records = []
+
+    def record(self, symbol, bar_time, stamps):
+        """
+        stamps: dict with 'close' (bar close wall time) and one wall time per reached stage
+        """
+        row = {"symbol": symbol, "bar_time": bar_time}
+        prev = stamps["close"]
+        for stage in STAGES:
+            if stage not in stamps:
+                break
+            row[stage] = stamps[stage] - prev
+            prev = stamps[stage]
+        row["total"] = prev - stamps["close"]
+        self.records.append(row)
+
+    def summary(self):
+        """
+        Return count / mean / p50 / p95 / max of every stage in a DataFrame
+        """
+        df = pd.DataFrame(self.records)
+        cols = [c for c in STAGES + ("total",) if c in df.columns]
+        if df.empty:
+            return pd.DataFrame()
+        return df[cols].describe(percentiles=[0.5, 0.95]).T[["count", "mean", "50%", "95%", "max"]]
+
+
+class LiveTrader:
+    """
+    Asyncio live loop running the Donchian strategy forward on several symbols.
+    Each symbol sleeps until its next bar close, polls the broker until the closed bar shows up, updates the
+    streaming channel and sends / closes orders through the broker. Open positions without a stop loss get the
+    channel stop with modify_position.
+    """
+
+    def __init__(self, broker, symbols, timeframe, lookback, initial_risk, risk_mode="FIXED_AMOUNT",
+                 version="v2", poll_interval=0.25, server_utc_offset=0, clock=time.time):
+        """
+        - broker: Broker implementation (FakeBroker, MT5Broker)
+        - symbols: list of symbols traded
+        - timeframe: MT5 timeframe constant or name
+        - lookback: Donchian lookback
+        - initial_risk: risk amount (FIXED_AMOUNT) or fraction of balance (PCT_BALANCE) per trade
+        - server_utc_offset: seconds to add to bar times (server time) to get UTC wall time
+        """
+        self.broker = broker
+        self.symbols = list(symbols)
+        self.timeframe = timeframe
+        self.tf_seconds = timeframe_seconds(timeframe)
+        self.lookback = lookback
+        self.risk = initial_risk
+        self.risk_mode = risk_mode
+        self.version = version
+        self.poll_interval = poll_interval
+        self.server_utc_offset = server_utc_offset
+        self.clock = clock
+
+        self.latency = LatencyRecorder()
+        self.events = []
+        self._channels = {}
+        self._last_bar = {}     # last bar fully processed (orders sent)
+        self._fed_bar = {}      # last bar fed to the channel, its row waits in _pending_row until its orders go through
+        self._pending_row = {}
+        self._pending_order = {}  # order state of the pending row: entered once its trade is opened (or skipped), ticket
+        self._specs = {}
+        # every broker call of every symbol runs on this one thread: the MT5 API is not documented as thread safe
+        self._broker_thread = ThreadPoolExecutor(max_workers=1, thread_name_prefix="broker")
+
+    def warm_up(self, symbol):
+        """
+        Feed closed history to the streaming channel so the first live bar already has a full window
+        """
+        spec = self.broker.get_symbol_spec(symbol)
+        self._specs[symbol] = spec
+        channel = StreamingDonchian(self.lookback, self.version)
+
+        raw = self.broker.get_closed_bars(symbol, self.timeframe, self.lookback * 2)
+        bars = add_bid_ask_columns(symbol, raw, digits=spec["digits"])
+        for _, row in bars.iterrows():
+            channel.update(row['bid_c'], row['real_spread'], row['time'])
+
+        # Strategy position follows what is really open at the broker (flat bot -> next breakout opens a trade)
+        open_sides = {pos['side'] for pos in self.broker.positions(symbol)}
+        channel.position = {frozenset(["BUY"]): 1, frozenset(["SELL"]): -1}.get(frozenset(open_sides), 0)
+
+        self._channels[symbol] = channel
+        self._last_bar[symbol] = bars['time'].iloc[-1] if len(bars) else None
+
+    def _bar_close_wall(self, bar_time):
+        return pd.Timestamp(bar_time).timestamp() + self.tf_seconds + self.server_utc_offset
+
+    def _new_bars(self, symbol):
+        """
+        Closed bars newer than the last processed one (bid/ask columns added)
+        """
+        last = self._last_bar[symbol]
+        # a few bars of margin, more if the loop fell behind (e.g. terminal reconnect)
+        behind = 0 if last is None else int(max(0.0, self.clock() - self._bar_close_wall(last)) // self.tf_seconds)
+        raw = self.broker.get_closed_bars(symbol, self.timeframe, 3 + behind)
+        bars = add_bid_ask_columns(symbol, raw, digits=self._specs[symbol]["digits"])
+        return bars if last is None else bars[bars['time'] > last]
+
+    def on_bar(self, symbol, bar, stamps):
+        """
+        Process one closed bar: update signal, size and send orders, give a stop loss to unprotected positions.
+        The bar only counts as processed once its orders went through: if the broker fails, the bar is not
+        marked and the next call with it retries the order step on the row already computed. A trade already opened
+        for the row is not sent again, only the steps after it are retried. Return the streaming row
+        """
+        if self._fed_bar.get(symbol) is not None and bar['time'] <= self._fed_bar[symbol]:
+            row = self._pending_row[symbol]
+        else:
+            row = self._channels[symbol].update(bar['bid_c'], bar['real_spread'], bar['time'])
+            self._fed_bar[symbol], self._pending_row[symbol] = bar['time'], row
+            self._pending_order[symbol] = {"entered": False, "ticket": None}
+        stamps["signal"] = self.clock()
+
+        if row['entry'] != 0 and not self._pending_order[symbol]["entered"]:
+            self._enter(symbol, bar, row, stamps)
+        self._protect(symbol, bar, row)
+
+        self._last_bar[symbol] = bar['time']
+        self.latency.record(symbol, bar['time'], stamps)
+        return row
+
+    def _enter(self, symbol, bar, row, stamps):
+        """
+        Size the new trade, close the opposite positions (reverse exit), then open it
+        """
+        side = "BUY" if row['entry'] == 1 else "SELL"
+        entry_price = bar['ask_c'] if side == "BUY" else bar['bid_c']
+        stop_loss = row['sl_buy'] if side == "BUY" else row['sl_sell']
+        lot = calculate_lot_size_offline(self._specs[symbol], entry_price, stop_loss,
+                                         self.broker.account_balance(), self.risk, self.risk_mode, side)
+        stamps["size"] = self.clock()
+
+        for pos in self.broker.positions(symbol):
+            if pos['side'] != side:
+                self.broker.close_position(pos['ticket'])
+                self.events.append({"symbol": symbol, "bar_time": bar['time'], "action": "close", "ticket": pos['ticket']})
+
+        if lot > 0:
+            pos = self.broker.open_position(symbol, side, lot, stop_loss)
+            self._pending_order[symbol] = {"entered": True, "ticket": pos['ticket']}
+            self.events.append({"symbol": symbol, "bar_time": bar['time'], "action": "open", "side": side,
+                                "lot": lot, "sl": stop_loss, "ticket": pos['ticket']})
+        else:
+            self._pending_order[symbol] = {"entered": True, "ticket": None}
+            logger.info("%s %s skipped: min volume risks more than allowed", symbol, side)
+        stamps["order"] = self.clock()
+
+    def _protect(self, symbol, bar, row):
+        """
+        Set the current channel stop (sl_buy / sl_sell of the row) on open positions without a stop loss,
+        e.g. positions found at the broker on restart or whose stop was removed by hand
+        """
+        for pos in self.broker.positions(symbol):
+            if pos['sl']:
+                continue
+            sl = row['sl_buy'] if pos['side'] == "BUY" else row['sl_sell']
+            if math.isnan(sl):
+                continue
+            self.broker.modify_position(pos['ticket'], sl)
+            self.events.append({"symbol": symbol, "bar_time": bar['time'], "action": "modify", "ticket": pos['ticket'],
+                                "sl": sl})
+
+    def process_new_bars(self, symbol):
+        """
+        Process the closed bars of symbol not processed yet, in order. On a broker error the failing bar stays
+        unprocessed (the error is raised) and is picked up again by the next call. Return the number of bars processed
+        """
+        new_bars = self._new_bars(symbol)
+        detected = self.clock()
+        for _, bar in new_bars.iterrows():
+            self.on_bar(symbol, bar, {"close": self._bar_close_wall(bar['time']), "detect": detected})
+        return len(new_bars)
+
+    async def _in_broker_thread(self, fn, *args):
+        return await asyncio.get_running_loop().run_in_executor(self._broker_thread, fn, *args)
+
+    async def watch_symbol(self, symbol, stop_event):
+        """
+        Bar scheduler of one symbol: sleep until the expected close of the next bar, then poll until it is published.
+        Broker calls are blocking (MT5 API), they run on the single broker thread: the symbols wait concurrently,
+        their broker calls run one at a time
+        """
+        if symbol not in self._channels:
+            await self._in_broker_thread(self.warm_up, symbol)
+
+        while not stop_event.is_set():
+            last = self._last_bar[symbol]
+            if last is not None:
+                wait = self._bar_close_wall(last) + self.tf_seconds - self.clock()
+                if wait > self.poll_interval:
+                    try:
+                        await asyncio.wait_for(stop_event.wait(), timeout=wait - self.poll_interval)
+                    except asyncio.TimeoutError:
+                        pass
+                    continue
+
+            try:
+                processed = await self._in_broker_thread(self.process_new_bars, symbol)
+            except Exception:
+                logger.exception("%s: failed to process the bar after %s, retrying", symbol, self._last_bar[symbol])
+                processed = 0
+            if processed == 0:
+                await asyncio.sleep(self.poll_interval)
+
+    async def run(self, stop_event=None):
+        """
+        Run all symbol watchers until stop_event is set
+        """
+        stop_event = stop_event or asyncio.Event()
+        await asyncio.gather(*(self.watch_symbol(symbol, stop_event) for symbol in self.symbols))
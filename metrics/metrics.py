@@ -1,6 +1,7 @@
 import pandas as pd
 import numpy as np
 from config.config import INITIAL_CAPITAL, RISK_FREE_RATE
+from backtest.profit_engine import money_per_lot
 
 
 def acc_balance_from_signals(signals_df, trade_df, initial_capital = INITIAL_CAPITAL,
@@ -42,6 +43,30 @@ def to_balance_daily(balance_series: pd.Series):
     return daily_balance
 
 
+def run_lengths(mask):
+    """ 
+    Lengths of every run of consecutive True values in a boolean array
+    """
+    mask = np.asarray(mask, dtype=bool)
+    edges = np.diff(np.concatenate([[0], mask.view(np.int8), [0]]))
+    return np.flatnonzero(edges == -1) - np.flatnonzero(edges == 1)
+
+
+def longest_streak(mask, profit_array):
+    """ 
+    Longest run of mask == 1 and the summed profit of that run (first run if several have the max length)
+    """
+    mask = np.asarray(mask, dtype=bool)
+    lengths = run_lengths(mask)
+    if len(lengths) == 0:
+        return 0, 0.0
+
+    k = int(np.argmax(lengths))
+    start = np.flatnonzero(np.diff(np.concatenate([[0], mask.view(np.int8)])) == 1)[k]
+    # cumsum adds sequentially like a running total
+    return int(lengths[k]), np.cumsum(profit_array[start:start + lengths[k]])[-1]
+
+
 def drawdown_stats(balance_series, return_dd_series=False):
     """ 
     Calculate drawdown statistics from balance series and return a dictionary of max DD, avg DD, max DD duration, avg DD duration
@@ -53,22 +78,13 @@ def drawdown_stats(balance_series, return_dd_series=False):
     dd_pct = dd * 100.0
 
     # Calculate durations of drawdowns
-    durations, cur = [], 0
-    for is_dd in (dd < 0).tolist():
-        if is_dd:
-            cur += 1
-        else:
-            if cur > 0:
-                durations.append(cur)
-            cur = 0
-    if cur > 0:
-        durations.append(cur)
+    durations = run_lengths((dd < 0).to_numpy())
 
     dd_stats = {
         'max_dd_pct': float(dd_pct.min()) if dd_pct.any() else 0.0,
         'avg_dd_pct': float(dd_pct[dd_pct < 0].mean()) if (dd_pct < 0).any() else 0.0,
-        'max_dd_duration_days': int(max(durations)) if durations else 0,
-        'avg_dd_duration_days': float(np.mean(durations)) if durations else 0.0
+        'max_dd_duration_days': int(durations.max()) if len(durations) else 0,
+        'avg_dd_duration_days': float(np.mean(durations)) if len(durations) else 0.0
     }
     if return_dd_series:
         return dd_stats, dd_pct
@@ -207,29 +223,32 @@ def performance_report(signals_df, trade_df, initial_capital=INITIAL_CAPITAL,
     
     # Conseutive wins/losses
     profit_ac_value = trade_df['profit_ac'].values
-    wins = (profit_ac_value > 0).astype(int)
-    losses = (profit_ac_value < 0).astype(int)
-
-    def longest_streak(mask, profit_array):
-        max_count, max_sum, cur_count, cur_sum = 0, 0.0, 0, 0.0
-        for i in range(len(profit_array)):
-            if mask[i] == 1:
-                cur_count += 1
-                cur_sum += profit_array[i]
-
-                if cur_count > max_count:
-                    max_count = cur_count
-                    max_sum = cur_sum
-            else:
-                cur_count, cur_sum = 0, 0.0 # reset value to 0
-        
-        return max_count, max_sum
+    win_streak, win_strak_profit = longest_streak(profit_ac_value > 0, profit_ac_value)
+    loss_streak, loss_streak_loss = longest_streak(profit_ac_value < 0, profit_ac_value)
+
+    report = _report_dict(start, end, duration_days, n,
+                          balance_final, balance_peak, net_profit, total_return, annualized_return, monthly_return,
+                          sharpe, sortino, dd_stats,
+                          winrate, best_trade, worst_trade, avg_trade, max_trade_dur_mins, avg_trade_dur_mins, profit_factor,
+                          long_winrate, long_profit, short_winrate, short_profit,
+                          win_streak, win_strak_profit, loss_streak, loss_streak_loss)
+
+    # Return report df, balance series and daily balance series for plotting
+    report_df = pd.DataFrame([report])
     
-    win_streak, win_strak_profit = longest_streak(wins, profit_ac_value)
-    loss_streak, loss_streak_loss = longest_streak(losses, profit_ac_value)
+    return report_df, balance_series, balance_daily
 
 
-    report = {
+def _report_dict(start, end, duration_days, n,
+                 balance_final, balance_peak, net_profit, total_return, annualized_return, monthly_return,
+                 sharpe, sortino, dd_stats,
+                 winrate, best_trade, worst_trade, avg_trade, max_trade_dur_mins, avg_trade_dur_mins, profit_factor,
+                 long_winrate, long_profit, short_winrate, short_profit,
+                 win_streak, win_strak_profit, loss_streak, loss_streak_loss):
+    """ 
+    Rounded report fields shared by performance_report and performance_report_fast
+    """
+    return {
         # --- Basic info ---
         "Start date": pd.to_datetime(start),
         "End date": pd.to_datetime(end),
@@ -274,7 +293,344 @@ def performance_report(signals_df, trade_df, initial_capital=INITIAL_CAPITAL,
         "Consecutive losses ($)": round(loss_streak_loss, 2)
     }
 
-    # Return report df, balance series and daily balance series for plotting
-    report_df = pd.DataFrame([report])
+
+# Nanoseconds per day, used to bucket datetime64[ns] values by calendar day
+_DAY_NS = 86_400_000_000_000
+
+
+def _sorted_order(values):
+    """ 
+    Order used by sort_index(): keep monotonic data as is, otherwise quicksort like pandas.
+    Sorted as datetime64 on purpose, NumPy picks another quicksort for int64 and ties would come out in a different order
+    """
+    if len(values) < 2 or np.all(values[1:] >= values[:-1]):
+        return None
+    return np.argsort(values.view('datetime64[ns]'), kind='quicksort')
+
+
+def _balance_arrays(sig_times, exit_times, acc_balance, initial_capital):
+    """ 
+    Array version of acc_balance_from_signals (left join on exit time, ffill).
+    Bars where several trades exit are repeated once per trade like the pandas join. Return (times, balance)
+    """
+    order = _sorted_order(sig_times)
+    if order is not None:
+        sig_times = sig_times[order]
+    order = _sorted_order(exit_times)
+    if order is not None:
+        exit_times, acc_balance = exit_times[order], acc_balance[order]
+
+    lo = np.searchsorted(exit_times, sig_times, side='left')
+    hi = np.searchsorted(exit_times, sig_times, side='right')
+    matches = hi - lo
+
+    if np.all(matches <= 1):
+        times = sig_times
+        values = np.where(matches == 1, acc_balance[np.minimum(lo, len(acc_balance) - 1)] if len(acc_balance) else np.nan, np.nan)
+    else:
+        rows = np.maximum(matches, 1)
+        row_sig = np.repeat(np.arange(len(sig_times)), rows)
+        offset = np.arange(len(row_sig)) - np.repeat(np.cumsum(rows) - rows, rows)
+        times = sig_times[row_sig]
+        values = np.where(matches[row_sig] > 0, acc_balance[np.minimum(lo[row_sig] + offset, len(acc_balance) - 1)], np.nan)
+
+    values = values.astype(float)
+    values[times == times[0]] = float(initial_capital)
+    # ffill
+    filled = np.where(np.isnan(values), 0, np.arange(len(values)))
+    values = values[np.maximum.accumulate(filled)]
+    return times, values
+
+
+def _daily_last(times, values):
+    """ 
+    Array version of to_balance_daily: last value of every calendar day, ffill days without bars. Return (days_ns, values)
+    """
+    day = times // _DAY_NS
+    last = np.flatnonzero(np.append(day[1:] != day[:-1], True))
+    days = np.arange(day[0], day[-1] + 1)
+
+    daily = np.full(len(days), np.nan)
+    daily[day[last] - day[0]] = values[last]
+    filled = np.where(np.isnan(daily), 0, np.arange(len(daily)))
+    return days * _DAY_NS, daily[np.maximum.accumulate(filled)]
+
+
+def _std(values):
+    """ 
+    Sample std computed like pandas (no bottleneck): NaN with less than 2 values
+    """
+    if len(values) < 2:
+        return np.nan
+    avg = values.sum() / len(values)
+    return float(np.sqrt(((avg - values) ** 2).sum() / (len(values) - 1)))
+
+
+def _sharpe_sortino_arrays(daily, rf_daily=RISK_FREE_RATE):
+    """ 
+    sharpe_sortino_from_balance on a daily balance array
+    """
+    rets = daily[1:] / daily[:-1] - 1
+    rets = rets[~np.isnan(rets)]
+    std = _std(rets)
+    if len(rets) == 0 or std == 0:
+        return 0.0, 0.0
+
+    excess_mean = (rets - rf_daily).sum() / len(rets)
+    sharpe = float(excess_mean / std * np.sqrt(252))
+
+    downside_std = _std(rets[rets < 0])
+    if np.sum(rets < 0) == 0 or downside_std == 0:
+        sortino = float('inf')
+    else:
+        sortino = float(excess_mean / downside_std * np.sqrt(252))
+    return sharpe, sortino
+
+
+def _drawdown_arrays(balance):
+    """ 
+    drawdown_stats on a balance array
+    """
+    dd_pct = (balance / np.maximum.accumulate(balance) - 1.0) * 100.0
+    under = dd_pct < 0
+    durations = run_lengths(under)
+    return {
+        'max_dd_pct': float(dd_pct.min()) if dd_pct.any() else 0.0,
+        'avg_dd_pct': float(dd_pct[under].sum() / under.sum()) if under.any() else 0.0,
+        'max_dd_duration_days': int(durations.max()) if len(durations) else 0,
+        'avg_dd_duration_days': float(np.mean(durations)) if len(durations) else 0.0
+    }
+
+
+# Equity curves accepted by performance_report_fast / grid_metrics
+EQUITY_MODES = ("realized", "mark_to_market")
+
+
+def _interval_sum(starts, ends, weights, n):
+    """ 
+    Sum of weights[k] over every bar of [starts[k], ends[k]) for all intervals at once (difference array + cumsum)
+    """
+    diff = np.bincount(starts, weights=weights, minlength=n + 1) - np.bincount(ends, weights=weights, minlength=n + 1)
+    return np.cumsum(diff[:n])
+
+
+def _mark_to_market_arrays(sig_times, bid_c, ask_c, trade_df, spec, initial_capital):
+    """ 
+    Equity of every bar: initial capital + closed trades profit_ac + unrealized PnL of the trades open on the bar.
+    Open trades are marked at bid_c (BUY) / ask_c (SELL) and net of their commission, from the entry bar up to the bar
+    before the exit, where the realized profit takes over. Overlapping trades (v1) simply add up.
+    """
+    n = len(sig_times)
+    equity = np.full(n, float(initial_capital))
+    if trade_df.empty:
+        return equity
+
+    entry_idx = np.searchsorted(sig_times, pd.to_datetime(trade_df['entry_time']).to_numpy().view(np.int64))
+    exit_idx = np.searchsorted(sig_times, pd.to_datetime(trade_df['exit_time']).to_numpy().view(np.int64))
+    equity += np.cumsum(np.bincount(exit_idx, weights=trade_df['profit_ac'].to_numpy(dtype=float), minlength=n)[:n])
+
+    is_buy = (trade_df['side'] == "BUY").to_numpy()
+    lots = trade_df['lot'].to_numpy(dtype=float)
+    entry_price = trade_df['entry_price'].to_numpy(dtype=float)
+    commission = trade_df['commission'].to_numpy(dtype=float)
+
+    if spec.get("account_currency") in (None, spec["currency_profit"]) or spec["tick_value_profit"] == spec["tick_value_loss"]:
+        # PnL is linear in the mark price: sum(coef * (mark - entry)) = mark * sum(coef) - sum(coef * entry)
+        value = float(money_per_lot(spec, "BUY", 0.0, 1.0))
+        unrealized = np.zeros(n)
+        for side, mark in ((is_buy, bid_c), (~is_buy, ask_c)):
+            coef = np.where(is_buy, 1.0, -1.0) * lots * value
+            coef_sum = _interval_sum(entry_idx[side], exit_idx[side], coef[side], n)
+            offset = _interval_sum(entry_idx[side], exit_idx[side], (coef * entry_price + commission)[side], n)
+            # cumsum leaves rounding residue once every interval is closed, keep exact zeros there
+            side_open = _interval_sum(entry_idx[side], exit_idx[side], np.ones(side.sum()), n) > 0.5
+            unrealized += np.where(side_open, coef_sum * mark - offset, 0.0)
+    else:
+        # tick value depends on the PnL sign: expand the (trade, bar) pairs of the open intervals
+        lengths = exit_idx - entry_idx
+        trade = np.repeat(np.arange(len(lots)), lengths)
+        bar = entry_idx[trade] + np.arange(len(trade)) - np.repeat(np.cumsum(lengths) - lengths, lengths)
+        mark = np.where(is_buy[trade], bid_c[bar], ask_c[bar])
+        pnl = money_per_lot(spec, np.where(is_buy[trade], 1, -1), entry_price[trade], mark) * lots[trade] - commission[trade]
+        unrealized = np.bincount(bar, weights=pnl, minlength=n)[:n]
+
+    return equity + unrealized
+
+
+def mark_to_market_balance(signals_df, trade_df, spec, initial_capital=INITIAL_CAPITAL,
+                           time_col='time', bid_col='bid_c', ask_col='ask_c'):
+    """ 
+    Return a Series of mark-to-market equity on every bar of signals_df (one value per bar),
+    counterpart of acc_balance_from_signals that also moves while trades are open.
     
-    return report_df, balance_series, balance_daily
\ No newline at end of file
+    spec: contract spec of the symbol (backtest.profit_engine.get_symbol_spec) used to value price moves
+    """
+    sig_times = pd.to_datetime(signals_df[time_col]).to_numpy().view(np.int64)
+    bid_c = signals_df[bid_col].to_numpy(dtype=float)
+    ask_c = signals_df[ask_col].to_numpy(dtype=float)
+    order = _sorted_order(sig_times)
+    if order is not None:
+        sig_times, bid_c, ask_c = sig_times[order], bid_c[order], ask_c[order]
+
+    equity = _mark_to_market_arrays(sig_times, bid_c, ask_c, trade_df, spec, initial_capital)
+    return pd.Series(equity, index=pd.DatetimeIndex(sig_times.view('datetime64[ns]'), name=time_col), name='acc_balance')
+
+
+def _equity_arrays(signals_df, trade_df, initial_capital, time_col, equity, spec):
+    """ 
+    (times, balance) arrays of the requested equity mode
+    """
+    if equity not in EQUITY_MODES:
+        raise ValueError(f"equity must be one of {EQUITY_MODES}, got {equity!r}")
+
+    if equity == "mark_to_market":
+        if spec is None:
+            raise ValueError("equity='mark_to_market' needs the symbol contract spec")
+        balance = mark_to_market_balance(signals_df, trade_df, spec, initial_capital, time_col=time_col)
+        return balance.index.to_numpy().view(np.int64), balance.to_numpy()
+
+    sig_times = pd.to_datetime(signals_df[time_col]).to_numpy().view(np.int64)
+    exit_times = pd.to_datetime(trade_df['exit_time']).to_numpy().view(np.int64)
+    return _balance_arrays(sig_times, exit_times, trade_df['acc_balance'].to_numpy(dtype=float), initial_capital)
+
+
+# Typed empty trade log standing in for a run without trades (backtests return a frame without columns then)
+_EMPTY_TRADES = {"entry_time": "datetime64[ns]", "exit_time": "datetime64[ns]", "side": object, "lot": float,
+                 "entry_price": float, "commission": float, "profit_ac": float, "acc_balance": float}
+
+
+def performance_report_fast(signals_df, trade_df, initial_capital=INITIAL_CAPITAL,
+                            start_date=None, end_date=None, time_col='time', as_dict=False, return_series=True,
+                            equity="realized", spec=None):
+    """ 
+    Fused, vectorized version of performance_report: every field is computed from NumPy arrays in one pass
+    (balance, daily resample, drawdown and streaks), with the same numbers as performance_report.
+    - as_dict: return the report as a plain dict instead of a one-row DataFrame
+    - return_series: build balance_series / balance_daily (set False in sweeps, None is returned instead)
+    - equity: "realized" (balance changes on exit times, like performance_report) or "mark_to_market"
+              (open trades valued on every bar, Sharpe / Sortino / drawdowns include open-trade swings)
+    - spec: contract spec of the symbol, required by "mark_to_market"
+    Without trades the balance stays at initial_capital and the report has Trades = 0, trade statistics at 0
+    """
+    sig_times = pd.to_datetime(signals_df[time_col]).to_numpy().view(np.int64)
+    if len(sig_times) == 0:
+        raise ValueError("Balance series is empty")
+    if trade_df.empty or 'profit_ac' not in trade_df:
+        trade_df = pd.DataFrame({col: pd.Series(dtype=dtype) for col, dtype in _EMPTY_TRADES.items()})
+
+    profit = trade_df['profit_ac'].to_numpy(dtype=float)
+    acc_balance = trade_df['acc_balance'].to_numpy(dtype=float)
+    entry_times = pd.to_datetime(trade_df['entry_time']).to_numpy().view(np.int64)
+    exit_times = pd.to_datetime(trade_df['exit_time']).to_numpy().view(np.int64)
+
+    times, balance = _equity_arrays(signals_df, trade_df, initial_capital, time_col, equity, spec)
+    days, daily = _daily_last(times, balance)
+
+    start = pd.to_datetime(start_date) if start_date else pd.Timestamp(days[0])
+    end = pd.to_datetime(end_date) if end_date else pd.Timestamp(days[-1])
+    duration_days = int((end-start).days)
+    years = max(duration_days/365.25, 1e-9)
+    months = max(duration_days/30.44, 1e-9)
+
+    # Return metrics
+    balance_final = float(daily[-1])
+    balance_peak = float(daily.max())
+    net_profit = balance_final - initial_capital
+
+    if balance_final <= 0:
+        total_return = -100.0
+        annualized_return = -100.0
+        monthly_return = -100.0
+    else:
+        total_return = (balance_final/initial_capital -1) * 100.0
+        annualized_return = ((balance_final/initial_capital) ** (1/years) -1) * 100.0
+        monthly_return = ((balance_final/initial_capital) ** (1/months) -1) * 100.0
+
+    # Risk metrics
+    sharpe, sortino = _sharpe_sortino_arrays(daily)
+    dd_stats = _drawdown_arrays(balance)
+
+    # Trade-level metrics
+    n = len(profit)
+    wins, losses = profit > 0, profit < 0
+
+    cap_before = acc_balance - profit
+    with np.errstate(divide='ignore', invalid='ignore'):
+        pct_ret = profit / np.where(cap_before == 0, np.nan, cap_before)
+    pct_ret = pct_ret[np.isfinite(pct_ret)] * 100.0
+
+    if n == 0:
+        winrate = best_trade = worst_trade = avg_trade = max_trade_dur_mins = avg_trade_dur_mins = 0.0
+    else:
+        winrate = float(wins.sum() / n * 100.0)
+        best_trade = float(np.nanmax(pct_ret))
+        worst_trade = float(np.nanmin(pct_ret))
+        avg_trade = float(np.nanmean(pct_ret))
+
+        dur_mins_trade = (exit_times - entry_times) / 1_000_000_000 / 60.0
+        max_trade_dur_mins = float(dur_mins_trade.max())
+        avg_trade_dur_mins = float(dur_mins_trade.sum() / n)
+
+    gross_profit = float(profit[wins].sum())
+    gross_loss = float(profit[losses].sum())
+    profit_factor = gross_profit / abs(gross_loss) if gross_loss != 0 else (float('inf') if n else 0.0)
+
+    # Long/Short stats
+    is_long = (trade_df['side'] == "BUY").to_numpy()
+    is_short = (trade_df['side'] == "SELL").to_numpy()
+
+    if is_long.any():
+        long_winrate = wins[is_long].mean() * 100.0
+        long_profit = profit[is_long].sum()
+    else:
+        long_winrate, long_profit = 0.0, 0.0
+
+    if is_short.any():
+        short_winrate = wins[is_short].mean() * 100.0
+        short_profit = profit[is_short].sum()
+    else:
+        short_winrate, short_profit = 0.0, 0.0
+
+    win_streak, win_strak_profit = longest_streak(wins, profit)
+    loss_streak, loss_streak_loss = longest_streak(losses, profit)
+
+    report = _report_dict(start, end, duration_days, n,
+                          balance_final, balance_peak, net_profit, total_return, annualized_return, monthly_return,
+                          sharpe, sortino, dd_stats,
+                          winrate, best_trade, worst_trade, avg_trade, max_trade_dur_mins, avg_trade_dur_mins, profit_factor,
+                          long_winrate, long_profit, short_winrate, short_profit,
+                          win_streak, win_strak_profit, loss_streak, loss_streak_loss)
+    if not as_dict:
+        report = pd.DataFrame([report])
+
+    if not return_series:
+        return report, None, None
+
+    # the pandas join drops the index name when exit times are duplicated
+    index_name = time_col if equity == "mark_to_market" or len(np.unique(exit_times)) == len(exit_times) else None
+    balance_series = pd.Series(balance, index=pd.DatetimeIndex(times.view('datetime64[ns]'), name=index_name), name='acc_balance')
+    balance_daily = pd.Series(daily, index=pd.DatetimeIndex(days.view('datetime64[ns]'), name=index_name, freq='D'), name='balance_daily')
+    return report, balance_series, balance_daily
+
+
+def grid_metrics(signals_df, trade_df, initial_capital=INITIAL_CAPITAL, time_col='time', equity="realized", spec=None):
+    """ 
+    Light version of performance_report for parameter sweeps: return (Sharpe ratio, Profit factor, Max DD (%))
+    rounded like the report. Return NaNs when there is no trade.
+    equity / spec: see performance_report_fast (signals_df needs bid_c / ask_c with "mark_to_market")
+    """
+    if trade_df.empty:
+        return np.nan, np.nan, np.nan
+
+    times, balance = _equity_arrays(signals_df, trade_df, initial_capital, time_col, equity, spec)
+    sharpe, _ = _sharpe_sortino_arrays(_daily_last(times, balance)[1])
+
+    dd_pct = (balance / np.maximum.accumulate(balance) - 1.0) * 100.0
+    max_dd_pct = float(dd_pct.min()) if dd_pct.any() else 0.0
+
+    profit = trade_df['profit_ac'].to_numpy(dtype=float)
+    gross_profit = float(profit[profit > 0].sum())
+    gross_loss = float(profit[profit < 0].sum())
+    profit_factor = gross_profit / abs(gross_loss) if gross_loss != 0 else float('inf')
+
+    return round(sharpe, 3), 0.0 if np.isinf(profit_factor) else round(profit_factor, 3), round(max_dd_pct, 2)
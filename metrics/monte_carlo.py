@@ -0,0 +1,158 @@
+import numpy as np
+import pandas as pd
+from config.config import INITIAL_CAPITAL
+
+
+# Ways of drawing a simulated trade sequence from the historical one
+MC_METHODS = ("bootstrap", "shuffle", "block")
+
+# Percentiles of the summary table
+MC_PERCENTILES = (5, 25, 50, 75, 95)
+
+
+def trade_r_multiples(trade_df, risk_per_trade, risk_mode):
+    """
+    Result of every trade in units of the money it risked (R), so it can be replayed with another sizing.
+    FIXED_AMOUNT: profit_ac / risk_per_trade, PCT_BALANCE: (profit_ac / balance before the trade) / risk_per_trade.
+    Lot rounding of the original backtest is kept in the R values
+    """
+    profit = trade_df['profit_ac'].to_numpy(dtype=float)
+    if risk_mode == 'FIXED_AMOUNT':
+        return profit / risk_per_trade
+    cap_before = trade_df['acc_balance'].to_numpy(dtype=float) - profit
+    return profit / cap_before / risk_per_trade
+
+
+def resample_indices(rng, n_trades, n_sims, method="bootstrap", block_size=10, length=None):
+    """
+    (n_sims, length) array of trade indices, one simulated sequence per row:
+    - "bootstrap": trades drawn independently with replacement
+    - "shuffle": permutation of the historical trades (same trades, other order; length is n_trades)
+    - "block": circular block bootstrap, runs of block_size consecutive trades keep losing / winning streaks together
+    """
+    length = n_trades if length is None else length
+    if method == "bootstrap":
+        return rng.integers(0, n_trades, (n_sims, length))
+    if method == "shuffle":
+        if length != n_trades:
+            raise ValueError("shuffle keeps the historical trade count, length must be None")
+        return rng.permuted(np.tile(np.arange(n_trades), (n_sims, 1)), axis=1)
+    if method == "block":
+        n_blocks = -(-length // block_size)
+        starts = rng.integers(0, n_trades, (n_sims, n_blocks, 1))
+        return ((starts + np.arange(block_size)) % n_trades).reshape(n_sims, -1)[:, :length]
+    raise ValueError(f"method must be one of {MC_METHODS}, got {method!r}")
+
+
+def balance_paths(r_multiples, initial_capital, risk_per_trade, risk_mode):
+    """
+    Balance after every trade of each row of r_multiples (2-D, one path per row) with the given sizing.
+    FIXED_AMOUNT adds R * risk_per_trade, PCT_BALANCE compounds (1 + R * risk_per_trade). First column is initial_capital
+    """
+    r_multiples = np.asarray(r_multiples, dtype=float)
+    start = np.full((r_multiples.shape[0], 1), float(initial_capital))
+    if risk_mode == 'FIXED_AMOUNT':
+        steps = np.cumsum(r_multiples * risk_per_trade, axis=1)
+        return np.hstack([start, initial_capital + steps])
+    steps = np.cumprod(1.0 + r_multiples * risk_per_trade, axis=1)
+    return np.hstack([start, initial_capital * steps])
+
+
+def _longest_runs(mask):
+    """
+    Longest run of True per row of a 2-D boolean array
+    """
+    if mask.shape[1] == 0:
+        return np.zeros(mask.shape[0], dtype=np.int64)
+    pos = np.arange(mask.shape[1])
+    last_false = np.maximum.accumulate(np.where(mask, -1, pos), axis=1)
+    return (pos - last_false).max(axis=1)
+
+
+def path_stats(balances, r_multiples, initial_capital, ruin_level):
+    """
+    Risk statistics of every balance path (rows of balance_paths). A path is ruined once its balance reaches ruin_level.
+    Return dict of 1-D arrays: final_equity, return_pct, max_dd_pct, max_dd_duration_trades, max_consecutive_losses, ruined
+    """
+    hit = balances <= ruin_level
+    ruined = hit.any(axis=1)
+    if ruined.any():
+        # a ruined account stops trading: balance frozen from the first touch
+        rows = np.flatnonzero(ruined)
+        first = hit[rows].argmax(axis=1)
+        frozen = np.arange(balances.shape[1]) >= first[:, None]
+        balances = balances.copy()
+        balances[rows] = np.where(frozen, balances[rows, first][:, None], balances[rows])
+
+    peak = np.maximum.accumulate(balances, axis=1)
+    dd = balances / peak - 1.0
+    final = balances[:, -1]
+    return {
+        "final_equity": final,
+        "return_pct": (final / initial_capital - 1.0) * 100.0,
+        "max_dd_pct": dd.min(axis=1) * 100.0,
+        "max_dd_duration_trades": _longest_runs(dd < 0),
+        "max_consecutive_losses": _longest_runs(r_multiples < 0),
+        "ruined": ruined,
+    }
+
+
+def monte_carlo(trade_df, risk_per_trade, risk_mode, initial_capital=INITIAL_CAPITAL, n_sims=10_000, method="bootstrap",
+                block_size=10, n_trades=None, sim_risk_per_trade=None, sim_risk_mode=None, ruin_pct=50.0, seed=None,
+                chunk_sims=2_000, return_balances=False):
+    """
+    Monte Carlo of the trade sequence of a backtest (trade_df from backtest_donchian_trades or the fast engine).
+    Trades are turned into R multiples with the sizing of the backtest (risk_per_trade, risk_mode), resampled
+    (see resample_indices) and replayed with sim_risk_per_trade / sim_risk_mode (default: the backtest sizing).
+    All paths of a chunk are computed at once as 2-D arrays (chunk_sims rows), so 10k+ paths take seconds.
+
+    Arguments:
+    - n_trades: trades per simulated path (bootstrap / block), default the historical count
+    - ruin_pct: loss from initial_capital (%) counted as ruin, the path stops trading when it is reached
+    - seed: random seed, same arguments and seed give the same paths
+    - return_balances: also return the (n_sims, n_trades + 1) balance array
+
+    Return dict:
+    - "paths": DataFrame of path_stats, one row per simulation
+    - "summary": mean and MC_PERCENTILES of every statistic
+    - "ruin_probability": share of ruined paths
+    - "historical": path_stats of the historical order (dict of scalars)
+    """
+    if method not in MC_METHODS:
+        raise ValueError(f"method must be one of {MC_METHODS}, got {method!r}")
+    if len(trade_df) == 0:
+        raise ValueError("trade_df has no trade")
+
+    sim_risk_per_trade = risk_per_trade if sim_risk_per_trade is None else sim_risk_per_trade
+    sim_risk_mode = risk_mode if sim_risk_mode is None else sim_risk_mode
+    ruin_level = initial_capital * (1.0 - ruin_pct / 100.0)
+
+    r = trade_r_multiples(trade_df, risk_per_trade, risk_mode)
+    rng = np.random.default_rng(seed)
+
+    parts, all_balances = [], []
+    for lo in range(0, n_sims, chunk_sims):
+        idx = resample_indices(rng, len(r), min(chunk_sims, n_sims - lo), method, block_size, n_trades)
+        sim_r = r[idx]
+        balances = balance_paths(sim_r, initial_capital, sim_risk_per_trade, sim_risk_mode)
+        parts.append(path_stats(balances, sim_r, initial_capital, ruin_level))
+        if return_balances:
+            all_balances.append(balances)
+
+    paths = pd.DataFrame({key: np.concatenate([p[key] for p in parts]) for key in parts[0]})
+    stats = paths.astype(float)
+    summary = pd.concat([stats.mean().rename("mean")] +
+                        [stats.quantile(q / 100.0).rename(f"p{q}") for q in MC_PERCENTILES], axis=1)
+
+    hist_balances = balance_paths(r[None, :], initial_capital, sim_risk_per_trade, sim_risk_mode)
+    historical = {key: value[0].item() for key, value in path_stats(hist_balances, r[None, :], initial_capital, ruin_level).items()}
+
+    result = {
+        "paths": paths,
+        "summary": summary,
+        "ruin_probability": float(paths["ruined"].mean()),
+        "historical": historical,
+    }
+    if return_balances:
+        result["balances"] = np.vstack(all_balances)
+    return result
@@ -1,10 +1,9 @@
 import pandas as pd
 from datetime import datetime
 from typing import Iterable, Dict, Tuple, Union, Optional
-import plotly.graph_objects as go
-from plotly.subplots import make_subplots
-from backtest.runner_v2 import run_backtest_for_symbol as run_backtest_for_symbol_v2
-from exporation.plotting_utils import apply_default_layout
+from optimization.sweep import prepare_bars, sweep_lookbacks, load_channel_index
+from optimization.parallel import parallel_sweep, parallel_cells, warm_bar_store
+from backtest.instrumentation import make_timer, aggregate_timings, NullTimer
 
 def grind_search_parameters(
     pairs: Union[str, Iterable[str]],
@@ -16,14 +15,43 @@ def grind_search_parameters(
     risk_per_trade: float = 0.01,
     risk_mode: str = "FIXED_AMOUNT",
     commission_per_lot: float = 0.0,
-    backtest_fn = run_backtest_for_symbol_v2,
+    backtest_fn = None,
     plot_charts: bool = True,
-) -> Tuple[pd.DataFrame, Dict[str, go.Figure]]:
+    bar_store = None,
+    symbol_specs: Optional[Dict[str, dict]] = None,
+    fast_sweep: bool = False,
+    strategy_version: str = "v2",
+    n_workers: int = 1,
+    equity: str = "realized",
+    instrument = None,
+    compact: bool = False,
+    result_cache = None,
+) -> Tuple[pd.DataFrame, Dict[str, "go.Figure"]]:
     
     """ 
     Grind search for optimal Donchian lookback parameters across multiple trading pairs.
+
+    backtest_fn: runner of one (pair, lookback) cell, default backtest.runner_v2.run_backtest_for_symbol
+
+    bar_store: optional BarStore, bars are fetched once and then served from disk for every cell
+    symbol_specs: optional {pair: contract spec} for terminal-free sizing / PnL
+    fast_sweep: load & prepare bars once per pair and evaluate all lookbacks on arrays (backtest_fn is not used),
+                strategy_version ("v1" / "v2") selects the signal logic in this mode
+    n_workers: number of worker processes (1 = serial). Results and grind_df are identical to the serial run;
+               with fast_sweep each worker loads a pair's bars once, otherwise backtest_fn must be picklable
+    equity: "realized" or "mark_to_market" equity curve behind Sharpe / Max DD (see metrics.performance_report_fast)
+    instrument: per-stage timing (see backtest.instrumentation.make_timer). Cells record the runner stages
+                (backtest_fn must accept instrument), fast sweeps record bar loading and sweeps. All records go to the sink
+                and their per-stage aggregate is stored in grind_df.attrs["stage_timings"]
+    compact: run cells with the compact bar layout (backtest_fn must accept compact), fast sweeps always use it
+    result_cache: optional backtest.result_cache.ResultCache shared by every cell / lookback (backtest_fn must accept
+                  result_cache). Computed cells are stored as they finish, a rerun of an interrupted grid only computes
+                  the missing ones and an unchanged grid is read back without backtesting
     """
 
+    if backtest_fn is None:
+        from backtest.runner_v2 import run_backtest_for_symbol as backtest_fn
+
     if isinstance(pairs, str):
         pairs = [pairs]
     pairs = list(pairs)
@@ -36,21 +64,82 @@ def grind_search_parameters(
 
         return sharpe, pf, dd
     
+    def extra_kwargs(pair):
+        """Only forward optional arguments that are set, custom backtest_fn may not accept them."""
+        kwargs = {}
+        if bar_store is not None:
+            kwargs["bar_store"] = bar_store
+        if symbol_specs is not None:
+            kwargs["symbol_spec"] = symbol_specs[pair]
+        if equity != "realized":
+            kwargs["equity"] = equity
+        if compact:
+            kwargs["compact"] = True
+        if result_cache is not None:
+            kwargs["result_cache"] = result_cache
+        return kwargs
+
+    lookbacks = list(lookbacks)
     grind_research = []
-    for pair in pairs:
-        for lb in lookbacks:
-            res = backtest_fn(
-                pair=pair,
-                timeframe=timeframe,
-                start_date=start_date,
-                end_date=end_date,
-                initial_capital=initial_capital,
-                risk_per_trade=risk_per_trade,
-                risk_mode=risk_mode,
-                commission_per_lot=commission_per_lot,
-                lookback=lb
-            )
-            rpt = res["report_df"]
+    timer = make_timer(instrument)
+    instrumented = not isinstance(timer, NullTimer)
+
+    if fast_sweep and n_workers > 1:
+        load_kwargs = dict(timeframe=timeframe, start_date=start_date, end_date=end_date, bar_store=bar_store)
+        sweep_kwargs = dict(initial_capital=initial_capital, risk_per_trade=risk_per_trade, risk_mode=risk_mode,
+                            commission_per_lot=commission_per_lot, strategy_version=strategy_version, equity=equity,
+                            result_cache=result_cache)
+        with timer.stage("parallel_sweep") as st:
+            grind_research = parallel_sweep(pairs, lookbacks, n_workers, load_kwargs, sweep_kwargs, symbol_specs=symbol_specs)
+            st["rows"] = len(grind_research)
+
+    elif fast_sweep:
+        for pair in pairs:
+            spec = symbol_specs[pair] if symbol_specs is not None else None
+            with timer.stage("prepare_bars") as st:
+                bars = prepare_bars(pair, timeframe, start_date, end_date, bar_store=bar_store, symbol_spec=spec)
+                channel_index = load_channel_index(bar_store, pair, timeframe, start_date, end_date, max(lookbacks) - 1)
+                st["rows"] = len(bars)
+            with timer.stage("sweep_lookbacks") as st:
+                grind_research.extend(sweep_lookbacks(pair, bars, lookbacks, initial_capital, risk_per_trade, risk_mode,
+                                                      commission_per_lot, strategy_version=strategy_version, symbol_spec=spec,
+                                                      channel_index=channel_index, equity=equity, result_cache=result_cache))
+                st["rows"] = len(bars) * len(lookbacks)
+
+    else:
+        cells = [(pair, lb) for pair in pairs for lb in lookbacks]
+        cell_kwargs = [dict(
+            pair=pair,
+            timeframe=timeframe,
+            start_date=start_date,
+            end_date=end_date,
+            initial_capital=initial_capital,
+            risk_per_trade=risk_per_trade,
+            risk_mode=risk_mode,
+            commission_per_lot=commission_per_lot,
+            lookback=lb,
+            **extra_kwargs(pair)
+        ) for pair, lb in cells]
+        if instrumented:
+            cell_kwargs = [dict(kwargs, instrument=True) for kwargs in cell_kwargs]
+
+        if n_workers > 1:
+            if bar_store is not None:
+                offline_store = warm_bar_store(bar_store, pairs, timeframe, start_date, end_date)
+                cell_kwargs = [dict(kwargs, bar_store=offline_store) for kwargs in cell_kwargs]
+            outputs = parallel_cells(backtest_fn, cell_kwargs, n_workers,
+                                     needs_terminal=bar_store is None or symbol_specs is None, with_timings=instrumented)
+        else:
+            outputs = [backtest_fn(**kwargs) for kwargs in cell_kwargs]
+            outputs = [(out["report_df"], out.get("timings", [])) if instrumented else out["report_df"] for out in outputs]
+
+        if instrumented:
+            reports = [report for report, _ in outputs]
+            timer.records.extend(record for _, timings in outputs for record in timings)
+        else:
+            reports = outputs
+
+        for (pair, lb), rpt in zip(cells, reports):
             sharpe, pf, dd = extract_metrics(rpt)
             grind_research.append({
                 "pair": pair, "lookback": lb,
@@ -58,9 +147,16 @@ def grind_search_parameters(
             })
 
     grind_df = pd.DataFrame(grind_research).set_index(["pair", "lookback"]).sort_index()
+    if instrumented:
+        grind_df.attrs["stage_timings"] = aggregate_timings(timer.flush())
 
-    figs: Dict[str, go.Figure] = {}
+    figs: Dict[str, "go.Figure"] = {}
     if plot_charts:
+        # plotly is only imported when charts are drawn, grid workers and headless runs never load it
+        import plotly.graph_objects as go
+        from plotly.subplots import make_subplots
+        from exporation.plotting_utils import apply_default_layout
+
         for pair in pairs:
             df_plot = grind_df.loc[pair].copy()
             if df_plot[["profit_factor", "sharpe", "max_dd_pct"]].isna().all(axis=None):
@@ -0,0 +1,103 @@
+import math
+from concurrent.futures import ProcessPoolExecutor
+from optimization.sweep import prepare_bars, sweep_lookbacks, load_channel_index
+
+
+# (bars, channel index or None) prepared inside a pool worker, key = pair. Filled once per worker process
+_WORKER_BARS = {}
+
+
+def _init_worker(needs_terminal):
+    """
+    Pool initializer: connect the worker process to MT5 when bars or specs come from the terminal
+    """
+    _WORKER_BARS.clear()
+    if needs_terminal:
+        import MetaTrader5 as mt5
+        if not mt5.initialize():
+            raise RuntimeError("MT5 is not initialized in worker process.")
+
+
+def _sweep_task(task):
+    """
+    Evaluate a chunk of lookbacks of one pair, bars (and their channel index when they come from a bar store)
+    are loaded the first time the worker sees the pair
+    """
+    pair, lookbacks, load_kwargs, sweep_kwargs, index_window = task
+    if pair not in _WORKER_BARS:
+        bars = prepare_bars(pair, **load_kwargs)
+        _WORKER_BARS[pair] = (bars, load_channel_index(load_kwargs.get("bar_store"), pair, load_kwargs["timeframe"],
+                                                       load_kwargs["start_date"], load_kwargs["end_date"], index_window))
+    bars, channel_index = _WORKER_BARS[pair]
+    return sweep_lookbacks(pair, bars, lookbacks, channel_index=channel_index, **sweep_kwargs)
+
+
+def _cell_task(task):
+    """
+    Run one (pair, lookback) cell with a full backtest function
+    """
+    backtest_fn, kwargs, with_timings = task
+    result = backtest_fn(**kwargs)
+    if with_timings:
+        return result["report_df"], result.get("timings", [])
+    return result["report_df"]
+
+
+def warm_bar_store(bar_store, pairs, timeframe, start_date, end_date, index_window=None):
+    """
+    Fetch and store the bars of every pair in this process before a pool starts, and their channel index when
+    index_window is given. Return the offline view of the store (BarStore.offline) to hand to the workers:
+    no two processes fetch the same pair or replace the same file, and workers need no MT5 connection for bars
+    """
+    for pair in pairs:
+        if index_window is None:
+            bar_store.get_rates(pair, timeframe, start_date, end_date)
+        else:
+            # get_channel_index reads the bars through get_rates
+            load_channel_index(bar_store, pair, timeframe, start_date, end_date, index_window)
+    return bar_store.offline()
+
+
+def _chunks(values, n_chunks):
+    size = max(1, math.ceil(len(values) / n_chunks))
+    return [values[i:i + size] for i in range(0, len(values), size)]
+
+
+def parallel_sweep(pairs, lookbacks, n_workers, load_kwargs, sweep_kwargs, symbol_specs=None):
+    """
+    Process-pool version of the fast sweep. Lookbacks of each pair are split in n_workers chunks,
+    results come back in (pair, lookback) submission order so the output does not depend on the worker count.
+
+    load_kwargs: prepare_bars() arguments except pair and symbol_spec (timeframe, start_date, end_date, bar_store)
+    sweep_kwargs: sweep_lookbacks() arguments except pair, bars, lookbacks and symbol_spec
+    """
+    lookbacks = list(lookbacks)
+    index_window = max(lookbacks) - 1
+    needs_terminal = load_kwargs.get("bar_store") is None or symbol_specs is None
+    if load_kwargs.get("bar_store") is not None:
+        load_kwargs = dict(load_kwargs, bar_store=warm_bar_store(load_kwargs["bar_store"], pairs, load_kwargs["timeframe"],
+                                                                 load_kwargs["start_date"], load_kwargs["end_date"],
+                                                                 index_window))
+
+    tasks = []
+    for pair in pairs:
+        spec = symbol_specs[pair] if symbol_specs is not None else None
+        for chunk in _chunks(lookbacks, n_workers):
+            tasks.append((pair, chunk, dict(load_kwargs, symbol_spec=spec), dict(sweep_kwargs, symbol_spec=spec), index_window))
+
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(needs_terminal,)) as pool:
+        chunk_results = list(pool.map(_sweep_task, tasks))
+
+    return [row for rows in chunk_results for row in rows]
+
+
+def parallel_cells(backtest_fn, cell_kwargs, n_workers, needs_terminal=True, with_timings=False):
+    """
+    Run full backtest cells in a process pool, return report DataFrames in cell_kwargs order
+    ((report_df, timings) tuples with with_timings=True).
+    backtest_fn must be importable at module level (picklable). Cells sharing a bar store should get it warmed first
+    (warm_bar_store), see grind_search_parameters
+    """
+    tasks = [(backtest_fn, kwargs, with_timings) for kwargs in cell_kwargs]
+    with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_worker, initargs=(needs_terminal,)) as pool:
+        return list(pool.map(_cell_task, tasks))
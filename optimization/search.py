@@ -0,0 +1,155 @@
+import math
+import itertools
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from strategies.donchian_strat import donchian_channels
+from metrics.metrics import grid_metrics
+from optimization.sweep import prepare_bars, lookback_trades
+from optimization.parallel import _init_worker
+from backtest.profit_engine import get_symbol_spec
+
+
+# Parameters a search space can vary, the others keep the fixed value given to search_parameters()
+SEARCH_PARAMS = ("lookback", "risk_per_trade", "risk_mode", "commission_per_lot", "sl_spread_mult", "strategy_version")
+SEARCH_METRICS = ("sharpe", "profit_factor", "max_dd_pct")
+SEARCH_METHODS = ("grid", "halving")
+
+# Bars / channels of the searched pair held by a pool worker, filled once by the initializer
+_SEARCH_DATA = {}
+
+
+def param_grid(space, defaults):
+    """
+    Cartesian product of space {name: values}, names missing from space take their value in defaults.
+    Return list of config dicts keyed by SEARCH_PARAMS
+    """
+    unknown = set(space) - set(SEARCH_PARAMS)
+    if unknown:
+        raise ValueError(f"Unknown search parameters {sorted(unknown)}, expected some of {SEARCH_PARAMS}")
+
+    names = list(space)
+    return [dict(defaults, **dict(zip(names, values))) for values in itertools.product(*(space[n] for n in names))]
+
+
+def halving_fractions(eta, min_fraction):
+    """
+    History fractions of the successive halving rungs: min_fraction * eta**k up to the full history (1.0)
+    """
+    if eta < 2:
+        raise ValueError("eta must be >= 2")
+    rungs = max(0, int(math.floor(math.log(1.0 / min_fraction, eta) + 1e-9)))
+    return [float(eta) ** -k for k in range(rungs, 0, -1)] + [1.0]
+
+
+def evaluate_config(pair, bars, channels, config, n_bars, initial_capital, symbol_spec=None, equity="realized",
+                    metric_spec=None):
+    """
+    Backtest one config on the first n_bars of bars and return config + grid metrics + trade count.
+    Channels are causal, so slices of the full-history channels equal channels computed on the slice alone.
+    symbol_spec sizes the trades (None = MT5), metric_spec values the mark-to-market equity (None = symbol_spec)
+    """
+    sub = bars.iloc[:n_bars]
+    dh, dl = channels[config["lookback"]]
+    trades = lookback_trades(pair, sub, dh[:n_bars], dl[:n_bars], initial_capital,
+                             config["risk_per_trade"], config["risk_mode"], config["commission_per_lot"],
+                             config["strategy_version"], symbol_spec, sl_spread_mult=config["sl_spread_mult"])
+
+    time_df = sub[['time']] if equity == "realized" else sub[['time', 'bid_c', 'ask_c']]
+    sharpe, pf, dd = grid_metrics(time_df, trades, initial_capital, equity=equity,
+                                  spec=symbol_spec if metric_spec is None else metric_spec)
+    return dict(config, sharpe=sharpe, profit_factor=pf, max_dd_pct=dd / 100.0, trades=len(trades))
+
+
+def _init_search_worker(needs_terminal, pair, bars, channels):
+    _init_worker(needs_terminal)
+    _SEARCH_DATA.update(pair=pair, bars=bars, channels=channels)
+
+
+def _search_task(task):
+    config, n_bars, initial_capital, symbol_spec, equity, metric_spec = task
+    return evaluate_config(_SEARCH_DATA["pair"], _SEARCH_DATA["bars"], _SEARCH_DATA["channels"],
+                           config, n_bars, initial_capital, symbol_spec, equity, metric_spec)
+
+
+def _rank(rows, metric):
+    """
+    Order of rows by metric, best first. NaN (no trade) last, ties keep the grid order
+    """
+    values = np.array([row[metric] for row in rows], dtype=float)
+    return np.lexsort((np.arange(len(values)), -np.nan_to_num(values, nan=-np.inf)))
+
+
+def search_parameters(pair, timeframe, start_date, end_date, space, initial_capital,
+                      lookback=50, risk_per_trade=0.01, risk_mode="FIXED_AMOUNT", commission_per_lot=0.0,
+                      sl_spread_mult=1.0, strategy_version="v2", metric="sharpe", method="grid",
+                      eta=3, min_fraction=1 / 27, bar_store=None, symbol_spec=None, equity="realized", n_workers=1):
+    """
+    Multi-dimensional parameter search of the Donchian strategy on one pair.
+
+    Arguments:
+    - space: {name: list of values} over any of SEARCH_PARAMS, e.g.
+             {"lookback": range(20, 310, 10), "risk_mode": ["FIXED_AMOUNT", "PCT_BALANCE"], "sl_spread_mult": [0.5, 1, 2]}
+             (risk_per_trade values must match the risk mode: amount for FIXED_AMOUNT, fraction for PCT_BALANCE)
+    - lookback ... strategy_version: fixed values of the parameters not in space
+    - metric: one of SEARCH_METRICS used to rank configs (higher is better, max_dd_pct is negative)
+    - method: "grid" evaluates every config on the full history.
+              "halving" (successive halving) evaluates all configs on the first min_fraction of the history,
+              keeps the best 1/eta, evaluates them on eta times more history, ... until the full history
+    - n_workers: evaluate configs in a process pool, bars and channels are sent once to every worker
+
+    Return dict:
+    - "results": configs evaluated on the full history with their metrics, best first
+    - "history": every evaluation with its rung, history fraction and slice end date
+    - "best": best config (dict) on the full history
+    """
+    if metric not in SEARCH_METRICS:
+        raise ValueError(f"metric must be one of {SEARCH_METRICS}, got {metric!r}")
+    if method not in SEARCH_METHODS:
+        raise ValueError(f"method must be one of {SEARCH_METHODS}, got {method!r}")
+
+    defaults = dict(lookback=lookback, risk_per_trade=risk_per_trade, risk_mode=risk_mode,
+                    commission_per_lot=commission_per_lot, sl_spread_mult=sl_spread_mult, strategy_version=strategy_version)
+    configs = param_grid(space, defaults)
+
+    bars = prepare_bars(pair, timeframe, start_date, end_date, bar_store=bar_store, symbol_spec=symbol_spec)
+    bars = bars.reset_index(drop=True)
+    channels = donchian_channels(bars['bid_c'].to_numpy(dtype=float), sorted({c["lookback"] for c in configs}))
+    metric_spec = symbol_spec if symbol_spec is not None or equity == "realized" else get_symbol_spec(pair)
+
+    # growing date slices from start_date, the last rung is the full history
+    fractions = halving_fractions(eta, min_fraction) if method == "halving" else [1.0]
+    first, last = bars['time'].iloc[0], bars['time'].iloc[-1]
+    slice_ends = [first + (last - first) * f for f in fractions]
+    n_bars = [len(bars) if f == 1.0 else int(np.searchsorted(bars['time'].to_numpy(), np.datetime64(e), side='right'))
+              for f, e in zip(fractions, slice_ends)]
+
+    pool = None
+    if n_workers > 1:
+        pool = ProcessPoolExecutor(max_workers=n_workers, initializer=_init_search_worker,
+                                   initargs=(symbol_spec is None, pair, bars, channels))
+
+    history, survivors = [], configs
+    try:
+        for rung, (fraction, end, n) in enumerate(zip(fractions, slice_ends, n_bars)):
+            tasks = [(config, n, initial_capital, symbol_spec, equity, metric_spec) for config in survivors]
+            if pool is not None:
+                rows = list(pool.map(_search_task, tasks, chunksize=max(1, len(tasks) // (n_workers * 4))))
+            else:
+                rows = [evaluate_config(pair, bars, channels, *task) for task in tasks]
+
+            history.extend(dict(row, rung=rung, fraction=fraction, slice_end=end) for row in rows)
+            order = _rank(rows, metric)
+            if rung < len(fractions) - 1:
+                survivors = [survivors[i] for i in order[:max(1, math.ceil(len(survivors) / eta))]]
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+    results = pd.DataFrame([rows[i] for i in order]).reset_index(drop=True)
+    return {
+        "pair": pair,
+        "results": results,
+        "history": pd.DataFrame(history),
+        "best": {name: results[name].iloc[0] for name in SEARCH_PARAMS},
+    }
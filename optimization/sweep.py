@@ -0,0 +1,104 @@
+import pandas as pd
+from data.data_process import get_data_from_mt5, add_bid_ask_columns
+from strategies.donchian_strat import donchian_channels, breakout_signal, ENTRY_FUNCTIONS
+from backtest.backtest import simulate_trades
+from metrics.metrics import grid_metrics
+from backtest.profit_engine import get_symbol_spec
+
+
+def prepare_bars(pair, timeframe, start_date, end_date, bar_store=None, symbol_spec=None, compact=True):
+    """ 
+    Load bars of pair once and add bid/ask columns. Return the bid/ask DataFrame used by every lookback of a sweep
+    (compact layout by default: sweeps only read time, real_spread, bid_l, bid_c, ask_h and ask_c)
+    """
+    if bar_store is not None:
+        raw = bar_store.get(pair, timeframe, start_date, end_date)
+    else:
+        raw = get_data_from_mt5(pair, timeframe, start_date, end_date)
+    digits = symbol_spec["digits"] if symbol_spec is not None else None
+    return add_bid_ask_columns(pair, raw, digits=digits, compact=compact)
+
+
+def load_channel_index(bar_store, pair, timeframe, start_date, end_date, max_window, price_col="close"):
+    """ 
+    Channel index of the prepare_bars() bars cached in the bar store (bid close = stored close), None without a bar store
+    """
+    if bar_store is None or max_window is None:
+        return None
+    return bar_store.get_channel_index(pair, timeframe, start_date, end_date, max_window, price_col=price_col)
+
+
+def lookback_trades(pair, bars, donchian_high, donchian_low, initial_capital, risk_per_trade, risk_mode,
+                    commission_per_lot=0.0, strategy_version="v2", symbol_spec=None,
+                    close_col_name='bid_c', spread_col='real_spread', sl_spread_mult=1.0):
+    """ 
+    Trades of one lookback on prepared bars from its channel arrays (aligned with bars).
+    The entry state machine starts flat on the first bar of bars.
+    sl_spread_mult: stop loss is placed sl_spread_mult * spread beyond the opposite channel (1.0 = strategy default)
+    """
+    close = bars[close_col_name].to_numpy(dtype=float)
+    spread = bars[spread_col].to_numpy(dtype=float)
+    cols = {col: bars[col].to_numpy() for col in ('time', 'bid_l', 'ask_h', 'bid_c', 'ask_c')}
+
+    entry, _ = ENTRY_FUNCTIONS[strategy_version](breakout_signal(close, donchian_high, donchian_low))
+    cols.update(entry=entry, sl_buy=donchian_low - sl_spread_mult * spread, sl_sell=donchian_high + sl_spread_mult * spread)
+    return simulate_trades(pair, cols, initial_capital, risk_per_trade, risk_mode, commission_per_lot, spec=symbol_spec)
+
+
+def sweep_lookbacks(pair, bars, lookbacks, initial_capital, risk_per_trade, risk_mode,
+                    commission_per_lot=0.0, strategy_version="v2", symbol_spec=None,
+                    close_col_name='bid_c', spread_col='real_spread', channel_index=None, equity="realized",
+                    channels=None, result_cache=None):
+    """ 
+    Evaluate many Donchian lookbacks on bars prepared once by prepare_bars().
+    Channels of all lookbacks are computed in one batch, signals / trades stay on arrays and only the grid metrics are returned.
+    
+    Return list of dicts {"pair", "lookback", "sharpe", "profit_factor", "max_dd_pct"} in lookbacks order,
+    same values as grind_search_parameters with run_backtest_for_symbol (NaN when a lookback has no trade)
+    channel_index: optional DonchianIndex of bars[close_col_name] to reuse (e.g. loaded from the bar store)
+    equity: "realized" or "mark_to_market" equity curve for Sharpe / Max DD
+    channels: optional precomputed {lookback: (donchian_high, donchian_low)} aligned with bars (e.g. slices of a longer history)
+    result_cache: optional backtest.result_cache.ResultCache, one entry per lookback keyed on the bars and every argument.
+                  Only the lookbacks missing from the cache are computed, so an interrupted sweep resumes where it stopped
+    """
+    lookbacks = list(lookbacks)
+    time_df = bars[['time']] if equity == "realized" else bars[['time', 'bid_c', 'ask_c']]
+    metric_spec = symbol_spec if symbol_spec is not None or equity == "realized" else get_symbol_spec(pair)
+
+    cached, keys = {}, {}
+    if result_cache is not None:
+        from backtest.result_cache import hash_frame
+        data_hash = hash_frame(bars)
+        params = dict(pair=pair, initial_capital=initial_capital, risk_per_trade=risk_per_trade, risk_mode=risk_mode,
+                      commission_per_lot=commission_per_lot, strategy_version=strategy_version, symbol_spec=symbol_spec,
+                      close_col_name=close_col_name, spread_col=spread_col, equity=equity)
+        for lb in lookbacks:
+            # given channels may come from a longer history than bars, they are part of the key
+            channel_hash = hash_frame(pd.DataFrame(dict(zip(("high", "low"), channels[lb])))) if channels is not None else None
+            keys[lb] = result_cache.key("sweep_lookback", data_hash, dict(params, lookback=lb, channels=channel_hash))
+            hit = result_cache.get(keys[lb])
+            if hit is not None:
+                cached[lb] = hit
+
+    missing = [lb for lb in lookbacks if lb not in cached]
+    if channels is None and missing:
+        channels = donchian_channels(bars[close_col_name].to_numpy(dtype=float), missing, channel_index=channel_index)
+
+    results = []
+    for lb in lookbacks:
+        if lb in cached:
+            results.append(cached[lb])
+            continue
+        dh, dl = channels[lb]
+        trades = lookback_trades(pair, bars, dh, dl, initial_capital, risk_per_trade, risk_mode, commission_per_lot,
+                                 strategy_version, symbol_spec, close_col_name, spread_col)
+        sharpe, pf, dd = grid_metrics(time_df, trades, initial_capital, equity=equity, spec=metric_spec)
+
+        results.append({
+            "pair": pair, "lookback": lb,
+            "sharpe": sharpe, "profit_factor": pf, "max_dd_pct": dd / 100.0
+        })
+        if result_cache is not None:
+            result_cache.put(keys[lb], results[-1], kind="sweep_lookback")
+
+    return results
@@ -0,0 +1,174 @@
+import numpy as np
+import pandas as pd
+from concurrent.futures import ProcessPoolExecutor
+from strategies.donchian_strat import donchian_channels
+from metrics.metrics import performance_report_fast
+from optimization.sweep import prepare_bars, sweep_lookbacks, lookback_trades
+from optimization.parallel import _init_worker
+from backtest.profit_engine import get_symbol_spec
+
+
+# Metrics a train window can be ranked by (higher is better, max_dd_pct is negative)
+WF_METRICS = ("sharpe", "profit_factor", "max_dd_pct")
+
+# Full bars / channels of the walk-forward held by a pool worker, filled once by the initializer
+_WF_DATA = {}
+
+
+def _as_offset(period):
+    """
+    "180D" / "12h" strings become Timedeltas, pd.DateOffset(months=6) etc. are used as is
+    """
+    return pd.Timedelta(period) if isinstance(period, str) else period
+
+
+def walk_forward_windows(start_date, end_date, train_period, test_period, step=None, anchored=False):
+    """
+    Generate train/test windows between start_date and end_date.
+    Test windows follow each other every `step` (default test_period), train covers the train_period before the test
+    (anchored=True: train always starts at start_date and grows). The last test window is cut at end_date.
+
+    Return DataFrame with columns window, train_start, train_end, test_start, test_end (end dates exclusive)
+    """
+    start, end = pd.Timestamp(start_date), pd.Timestamp(end_date)
+    train_period, test_period = _as_offset(train_period), _as_offset(test_period)
+    step = test_period if step is None else _as_offset(step)
+
+    windows = []
+    test_start = start + train_period
+    while test_start < end:
+        windows.append({
+            "window": len(windows),
+            "train_start": start if anchored else test_start - train_period,
+            "train_end": test_start,
+            "test_start": test_start,
+            "test_end": min(test_start + test_period, end),
+        })
+        test_start = test_start + step
+
+    return pd.DataFrame(windows, columns=["window", "train_start", "train_end", "test_start", "test_end"])
+
+
+def _train_window(pair, bars, channels, lo, hi, lookbacks, sweep_kwargs):
+    """
+    Grid metrics of every lookback on bars[lo:hi], channels are sliced from the full history
+    """
+    window_channels = {lb: (dh[lo:hi], dl[lo:hi]) for lb, (dh, dl) in channels.items()}
+    return sweep_lookbacks(pair, bars.iloc[lo:hi], lookbacks, channels=window_channels, **sweep_kwargs)
+
+
+def _init_wf_worker(needs_terminal, pair, bars, channels):
+    _init_worker(needs_terminal)
+    _WF_DATA.update(pair=pair, bars=bars, channels=channels)
+
+
+def _train_task(task):
+    lo, hi, lookbacks, sweep_kwargs = task
+    return _train_window(_WF_DATA["pair"], _WF_DATA["bars"], _WF_DATA["channels"], lo, hi, lookbacks, sweep_kwargs)
+
+
+def _best_lookback(rows, metric):
+    """
+    Lookback with the highest metric on the train window (None when no lookback traded)
+    """
+    df = pd.DataFrame(rows).set_index("lookback")[metric]
+    return None if df.isna().all() else int(df.idxmax())
+
+
+def walk_forward(pair, timeframe, start_date, end_date, lookbacks, train_period, test_period,
+                 initial_capital, risk_per_trade, risk_mode="FIXED_AMOUNT", commission_per_lot=0.0,
+                 strategy_version="v2", metric="sharpe", anchored=False, step=None,
+                 bar_store=None, symbol_spec=None, equity="realized", n_workers=1):
+    """
+    Walk-forward optimization of the Donchian lookback on one pair.
+    Bars are loaded once for the whole range and the channels of all lookbacks are computed once on the full history,
+    every window then works on slices (channel values at the start of a window already include the previous bars).
+    Train windows are swept in a process pool (n_workers > 1), the best lookback by `metric` is then traded on the
+    following test window, one window after the other so the out-of-sample balance carries over.
+    The entry state machine restarts flat at the start of every window and open trades are closed at its end.
+
+    Arguments:
+    - train_period / test_period / step: "365D" like strings or pd.DateOffset, see walk_forward_windows()
+    - metric: one of WF_METRICS used to pick the lookback of each train window
+    - anchored: expanding train windows starting at start_date instead of rolling ones
+    - equity: "realized" or "mark_to_market" equity curve for metrics (see metrics.performance_report_fast)
+
+    Return dict:
+    - "windows": one row per window with the chosen lookback, its train metric and the test trades count
+    - "train_results": metrics of every (window, lookback)
+    - "trades": out-of-sample trades of all test windows with a continuous acc_balance
+    - "report_df", "balance_series", "balance_daily": report of the stitched out-of-sample equity
+    """
+    if metric not in WF_METRICS:
+        raise ValueError(f"metric must be one of {WF_METRICS}, got {metric!r}")
+
+    lookbacks = list(lookbacks)
+    windows = walk_forward_windows(start_date, end_date, train_period, test_period, step=step, anchored=anchored)
+    if windows.empty:
+        raise ValueError("No walk-forward window fits between start_date and end_date")
+    if (windows["test_start"].iloc[1:].to_numpy() < windows["test_end"].iloc[:-1].to_numpy()).any():
+        raise ValueError("step must not be shorter than test_period, test windows would overlap")
+
+    bars = prepare_bars(pair, timeframe, windows["train_start"].min(), windows["test_end"].max(),
+                        bar_store=bar_store, symbol_spec=symbol_spec)
+    bars = bars.reset_index(drop=True)
+    channels = donchian_channels(bars['bid_c'].to_numpy(dtype=float), lookbacks)
+
+    times = bars['time'].to_numpy()
+    bounds = {col: np.searchsorted(times, windows[col].to_numpy(dtype='datetime64[ns]'))
+              for col in ("train_start", "train_end", "test_start", "test_end")}
+
+    trade_kwargs = dict(risk_per_trade=risk_per_trade, risk_mode=risk_mode, commission_per_lot=commission_per_lot,
+                        strategy_version=strategy_version, symbol_spec=symbol_spec)
+    sweep_kwargs = dict(trade_kwargs, initial_capital=initial_capital, equity=equity)
+    tasks = [(lo, hi, lookbacks, sweep_kwargs) for lo, hi in zip(bounds["train_start"], bounds["train_end"])]
+
+    if n_workers > 1:
+        with ProcessPoolExecutor(max_workers=n_workers, initializer=_init_wf_worker,
+                                 initargs=(symbol_spec is None, pair, bars, channels)) as pool:
+            train_rows = list(pool.map(_train_task, tasks))
+    else:
+        train_rows = [_train_window(pair, bars, channels, *task) for task in tasks]
+
+    # Out-of-sample: best train lookback on each test window, balance carried from one window to the next
+    capital = float(initial_capital)
+    oos_trades, summary = [], []
+    for w, rows in enumerate(train_rows):
+        best = _best_lookback(rows, metric)
+        lo, hi = bounds["test_start"][w], bounds["test_end"][w]
+
+        trades = pd.DataFrame([])
+        if best is not None and hi > lo:
+            dh, dl = channels[best]
+            trades = lookback_trades(pair, bars.iloc[lo:hi], dh[lo:hi], dl[lo:hi], capital, **trade_kwargs)
+        if not trades.empty:
+            oos_trades.append(trades)
+            capital = float(trades['acc_balance'].iloc[-1])
+
+        summary.append({
+            "best_lookback": best,
+            f"train_{metric}": next((r[metric] for r in rows if r["lookback"] == best), np.nan),
+            "test_trades": len(trades),
+            "test_end_balance": capital,
+        })
+
+    windows = pd.concat([windows, pd.DataFrame(summary)], axis=1)
+    train_results = pd.DataFrame([dict(row, window=w) for w, rows in enumerate(train_rows) for row in rows])
+    trades = pd.concat(oos_trades, ignore_index=True) if oos_trades else pd.DataFrame([])
+
+    oos_bars = pd.concat([bars.iloc[lo:hi] for lo, hi in zip(bounds["test_start"], bounds["test_end"])])
+    report_df, balance_series, balance_daily = None, None, None
+    if not trades.empty:
+        report_df, balance_series, balance_daily = performance_report_fast(
+            oos_bars, trades, initial_capital, windows["test_start"].iloc[0], windows["test_end"].iloc[-1],
+            equity=equity, spec=symbol_spec if symbol_spec is not None or equity == "realized" else get_symbol_spec(pair))
+
+    return {
+        "pair": pair,
+        "windows": windows,
+        "train_results": train_results,
+        "trades": trades,
+        "report_df": report_df,
+        "balance_series": balance_series,
+        "balance_daily": balance_daily,
+    }
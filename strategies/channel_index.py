@@ -0,0 +1,86 @@
+import numpy as np
+
+
+class DonchianIndex:
+    """
+    Sparse table of range max / min over a price series, built once in O(n log W).
+    Donchian high/low of any lookback (<= max_window + 1) is then answered with two array slices instead of a rolling pass.
+    """
+
+    def __init__(self, prices, max_window=None, _tables=None):
+        prices = np.asarray(prices, dtype=float)
+        self.n = len(prices)
+        self.max_window = int(max_window) if max_window else max(self.n, 1)
+
+        if _tables is not None:
+            self._max, self._min = _tables
+            return
+
+        # level k holds max/min of prices[i : i + 2**k]
+        self._max, self._min = [prices], [prices]
+        span = 1
+        while span * 2 <= min(self.max_window, self.n):
+            prev_max, prev_min = self._max[-1], self._min[-1]
+            self._max.append(np.maximum(prev_max[:-span], prev_max[span:]))
+            self._min.append(np.minimum(prev_min[:-span], prev_min[span:]))
+            span *= 2
+
+    def _rolling(self, tables, op, window):
+        """
+        Equivalent of pandas rolling(window).max()/min(): value at t covers [t-window+1, t], NaN for t < window-1
+        """
+        out = np.full(self.n, np.nan)
+        if window > self.n:
+            return out
+
+        k = int(np.floor(np.log2(window)))
+        table, span = tables[k], 2 ** k
+        out[window - 1:] = op(table[:self.n - window + 1], table[window - span:self.n - span + 1])
+        return out
+
+    def window_max(self, window):
+        self._check(window)
+        return self._rolling(self._max, np.maximum, window)
+
+    def window_min(self, window):
+        self._check(window)
+        return self._rolling(self._min, np.minimum, window)
+
+    def _check(self, window):
+        if window < 1:
+            raise ValueError("Donchian lookback must be >= 2")
+        if self.max_window < window <= self.n:
+            raise ValueError(f"Window {window} is larger than max_window {self.max_window} of the index")
+
+    def channel(self, lookback):
+        """
+        Return (donchian_high, donchian_low) arrays, same as rolling(window=lookback-1).max()/min().shift(1)
+        """
+        window = lookback - 1
+        high, low = np.full(self.n, np.nan), np.full(self.n, np.nan)
+        high[1:] = self.window_max(window)[:-1]
+        low[1:] = self.window_min(window)[:-1]
+        return high, low
+
+    def channels(self, lookbacks):
+        """
+        Return dict {lookback: (donchian_high, donchian_low)} for many lookbacks
+        """
+        return {lookback: self.channel(lookback) for lookback in lookbacks}
+
+    def save(self, file_path, **extra):
+        """
+        Save the index tables in a .npz file (e.g. next to the cached bars).
+        extra: values stored along the tables, e.g. what the index was built on (ignored by load)
+        """
+        arrays = {f"hi_{k}": table for k, table in enumerate(self._max)}
+        arrays.update({f"lo_{k}": table for k, table in enumerate(self._min)})
+        np.savez(file_path, n=self.n, max_window=self.max_window, **extra, **arrays)
+
+    @classmethod
+    def load(cls, file_path):
+        with np.load(file_path) as data:
+            levels = sum(1 for key in data.files if key.startswith("hi_"))
+            tables = ([data[f"hi_{k}"] for k in range(levels)], [data[f"lo_{k}"] for k in range(levels)])
+            index = cls(data["hi_0"], max_window=int(data["max_window"]), _tables=tables)
+        return index
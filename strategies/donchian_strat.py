@@ -1,28 +1,31 @@
 import numpy as np
 import pandas as pd
-import MetaTrader5 as mt5
 import datetime as dt
+from strategies.channel_index import DonchianIndex
 
 
-def donchian_breakout_channel_v1(df, lookback = 50, close_col_name='bid_c', spread_col='real_spread'):
+def donchian_breakout_channel_v1(df, lookback = 50, close_col_name='bid_c', spread_col='real_spread', channel_index=None,
+                                 compact=False):
     """ 
     Generates Donchian Channel breakout signals and stop-loss levels
+    channel_index: optional DonchianIndex built on df[close_col_name], reused instead of a rolling pass
+    compact: store signal / entry / position as int8 instead of int64
     """
+    int_type = np.int8 if compact else int
     
-    df['donchian_high'] = df[close_col_name].rolling(window=lookback -1).max().shift(1)
-    df['donchian_low'] = df[close_col_name].rolling(window=lookback -1).min().shift(1)
+    df['donchian_high'], df['donchian_low'] = donchian_columns(df, lookback, close_col_name, channel_index)
 
     df['signal'] = 0
     df.loc[df[close_col_name] > df['donchian_high'], 'signal'] = 1
     df.loc[df[close_col_name] < df['donchian_low'], 'signal'] = -1
-    df['signal'] = df['signal'].ffill().fillna(0).astype(int)
+    df['signal'] = df['signal'].ffill().fillna(0).astype(int_type)
 
     # Store entry value
     s = df['signal']
-    df['entry'] = np.where(( s!= 0 ) & (s != s.shift(1)), s, 0).astype(int)
+    df['entry'] = np.where(( s!= 0 ) & (s != s.shift(1)), s, 0).astype(int_type)
 
     # Store current position
-    df['position'] = df['entry'].replace(0, np.nan).ffill().fillna(0).astype(int)
+    df['position'] = df['entry'].replace(0, np.nan).ffill().fillna(0).astype(int_type)
 
     # Add Stop Loss
     spread_tick = df[spread_col]
@@ -32,51 +35,109 @@ def donchian_breakout_channel_v1(df, lookback = 50, close_col_name='bid_c', spre
     return df
 
 
-def donchian_breakout_channel_v2(df, lookback=50, close_col_name='bid_c', spread_col='real_spread'):
+def donchian_breakout_channel_v2(df, lookback=50, close_col_name='bid_c', spread_col='real_spread', channel_index=None,
+                                 compact=False):
     """
     Donchian breakout v2: only open 1 position at a time
+    channel_index: optional DonchianIndex built on df[close_col_name], reused instead of a rolling pass
+    compact: store signal_raw / entry / position as int8 instead of int64
     """
-    df = df.copy()
+    int_type = np.int8 if compact else int
+    # Shallow copy: the input frame is not modified and its OHLC columns are shared, not copied
+    df = df.copy(deep=False)
 
-    dh = df[close_col_name].rolling(window=lookback-1).max().shift(1)
-    dl = df[close_col_name].rolling(window=lookback-1).min().shift(1)
+    dh, dl = donchian_columns(df, lookback, close_col_name, channel_index)
     df['donchian_high'] = dh
     df['donchian_low']  = dl
 
     # 2) Tín hiệu thô của NẾN HIỆN TẠI (không ffill)
     #    +1: close > dh, -1: close < dl, 0: còn lại
-    sig_raw = np.where(df[close_col_name] > df['donchian_high'],  1,
-               np.where(df[close_col_name] < df['donchian_low'],  -1, 0))
-    df['signal_raw'] = sig_raw
+    sig_raw = breakout_signal(df[close_col_name].to_numpy(), dh.to_numpy(), dl.to_numpy())
+    df['signal_raw'] = sig_raw.astype(int_type, copy=False)
 
     # 3) Sinh entry & position theo state machine để tránh vào chồng lệnh
-    entry = np.zeros(len(df), dtype=int)
-    position = np.zeros(len(df), dtype=int)  # -1/0/1
-
-    for i in range(len(df)):
-        s = sig_raw[i]          # breakout ở nến hiện tại (có thể 0)
-        pos_prev = position[i-1] if i > 0 else 0
-
-        if pos_prev == 0:
-            # đang flat: chỉ vào nếu có breakout (±1)
-            if s != 0:
-                entry[i] = s
-                position[i] = s
-            else:
-                position[i] = 0
-        else:
-            # đang có vị thế: chỉ vào khi breakout đảo chiều
-            if s != 0 and s == -pos_prev:
-                entry[i] = s
-                position[i] = s    # đảo chiều luôn
-            else:
-                position[i] = pos_prev  # giữ nguyên, KHÔNG vào thêm cùng chiều
-
-    df['entry'] = entry.astype(int)
-    df['position'] = position.astype(int)
+    entry, position = entries_v2(sig_raw)
+
+    df['entry'] = entry.astype(int_type, copy=False)
+    df['position'] = position.astype(int_type, copy=False)
 
     spread_tick = df[spread_col].astype(float)
     df['sl_buy']  = df['donchian_low']  - spread_tick
     df['sl_sell'] = df['donchian_high'] + spread_tick
 
-    return df
\ No newline at end of file
+    return df
+
+
+def donchian_columns(df, lookback, close_col_name='bid_c', channel_index=None):
+    """ 
+    Donchian high/low Series of df: max/min of the previous lookback-1 closes
+    """
+    if channel_index is None:
+        window = df[close_col_name].rolling(window=lookback - 1)
+        return window.max().shift(1), window.min().shift(1)
+
+    dh, dl = channel_index.channel(lookback)
+    return pd.Series(dh, index=df.index), pd.Series(dl, index=df.index)
+
+
+def donchian_channels(close, lookbacks, channel_index=None):
+    """ 
+    Donchian high/low (previous lookback-1 bars) of a close price array for many lookbacks in one call.
+    The range index is built once (or reused) and every lookback is sliced out of it.
+    Return dict {lookback: (donchian_high, donchian_low)} of float arrays, same values as the v1/v2 columns
+    """
+    lookbacks = list(lookbacks)
+    if channel_index is None:
+        channel_index = DonchianIndex(close, max_window=max(lookbacks) - 1)
+    return channel_index.channels(lookbacks)
+
+
+def breakout_signal(close, donchian_high, donchian_low):
+    """ 
+    Raw breakout of the current bar: +1 close > donchian high, -1 close < donchian low, 0 otherwise
+    """
+    return np.where(close > donchian_high, 1, np.where(close < donchian_low, -1, 0))
+
+
+def entries_v1(signal):
+    """ 
+    Version 1 entry/position arrays from raw signal: enter on every new breakout, same direction allowed
+    """
+    if len(signal) == 0:
+        return np.zeros(0, dtype=int), np.zeros(0, dtype=int)
+
+    prev = np.empty_like(signal)
+    prev[0], prev[1:] = 0, signal[:-1]
+    # first bar compares against NaN in the DataFrame version -> entry whenever signal != 0
+    changed = signal != prev
+    changed[0] = True
+    entry = np.where((signal != 0) & changed, signal, 0).astype(int)
+    position = entry[_last_nonzero_index(entry)]
+    return entry, position
+
+
+def entries_v2(signal):
+    """ 
+    Version 2 entry/position arrays from raw signal: one position at a time, only reverse on opposite breakout.
+    Once a position is open it is never flat again, so position = last non-zero breakout and an entry is every position change
+    """
+    signal = np.asarray(signal)
+    position = signal[_last_nonzero_index(signal)].astype(int)
+
+    prev = np.zeros_like(position)
+    prev[1:] = position[:-1]
+    entry = np.where(position != prev, position, 0).astype(int)
+
+    return entry, position
+
+
+def _last_nonzero_index(values):
+    """ 
+    Index of the last non-zero value up to each bar (0 before the first one)
+    """
+    idx = np.where(values != 0, np.arange(len(values)), 0)
+    return np.maximum.accumulate(idx) if len(idx) else idx
+
+
+# Array version of the signal functions keyed by strategy version
+ENTRY_FUNCTIONS = {"v1": entries_v1, "v2": entries_v2}
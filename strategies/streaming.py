@@ -0,0 +1,102 @@
+import math
+from collections import deque
+import pandas as pd
+
+
+class StreamingDonchian:
+    """
+    Incremental Donchian channel fed one closed bar at a time (O(1) amortized per bar with monotonic deques).
+    Keep the v1 / v2 entry & position state and SL levels, outputs match donchian_breakout_channel_v1 / v2 on the same history.
+    """
+
+    def __init__(self, lookback=50, version="v2"):
+        if lookback < 2:
+            raise ValueError("Donchian lookback must be >= 2")
+        if version not in ("v1", "v2"):
+            raise ValueError("version must be 'v1' or 'v2'")
+
+        self.lookback = lookback
+        self.window = lookback - 1
+        self.version = version
+
+        self._max_q = deque()   # (bar number, price), prices decreasing
+        self._min_q = deque()   # (bar number, price), prices increasing
+        self._last_nan = -1     # bar number of the last NaN close (rolling max/min is NaN while it is in the window)
+        self._count = 0
+
+        self.prev_signal = None
+        self.position = 0
+
+    def _channel(self):
+        """
+        Donchian high/low over the previous `window` bars
+        """
+        i = self._count
+        if i < self.window or self._last_nan >= i - self.window:
+            return math.nan, math.nan
+
+        start = i - self.window
+        while self._max_q[0][0] < start:
+            self._max_q.popleft()
+        while self._min_q[0][0] < start:
+            self._min_q.popleft()
+        return self._max_q[0][1], self._min_q[0][1]
+
+    def _push(self, close):
+        i = self._count
+        if math.isnan(close):
+            self._last_nan = i
+        else:
+            while self._max_q and self._max_q[-1][1] <= close:
+                self._max_q.pop()
+            self._max_q.append((i, close))
+            while self._min_q and self._min_q[-1][1] >= close:
+                self._min_q.pop()
+            self._min_q.append((i, close))
+        self._count += 1
+
+    def update(self, close, spread, time=None):
+        """
+        Ingest one closed bar and return its row: time, donchian_high, donchian_low, signal, entry, position, sl_buy, sl_sell
+        """
+        close = float(close)
+        dh, dl = self._channel()
+
+        if close > dh:
+            signal = 1
+        elif close < dl:
+            signal = -1
+        else:
+            signal = 0
+
+        if self.version == "v1":
+            changed = self.prev_signal is None or signal != self.prev_signal
+            entry = signal if (signal != 0 and changed) else 0
+            if entry != 0:
+                self.position = entry
+        else:
+            entry = signal if (signal != 0 and signal != self.position) else 0
+            if entry != 0:
+                self.position = entry
+
+        self.prev_signal = signal
+        self._push(close)
+
+        return {
+            "time": time,
+            "donchian_high": dh,
+            "donchian_low": dl,
+            "signal": signal,
+            "entry": entry,
+            "position": self.position,
+            "sl_buy": dl - spread,
+            "sl_sell": dh + spread,
+        }
+
+    def run(self, df, close_col_name='bid_c', spread_col='real_spread', time_col='time'):
+        """
+        Feed a whole history bar by bar (replay) and return the rows as a DataFrame
+        """
+        rows = [self.update(close, spread, time) for time, close, spread in
+                zip(df[time_col].to_numpy(), df[close_col_name].to_numpy(), df[spread_col].to_numpy(dtype=float))]
+        return pd.DataFrame(rows)
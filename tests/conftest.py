@@ -0,0 +1,44 @@
+import sys
+from types import SimpleNamespace
+import pytest
+from data.bar_store import rates_to_frame
+from data.data_process import add_bid_ask_columns
+from benchmarks.synthetic import synthetic_rates, synthetic_spec
+from backtest.profit_engine import calc_profit
+
+PAIR = "SYNTH"
+
+
+@pytest.fixture(scope="session")
+def raw():
+    """
+    2000 synthetic H1 bars in the get_data_from_mt5 layout
+    """
+    return rates_to_frame(synthetic_rates(2000, "H1", seed=7))
+
+
+@pytest.fixture(scope="session")
+def bars(raw):
+    return add_bid_ask_columns(PAIR, raw, digits=2)
+
+
+@pytest.fixture(scope="session")
+def spec():
+    return synthetic_spec(PAIR)
+
+
+@pytest.fixture
+def terminal(monkeypatch, spec):
+    """
+    MetaTrader5 stand-in answering symbol_info / order_calc_profit from the contract spec, so the original
+    terminal bound functions run as the reference of the offline / vectorized ones
+    """
+    mt5 = SimpleNamespace(ORDER_TYPE_BUY=0, ORDER_TYPE_SELL=1)
+    mt5.initialize = lambda: True
+    mt5.symbols_get = lambda: [SimpleNamespace(name=PAIR, digits=spec["digits"])]
+    mt5.symbol_info = lambda pair: SimpleNamespace(volume_step=spec["volume_step"], volume_min=spec["volume_min"],
+                                                   volume_max=spec["volume_max"])
+    mt5.order_calc_profit = lambda order_type, pair, lot, open_price, close_price: float(
+        calc_profit(spec, "BUY" if order_type == mt5.ORDER_TYPE_BUY else "SELL", lot, open_price, close_price))
+    monkeypatch.setitem(sys.modules, "MetaTrader5", mt5)
+    return mt5
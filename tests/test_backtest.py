@@ -0,0 +1,33 @@
+import pytest
+import pandas as pd
+from data.data_process import add_bid_ask_columns
+from strategies.donchian_strat import donchian_breakout_channel_v1, donchian_breakout_channel_v2
+from backtest.backtest import backtest_donchian_trades, backtest_donchian_trades_fast
+from conftest import PAIR
+
+SIGNALS = {"v1": donchian_breakout_channel_v1, "v2": donchian_breakout_channel_v2}
+RISKS = [("FIXED_AMOUNT", 150), ("PCT_BALANCE", 0.02)]
+
+
+@pytest.mark.parametrize("version", SIGNALS)
+@pytest.mark.parametrize("risk_mode, risk", RISKS)
+def test_fast_trades_match_original(bars, spec, terminal, version, risk_mode, risk):
+    signal = SIGNALS[version](bars.copy(), lookback=30)
+    expected = backtest_donchian_trades(PAIR, signal, 5000, risk, risk_mode, 3.0)
+    assert len(expected) > 20
+
+    pd.testing.assert_frame_equal(backtest_donchian_trades_fast(PAIR, signal, 5000, risk, risk_mode, 3.0), expected)
+    pd.testing.assert_frame_equal(backtest_donchian_trades_fast(PAIR, signal, 5000, risk, risk_mode, 3.0, spec=spec),
+                                  expected)
+
+
+@pytest.mark.parametrize("version", SIGNALS)
+def test_compact_layout_gives_same_signals_and_trades(raw, bars, spec, version):
+    full = SIGNALS[version](bars.copy(), lookback=30)
+    compact = SIGNALS[version](add_bid_ask_columns(PAIR, raw, digits=2, compact=True), lookback=30, compact=True)
+
+    for col in ("donchian_high", "donchian_low", "entry", "position", "sl_buy", "sl_sell"):
+        pd.testing.assert_series_equal(compact[col], full[col], check_dtype=False)
+    assert compact["entry"].dtype == "int8"
+    pd.testing.assert_frame_equal(backtest_donchian_trades_fast(PAIR, compact, 5000, 150, "FIXED_AMOUNT", 3.0, spec=spec),
+                                  backtest_donchian_trades_fast(PAIR, full, 5000, 150, "FIXED_AMOUNT", 3.0, spec=spec))
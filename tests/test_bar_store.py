@@ -0,0 +1,34 @@
+import numpy as np
+import pandas as pd
+from data.bar_store import BarStore, _from_epoch
+from benchmarks.synthetic import synthetic_rates, SyntheticSource
+from conftest import PAIR
+
+
+def test_channel_index_is_rebuilt_when_the_bars_change(tmp_path):
+    rates = synthetic_rates(500, "H1", seed=1)
+    source = SyntheticSource(rates[:300])
+    store = BarStore(str(tmp_path), fetch_fn=source)
+    # the requested end lies past the published bars, later calls top the store up
+    start, end = _from_epoch(rates["time"][0]), _from_epoch(rates["time"][-1])
+
+    def check(index):
+        close = pd.Series(store.get_rates(PAIR, "H1", start, end)["close"])
+        assert index.n == len(close)
+        high, low = index.channel(50)
+        np.testing.assert_array_equal(high, close.rolling(49).max().shift(1).to_numpy())
+        np.testing.assert_array_equal(low, close.rolling(49).min().shift(1).to_numpy())
+
+    check(store.get_channel_index(PAIR, "H1", start, end, 49))
+    check(store.get_channel_index(PAIR, "H1", start, end, 49))
+
+    # the last stored bar was still forming: same bar count, new close
+    source.rates = rates[:300].copy()
+    source.rates["close"][-1] += 100.0
+    check(store.get_channel_index(PAIR, "H1", start, end, 49))
+
+    source.rates = rates
+    index = store.get_channel_index(PAIR, "H1", start, end, 49)
+    assert index.n == 500
+    check(index)
+    check(store.offline().get_channel_index(PAIR, "H1", start, end, 49))
@@ -0,0 +1,139 @@
+import pytest
+from data.bar_store import rates_to_frame
+from data.data_process import add_bid_ask_columns
+from strategies.streaming import StreamingDonchian
+from benchmarks.synthetic import synthetic_rates, synthetic_spec
+from live.broker import FakeBroker
+from live.trader import LiveTrader
+
+SYMBOL = "SYNTH"
+LOOKBACK = 20
+N_BARS = 600
+
+
+def _replay(broker_cls=FakeBroker, retry=False):
+    """
+    Reveal the synthetic bars one by one and let the trader process each of them
+    """
+    spec = synthetic_spec(SYMBOL)
+    broker = broker_cls({SYMBOL: spec}, balance=100_000.0)
+    broker.load_history(SYMBOL, rates_to_frame(synthetic_rates(N_BARS, "H1", seed=3)), visible_bars=LOOKBACK * 2)
+    trader = LiveTrader(broker, [SYMBOL], "H1", lookback=LOOKBACK, initial_risk=100, clock=lambda: 0.0)
+    trader.warm_up(SYMBOL)
+
+    while broker.has_next(SYMBOL):
+        broker.advance(SYMBOL)
+        try:
+            assert trader.process_new_bars(SYMBOL) == 1
+        except RuntimeError:
+            if not retry:
+                raise
+            assert trader.process_new_bars(SYMBOL) == 1
+    return broker, trader
+
+
+def _expected_entries():
+    """
+    Entry rows of an independent streaming channel warmed up flat on the same history
+    """
+    bars = add_bid_ask_columns(SYMBOL, rates_to_frame(synthetic_rates(N_BARS, "H1", seed=3)), digits=2)
+    channel = StreamingDonchian(LOOKBACK, "v2")
+    channel.run(bars.iloc[:LOOKBACK * 2])
+    channel.position = 0
+    rows = channel.run(bars.iloc[LOOKBACK * 2:])
+    return rows[rows['entry'] != 0].reset_index(drop=True)
+
+
+def test_replay_opens_and_closes():
+    broker, trader = _replay()
+    entries = _expected_entries()
+    assert len(entries) > 5
+
+    opens = [e for e in trader.events if e['action'] == "open"]
+    assert [e['bar_time'] for e in opens] == list(entries['time'])
+    assert [e['side'] for e in opens] == ["BUY" if entry == 1 else "SELL" for entry in entries['entry']]
+    for event, (_, row) in zip(opens, entries.iterrows()):
+        assert event['sl'] == (row['sl_buy'] if event['side'] == "BUY" else row['sl_sell'])
+
+    # v2 holds one trade at a time: every open except the last is closed, by its stop or by the next reverse signal
+    closes = [o for o in broker.orders if o['action'] == "close"]
+    still_open = [pos['ticket'] for pos in broker.positions(SYMBOL)]
+    assert still_open in ([], [opens[-1]['ticket']])
+    assert sorted(o['ticket'] for o in closes) == [e['ticket'] for e in opens if e['ticket'] not in still_open]
+
+    reverse = [e for e in trader.events if e['action'] == "close"]
+    assert {e['ticket'] for e in reverse} == {o['ticket'] for o in closes if o['reason'] == "Reverse_signal"}
+    assert len(reverse) > 0 and set(e['bar_time'] for e in reverse) <= set(entries['time'])
+    assert not [o for o in broker.orders if o['action'] == "modify"]
+
+
+class FlakyBroker(FakeBroker):
+    """
+    Fake broker rejecting every third order once
+    """
+
+    def open_position(self, symbol, side, lot, sl):
+        self.calls = getattr(self, "calls", 0) + 1
+        if self.calls % 3 == 0:
+            self.calls += 1
+            raise RuntimeError("requote")
+        return super().open_position(symbol, side, lot, sl)
+
+
+def test_failed_order_is_retried_on_the_same_row():
+    broker, trader = _replay()
+    flaky_broker, flaky_trader = _replay(FlakyBroker, retry=True)
+
+    def orders(b):
+        return [{k: v for k, v in o.items() if k != "ticket"} for o in b.orders]
+
+    assert flaky_broker.calls > len([o for o in broker.orders if o['action'] == "open"])
+    assert orders(flaky_broker) == orders(broker)
+    assert flaky_trader._channels[SYMBOL]._count == trader._channels[SYMBOL]._count
+    assert len(flaky_trader.latency.records) == len(trader.latency.records) == N_BARS - LOOKBACK * 2
+
+
+class DroppedStopBroker(FakeBroker):
+    """
+    Fake broker opening positions without their stop loss and failing the first stop update
+    """
+
+    def open_position(self, symbol, side, lot, sl):
+        return super().open_position(symbol, side, lot, 0.0)
+
+    def modify_position(self, ticket, sl):
+        self.modify_calls = getattr(self, "modify_calls", 0) + 1
+        if self.modify_calls == 1:
+            raise RuntimeError("trade context busy")
+        return super().modify_position(ticket, sl)
+
+
+def test_retry_after_open_does_not_open_twice():
+    broker, trader = _replay(DroppedStopBroker, retry=True)
+    opens = [e for e in trader.events if e['action'] == "open"]
+    assert len(opens) == len(_expected_entries())
+    assert len([o for o in broker.orders if o['action'] == "open"]) == len(opens)
+
+    # the failed stop update of the first trade is retried without sending its order again
+    first = [o for o in broker.orders if o['ticket'] == opens[0]['ticket']]
+    assert [o['action'] for o in first][:2] == ["open", "modify"]
+    assert first[1]['sl'] == opens[0]['sl']
+    assert broker.modify_calls == len(opens) + 1
+
+
+def test_position_without_stop_gets_channel_stop():
+    spec = synthetic_spec(SYMBOL)
+    broker = FakeBroker({SYMBOL: spec}, balance=100_000.0)
+    broker.load_history(SYMBOL, rates_to_frame(synthetic_rates(N_BARS, "H1", seed=3)), visible_bars=LOOKBACK * 2)
+    ticket = broker.open_position(SYMBOL, "BUY", 0.1, 0.0)['ticket']
+
+    trader = LiveTrader(broker, [SYMBOL], "H1", lookback=LOOKBACK, initial_risk=100, clock=lambda: 0.0)
+    trader.warm_up(SYMBOL)
+    assert trader._channels[SYMBOL].position == 1
+
+    broker.advance(SYMBOL)
+    trader.process_new_bars(SYMBOL)
+    modify = [o for o in broker.orders if o['action'] == "modify"]
+    assert len(modify) == 1 and modify[0]['ticket'] == ticket
+    assert broker.positions(SYMBOL)[0]['sl'] == pytest.approx(modify[0]['sl'])
+    assert modify[0]['sl'] == trader._pending_row[SYMBOL]['sl_buy']
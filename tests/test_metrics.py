@@ -0,0 +1,32 @@
+import pandas as pd
+import pytest
+from strategies.donchian_strat import donchian_breakout_channel_v1, donchian_breakout_channel_v2
+from backtest.backtest import backtest_donchian_trades_fast
+from metrics.metrics import performance_report, performance_report_fast
+from conftest import PAIR
+
+
+@pytest.mark.parametrize("signal_fn", [donchian_breakout_channel_v1, donchian_breakout_channel_v2])
+@pytest.mark.parametrize("dates", [(None, None), ("2015-01-10", "2015-03-01")])
+def test_fast_report_matches_original(bars, spec, signal_fn, dates):
+    signal = signal_fn(bars.copy(), lookback=30)
+    trades = backtest_donchian_trades_fast(PAIR, signal, 5000, 0.02, "PCT_BALANCE", 3.0, spec=spec)
+
+    expected = performance_report(signal, trades, 5000, *dates)
+    got = performance_report_fast(signal, trades, 5000, *dates)
+    pd.testing.assert_frame_equal(got[0], expected[0])
+    pd.testing.assert_series_equal(got[1], expected[1])
+    pd.testing.assert_series_equal(got[2], expected[2])
+    assert performance_report_fast(signal, trades, 5000, *dates, as_dict=True)[0] == expected[0].iloc[0].to_dict()
+
+
+@pytest.mark.parametrize("trades", [pd.DataFrame([]), pd.DataFrame(columns=["profit_ac", "acc_balance"])])
+@pytest.mark.parametrize("equity", ["realized", "mark_to_market"])
+def test_report_without_trades_is_flat(bars, spec, trades, equity):
+    signal = donchian_breakout_channel_v2(bars, lookback=5000)
+    report, balance_series, balance_daily = performance_report_fast(signal, trades, 5000, equity=equity, spec=spec)
+    row = report.iloc[0]
+    assert row["Trades"] == 0 and row["Profit factor"] == 0.0 and row["Max DD (%)"] == 0.0
+    assert row["Return (%)"] == 0.0
+    assert (balance_series == 5000).all() and len(balance_series) == len(bars)
+    assert (balance_daily == 5000).all()
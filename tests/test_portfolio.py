@@ -0,0 +1,48 @@
+import numpy as np
+from benchmarks.synthetic import synthetic_spec
+from backtest.backtest import EXIT_SL
+from backtest.portfolio import simulate_portfolio
+
+
+def _paths(entry_times, exit_times, is_buy, entry_price, stop_loss, exit_price):
+    n = len(entry_times)
+    return {
+        "entry_time": np.array(entry_times, dtype="datetime64[ns]"),
+        "exit_time": np.array(exit_times, dtype="datetime64[ns]"),
+        "exit_code": np.full(n, EXIT_SL),
+        "is_buy": np.array(is_buy),
+        "entry_price": np.array(entry_price, dtype=float),
+        "stop_loss": np.array(stop_loss, dtype=float),
+        "exit_price": np.array(exit_price, dtype=float),
+    }
+
+
+def test_trade_entered_on_last_bar_is_closed_and_frees_its_slot():
+    paths = {
+        # second trade enters on the last bar of A: exit_time == entry_time
+        "A": _paths(["2024-01-01 00:00", "2024-01-01 05:00"], ["2024-01-01 02:00", "2024-01-01 05:00"],
+                    [True, False], [100.0, 110.0], [90.0, 120.0], [105.0, 110.0]),
+        "B": _paths(["2024-01-01 06:00"], ["2024-01-01 08:00"], [True], [50.0], [40.0], [60.0]),
+    }
+    specs = {pair: synthetic_spec(pair) for pair in paths}
+    res = simulate_portfolio(paths, 10_000.0, 100.0, "FIXED_AMOUNT", symbol_specs=specs, max_positions=1)
+
+    trades = res["trades"]
+    assert len(res["rejected"]) == 0
+    assert list(trades["symbol"]) == ["A", "A", "B"]
+    zero = trades.iloc[1]
+    assert zero["entry_time"] == zero["exit_time"]
+    assert zero["lot"] > 0 and zero["profit_bc"] == 0.0
+    assert trades["acc_balance"].iloc[-1] == 10_000.0 + trades["profit_ac"].sum()
+
+
+def test_same_time_exit_still_frees_the_slot_of_a_reverse():
+    # A exits at 03:00 while B enters at 03:00: the exit comes first, so B fits under max_positions=1
+    paths = {
+        "A": _paths(["2024-01-01 00:00"], ["2024-01-01 03:00"], [True], [100.0], [90.0], [95.0]),
+        "B": _paths(["2024-01-01 03:00"], ["2024-01-01 04:00"], [False], [50.0], [55.0], [45.0]),
+    }
+    specs = {pair: synthetic_spec(pair) for pair in paths}
+    res = simulate_portfolio(paths, 10_000.0, 100.0, "FIXED_AMOUNT", symbol_specs=specs, max_positions=1)
+    assert list(res["trades"]["symbol"]) == ["A", "B"]
+    assert len(res["rejected"]) == 0
@@ -0,0 +1,20 @@
+import pandas as pd
+import optimization.search
+from data.bar_store import BarStore, _from_epoch
+from benchmarks.synthetic import synthetic_rates, SyntheticSource
+from optimization.search import search_parameters
+from conftest import PAIR
+
+
+def test_mark_to_market_search_sizes_lots_with_the_terminal(tmp_path, monkeypatch, spec, terminal):
+    rates = synthetic_rates(1500, "H1", seed=3)
+    store = BarStore(str(tmp_path), fetch_fn=SyntheticSource(rates))
+    # the spec fetched to value the open positions caps lots: sizing with it would change every trade
+    monkeypatch.setattr(optimization.search, "get_symbol_spec", lambda pair: dict(spec, volume_max=0.01))
+
+    args = (PAIR, "H1", _from_epoch(rates["time"][0]), _from_epoch(rates["time"][-1]), {"lookback": [20, 60]}, 5000)
+    kwargs = dict(risk_per_trade=150, bar_store=store, equity="mark_to_market")
+    got = search_parameters(*args, **kwargs)["results"]
+    expected = search_parameters(*args, symbol_spec=spec, **kwargs)["results"]
+    assert (got["trades"] > 0).all()
+    pd.testing.assert_frame_equal(got, expected)
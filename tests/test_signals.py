@@ -0,0 +1,67 @@
+import numpy as np
+import pandas as pd
+import pytest
+from strategies.donchian_strat import (donchian_breakout_channel_v1, donchian_breakout_channel_v2, breakout_signal,
+                                       entries_v1, entries_v2)
+from strategies.channel_index import DonchianIndex
+from strategies.streaming import StreamingDonchian
+
+LOOKBACKS = [2, 3, 17, 64, 250]
+
+
+def _entries_v2_loop(signal):
+    """
+    Original v2 state machine: enter on a breakout when flat, then only on the opposite breakout
+    """
+    entry, position = np.zeros(len(signal), dtype=int), np.zeros(len(signal), dtype=int)
+    for i, s in enumerate(signal):
+        prev = position[i - 1] if i > 0 else 0
+        if s != 0 and (prev == 0 or s == -prev):
+            entry[i] = position[i] = s
+        else:
+            position[i] = prev
+    return entry, position
+
+
+@pytest.mark.parametrize("lookback", LOOKBACKS)
+def test_vectorized_entries_match_loops(bars, lookback):
+    v1 = donchian_breakout_channel_v1(bars.copy(), lookback)
+    v2 = donchian_breakout_channel_v2(bars, lookback)
+    signal = breakout_signal(bars['bid_c'].to_numpy(), v2['donchian_high'].to_numpy(), v2['donchian_low'].to_numpy())
+
+    expected = _entries_v2_loop(signal)
+    for got in (entries_v2(signal), (v2['entry'].to_numpy(), v2['position'].to_numpy())):
+        np.testing.assert_array_equal(got[0], expected[0])
+        np.testing.assert_array_equal(got[1], expected[1])
+
+    entry, position = entries_v1(v1['signal'].to_numpy())
+    np.testing.assert_array_equal(entry, v1['entry'].to_numpy())
+    np.testing.assert_array_equal(position, v1['position'].to_numpy())
+
+
+def test_channel_index_matches_rolling(bars):
+    close = bars['bid_c'].copy()
+    close.iloc[[100, 101, 900]] = np.nan
+    index = DonchianIndex(close.to_numpy(), max_window=max(LOOKBACKS) - 1)
+
+    for lookback in LOOKBACKS:
+        window = close.rolling(window=lookback - 1)
+        high, low = index.channel(lookback)
+        np.testing.assert_array_equal(high, window.max().shift(1).to_numpy())
+        np.testing.assert_array_equal(low, window.min().shift(1).to_numpy())
+
+    with_index = donchian_breakout_channel_v2(bars, 64, channel_index=DonchianIndex(bars['bid_c'].to_numpy(), 63))
+    pd.testing.assert_frame_equal(with_index, donchian_breakout_channel_v2(bars, 64))
+
+
+@pytest.mark.parametrize("version, signal_fn, signal_col", [("v1", donchian_breakout_channel_v1, "signal"),
+                                                           ("v2", donchian_breakout_channel_v2, "signal_raw")])
+@pytest.mark.parametrize("lookback", [3, 50])
+def test_streaming_matches_batch(bars, version, signal_fn, signal_col, lookback):
+    batch = signal_fn(bars.copy(), lookback)
+    rows = StreamingDonchian(lookback, version).run(bars)
+
+    assert list(rows['time']) == list(batch['time'])
+    for col in ("donchian_high", "donchian_low", "entry", "position", "sl_buy", "sl_sell"):
+        np.testing.assert_array_equal(rows[col].to_numpy(), batch[col].to_numpy(), err_msg=col)
+    np.testing.assert_array_equal(rows['signal'].to_numpy(), batch[signal_col].to_numpy())